@@ -0,0 +1,111 @@
+# app/core/config.py
+import os
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+# -------------------------------------------------
+# Database
+# -------------------------------------------------
+# Any SQLAlchemy URL - point it at a server database without code changes
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./fintech.db")
+
+# Async routes: defaults to DATABASE_URL with its asyncio driver
+# (sqlite -> aiosqlite, postgresql -> asyncpg)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+# Replica / snapshot for GET routes, e.g. a second SQLite file or a
+# read-only URI: sqlite:///file:replica.db?mode=ro&uri=true
+# Unset -> reads go to DATABASE_URL
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+READ_ASYNC_DATABASE_URL = os.getenv("READ_ASYNC_DATABASE_URL")
+
+# "development": driver defaults (rollback journal, full sync)
+# "production":  SQLite WAL + tuned pragmas / sized pool for server databases
+DB_PROFILES = ("development", "production")
+DB_PROFILE = os.getenv("DB_PROFILE", "development").lower()
+# A typo would otherwise run production on development settings
+if DB_PROFILE not in DB_PROFILES:
+    raise ValueError(f"DB_PROFILE must be one of {', '.join(DB_PROFILES)}, got {DB_PROFILE!r}")
+
+DB_POOL_SIZE = env_int("DB_POOL_SIZE", 10)
+DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 20)
+DB_POOL_TIMEOUT = env_int("DB_POOL_TIMEOUT", 30)
+DB_POOL_RECYCLE = env_int("DB_POOL_RECYCLE", 1800)
+
+# SQLite production pragmas
+SQLITE_BUSY_TIMEOUT_MS = env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)
+SQLITE_MMAP_SIZE = env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+SQLITE_CACHE_SIZE_KB = env_int("SQLITE_CACHE_SIZE_KB", 64 * 1024)
+
+
+# -------------------------------------------------
+# Settlement
+# -------------------------------------------------
+# "inline": settle inside POST /transaction/
+# "outbox": commit transaction + outbox row, settle in a worker
+SETTLEMENT_MODE = os.getenv("SETTLEMENT_MODE", "inline").lower()
+
+# Worker threads started inside the API process (0 = run
+# `python -m app.jobs.settlement_worker` separately)
+SETTLEMENT_INPROCESS_WORKERS = env_int("SETTLEMENT_INPROCESS_WORKERS", 0)
+
+SETTLEMENT_MAX_ATTEMPTS = env_int("SETTLEMENT_MAX_ATTEMPTS", 5)
+SETTLEMENT_LEASE_SECONDS = env_int("SETTLEMENT_LEASE_SECONDS", 60)
+SETTLEMENT_POLL_SECONDS = env_int("SETTLEMENT_POLL_SECONDS", 1)
+
+# Payee chains a bulk settlement plan (backfill, replay, reconcile,
+# simulator) keeps between chunks; least recently used beyond that
+SETTLEMENT_PLAN_CHAIN_CACHE_SIZE = env_int("SETTLEMENT_PLAN_CHAIN_CACHE_SIZE", 100000)
+
+
+# -------------------------------------------------
+# Authentication
+# -------------------------------------------------
+# Verified tokens and resolved principals are cached per process. User
+# status changes and deletes reach other processes through the
+# `principals` cache version; the TTL bounds everything else
+AUTH_CACHE_SIZE = env_int("AUTH_CACHE_SIZE", 10000)
+AUTH_CACHE_TTL_SECONDS = env_int("AUTH_CACHE_TTL_SECONDS", 60)
+
+# bcrypt cost for new hashes; stored hashes with another cost are
+# rehashed on the user's next successful login
+BCRYPT_ROUNDS = env_int("BCRYPT_ROUNDS", 12)
+
+# Hashing runs in its own process pool, off the request threads.
+# Beyond workers + queue limit, logins are rejected with 503
+PASSWORD_POOL_WORKERS = env_int("PASSWORD_POOL_WORKERS", 2)
+PASSWORD_QUEUE_LIMIT = env_int("PASSWORD_QUEUE_LIMIT", 32)
+
+
+# -------------------------------------------------
+# Logging
+# -------------------------------------------------
+# Share of settlements whose commission breakdown is logged at DEBUG
+# (only when DEBUG is enabled for app.services.commission_engine)
+SETTLEMENT_LOG_SAMPLE_RATE = env_float("SETTLEMENT_LOG_SAMPLE_RATE", 0.01)
+
+
+# -------------------------------------------------
+# Archival
+# -------------------------------------------------
+# Closed months are moved to one SQLite file each under ARCHIVE_DIR;
+# the hot tables keep the current month plus ARCHIVE_HOT_MONTHS before it
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "./archive")
+ARCHIVE_HOT_MONTHS = env_int("ARCHIVE_HOT_MONTHS", 3)
+
+
+# -------------------------------------------------
+# Analytics snapshots
+# -------------------------------------------------
+# Columnar .npy copies of transactions / commission_ledger, written by
+# app.jobs.snapshot_ledger and queried without touching the database
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "./snapshots")
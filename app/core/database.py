@@ -1,19 +1,200 @@
-from sqlalchemy import create_engine
+import threading
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
-
-DATABASE_URL = "sqlite:///./fintech.db"
-
-engine = create_engine(
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from app.core.config import (
     DATABASE_URL,
-    connect_args={"check_same_thread": False}  # REQUIRED for SQLite
+    ASYNC_DATABASE_URL,
+    READ_DATABASE_URL,
+    READ_ASYNC_DATABASE_URL,
+    DB_PROFILE,
+    DB_PROFILES,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_SIZE_KB
 )
 
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes"
+
+# backend -> asyncio driver used when ASYNC_DATABASE_URL is not set.
+# Only aiosqlite is in requirements.txt; install asyncpg / aiomysql to
+# serve the async routes from PostgreSQL / MySQL
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
+
+
+def sqlite_pragmas() -> dict:
+    """
+    Production SQLite settings:
+      WAL           - readers no longer block the writer (and vice versa)
+      NORMAL sync   - fsync at checkpoints only; still crash-safe in WAL mode
+      busy_timeout  - wait for the write lock instead of failing at once
+    """
+    return {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+        "mmap_size": SQLITE_MMAP_SIZE,
+        "cache_size": -SQLITE_CACHE_SIZE_KB,   # negative = KiB, not pages
+        "temp_store": "MEMORY",
+    }
+
+
+def _apply_pragmas(engine, pragmas: dict):
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def _engine_options(url, profile: str, read_only: bool = False):
+    """
+    (create_engine kwargs, SQLite pragmas or None) for a URL + profile.
+    Shared by the sync and async engines.
+    """
+    if profile not in DB_PROFILES:
+        raise ValueError(f"Unknown database profile {profile!r}, expected one of {', '.join(DB_PROFILES)}")
+
+    is_sqlite = url.get_backend_name() == "sqlite"
+    is_sqlite_file = is_sqlite and url.database not in (None, "", ":memory:")
+
+    if is_sqlite:
+        kwargs = {"connect_args": {"check_same_thread": False}}  # REQUIRED for SQLite
+    else:
+        kwargs = {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": True,
+        }
+
+    if is_sqlite_file and read_only:
+        # Journal mode / sync belong to the writer; readers never take the
+        # write lock, so the pool may grow like a server pool
+        pragmas = {"query_only": "ON"}
+        if profile == "production":
+            pragmas.update(sqlite_pragmas())
+            del pragmas["journal_mode"], pragmas["synchronous"]
+            kwargs["connect_args"]["timeout"] = SQLITE_BUSY_TIMEOUT_MS / 1000
+            kwargs.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+        return kwargs, pragmas
+
+    if is_sqlite_file and profile == "production":
+        # SQLite has a single writer: extra connections only queue on the
+        # file lock, so cap the pool and let requests wait for a connection
+        kwargs["connect_args"]["timeout"] = SQLITE_BUSY_TIMEOUT_MS / 1000
+        kwargs.update(pool_size=DB_POOL_SIZE, max_overflow=0, pool_timeout=DB_POOL_TIMEOUT)
+        return kwargs, sqlite_pragmas()
+
+    return kwargs, None
+
+
+def create_db_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE, read_only: bool = False):
+    kwargs, pragmas = _engine_options(make_url(url), profile, read_only)
+    engine = create_engine(url, **kwargs)
+
+    if pragmas:
+        _apply_pragmas(engine, pragmas)
+
+    return engine
+
+
+class AsyncDatabaseUnavailable(RuntimeError):
+    """The async routes were used, but no asyncio driver can serve the database."""
+
+
+def async_database_url(url: str) -> str:
+    """Same database through its asyncio driver."""
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise AsyncDatabaseUnavailable(f"No async driver configured for {url.get_backend_name()}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+def create_async_db_engine(url: str = None, profile: str = DB_PROFILE, read_only: bool = False):
+    url = url or ASYNC_DATABASE_URL or async_database_url(DATABASE_URL)
+
+    url = make_url(url)
+    kwargs, pragmas = _engine_options(url, profile, read_only)
+    try:
+        engine = create_async_engine(url, **kwargs)
+    except ImportError as exc:
+        raise AsyncDatabaseUnavailable(
+            f"The async routes need {url.get_driver_name()} for {url.get_backend_name()}: "
+            f"pip install {url.get_driver_name()}, or set ASYNC_DATABASE_URL"
+        ) from exc
+
+    if pragmas:
+        # Pragmas run on the DBAPI connection, which lives on the sync engine
+        _apply_pragmas(engine.sync_engine, pragmas)
+
+    return engine
+
+
+engine = create_db_engine()
+
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
     bind=engine
 )
 
+# Async path: same database, asyncio driver. Objects stay usable after
+# commit (no implicit refresh - lazy IO is not allowed in async code).
+# Built on first use, so the sync path (jobs, migrations, sync routes)
+# works on a backend whose asyncio driver is not installed
+_async_sessionmakers = {}
+_async_sessionmakers_lock = threading.Lock()
+
+
+def _async_sessionmaker(read_only: bool):
+    factory = _async_sessionmakers.get(read_only)
+    if factory is not None:
+        return factory
+
+    with _async_sessionmakers_lock:
+        factory = _async_sessionmakers.get(read_only)
+        if factory is None:
+            url = READ_ASYNC_DATABASE_URL or async_database_url(READ_DATABASE_URL) if read_only else None
+            factory = _async_sessionmakers[read_only] = async_sessionmaker(
+                bind=create_async_db_engine(url, read_only=read_only),
+                class_=AsyncSession,
+                autoflush=False,
+                expire_on_commit=False
+            )
+        return factory
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    return _async_sessionmaker(read_only=False)()
+
+
+# Read path: replica / snapshot for GET routes (READ_DATABASE_URL).
+# Not configured -> reads share the primary session.
+ReadSessionLocal = None
+AsyncReadSessionLocal = None
+
+if READ_DATABASE_URL:
+    read_engine = create_db_engine(READ_DATABASE_URL, read_only=True)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+    def AsyncReadSessionLocal() -> AsyncSession:
+        return _async_sessionmaker(read_only=True)()
+
+
 Base = declarative_base()
 
 def get_db():
@@ -21,4 +202,43 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def wants_primary(request: Request) -> bool:
+    """
+    Read-your-writes override: a caller that just wrote sends
+    `X-Read-Your-Writes: 1` to read from the primary instead of a
+    replica that may lag behind.
+    """
+    return request.headers.get(READ_YOUR_WRITES_HEADER, "").lower() in ("1", "true", "yes")
+
+
+def get_read_db(request: Request, db=Depends(get_db)):
+    """
+    Session for GET routes. Reuses the request's primary session when no
+    replica is configured or the caller asked for read-your-writes.
+    """
+    if ReadSessionLocal is None or wants_primary(request):
+        yield db
+        return
+
+    read_db = ReadSessionLocal()
+    try:
+        yield read_db
+    finally:
+        read_db.close()
+
+
+async def get_async_read_db(request: Request, db=Depends(get_async_db)):
+    if AsyncReadSessionLocal is None or wants_primary(request):
+        yield db
+        return
+
+    async with AsyncReadSessionLocal() as read_db:
+        yield read_db
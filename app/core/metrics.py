@@ -0,0 +1,47 @@
+# app/core/metrics.py
+"""
+Prometheus metrics for the settlement hot path, served at GET /metrics.
+
+Single-process registry: when running several uvicorn workers each
+process exposes its own numbers.
+"""
+from prometheus_client import Counter, Histogram
+
+# Settlement stages are sub-millisecond on a warm cache, so the default
+# buckets (starting at 5ms) would put almost everything in the first one
+STAGE_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5
+)
+
+# stage: resolve | upline_walk | margin | ledger_insert | rollup | commit
+SETTLEMENT_STAGE_SECONDS = Histogram(
+    "settlement_stage_seconds",
+    "Time spent in each settle_commission stage",
+    ["stage", "service_id"],
+    buckets=STAGE_BUCKETS
+)
+
+SETTLEMENT_SECONDS = Histogram(
+    "settlement_seconds",
+    "End-to-end settle_commission time",
+    ["service_id"],
+    buckets=STAGE_BUCKETS
+)
+
+SETTLEMENT_TRANSACTIONS = Counter(
+    "settlement_transactions",
+    "Transactions passed through settle_commission",
+    ["service_id", "outcome"]
+)
+
+SETTLEMENT_LEDGER_ROWS = Counter(
+    "settlement_ledger_rows",
+    "CommissionLedger rows written by settle_commission",
+    ["service_id"]
+)
+
+
+def stage_timer(stage: str, service_id):
+    """Context manager observing one stage of one settlement."""
+    return SETTLEMENT_STAGE_SECONDS.labels(stage=stage, service_id=str(service_id)).time()
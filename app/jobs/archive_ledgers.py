@@ -0,0 +1,44 @@
+# app/jobs/archive_ledgers.py
+"""
+Move closed months of transactions + ledgers into per-month SQLite files.
+
+    python -m app.jobs.archive_ledgers                 # everything before the open window
+    python -m app.jobs.archive_ledgers --period 2025-12
+"""
+import argparse
+from app.core.config import ARCHIVE_HOT_MONTHS
+from app.core.database import SessionLocal, engine
+from app.services.archive import archive_month, closed_periods
+
+
+def archive_ledgers(periods: list = None, keep_months: int = ARCHIVE_HOT_MONTHS) -> list:
+    db = SessionLocal()
+    results = []
+
+    try:
+        for period in periods or closed_periods(db, keep_months):
+            result = archive_month(engine, db, period)
+            results.append(result)
+
+            if result.get("skipped"):
+                print(f"⏭️  {period} already archived")
+            else:
+                print(f"✅ Archived {period}: {result['transactions']} transactions, {result['ledgers']} ledger rows")
+
+    except Exception:
+        db.rollback()
+        raise
+
+    finally:
+        db.close()
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive closed months out of the hot tables")
+    parser.add_argument("--period", action="append", help="YYYY-MM (repeatable); default: all closed months")
+    parser.add_argument("--keep-months", type=int, default=ARCHIVE_HOT_MONTHS)
+    args = parser.parse_args()
+
+    archive_ledgers(args.period, args.keep_months)
@@ -0,0 +1,103 @@
+# app/jobs/backfill_settlement.py
+"""
+Settle every transaction in a date range that has no ledger rows yet.
+
+    python -m app.jobs.backfill_settlement --start 2025-12-01 --end 2025-12-02
+"""
+import argparse
+from datetime import datetime
+import numpy as np
+from sqlalchemy import select, insert
+from app.core.database import SessionLocal
+from app.models import Transaction, CommissionLedger
+from app.services.settlement_kernel import SettlementPlan, ledger_rows_from_batch
+from app.services.earnings_rollup import rollup_deltas, apply_rollup
+
+CHUNK_SIZE = 50000
+
+
+def backfill_settlement(start: datetime, end: datetime, chunk_size: int = CHUNK_SIZE) -> dict:
+    db = SessionLocal()
+    plan = SettlementPlan(db)
+    last_id = 0
+    stats = {"transactions": 0, "ledgers": 0}
+
+    try:
+        while True:
+            # Keyset chunk of transactions in range
+            rows = db.execute(
+                select(
+                    Transaction.id,
+                    Transaction.user_id,
+                    Transaction.scheme_id,
+                    Transaction.service_id,
+                    Transaction.amount_minor,
+                    Transaction.created_at
+                )
+                .where(
+                    Transaction.id > last_id,
+                    Transaction.created_at >= start,
+                    Transaction.created_at < end
+                )
+                .order_by(Transaction.id)
+                .limit(chunk_size)
+            ).all()
+
+            if not rows:
+                break
+
+            last_id = rows[-1].id
+
+            # Skip the ones that already have ledger rows (one range scan per chunk)
+            settled = set(db.scalars(
+                select(CommissionLedger.transaction_id)
+                .where(CommissionLedger.transaction_id.between(rows[0].id, last_id))
+                .distinct()
+            ))
+            rows = [row for row in rows if row.id not in settled]
+            if not rows:
+                continue
+
+            ids, user_ids, scheme_ids, service_ids, amounts, created_at = zip(*rows)
+
+            batch = plan.compute(
+                amounts=np.asarray(amounts, dtype=np.int64),
+                scheme_ids=scheme_ids,
+                service_ids=service_ids,
+                user_ids=user_ids
+            )
+
+            ledger_rows = ledger_rows_from_batch(
+                batch,
+                transaction_ids=ids,
+                service_ids=service_ids,
+                created_at=created_at
+            )
+            if ledger_rows:
+                db.execute(insert(CommissionLedger.__table__), ledger_rows)
+                apply_rollup(db, rollup_deltas(ledger_rows))
+            db.commit()
+
+            stats["transactions"] += len(rows)
+            stats["ledgers"] += len(ledger_rows)
+
+            print(f"✅ Settled {stats['transactions']} transactions ({stats['ledgers']} ledger rows), last id {last_id}")
+
+    except Exception:
+        db.rollback()
+        raise
+
+    finally:
+        db.close()
+
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Settle transactions that have no commission ledger")
+    parser.add_argument("--start", type=datetime.fromisoformat, required=True)
+    parser.add_argument("--end", type=datetime.fromisoformat, required=True)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    backfill_settlement(args.start, args.end, args.chunk_size)
@@ -0,0 +1,53 @@
+# app/jobs/export_ledger.py
+"""
+Stream transactions + commission ledger to a file (or stdout) for
+reconciliation. Same output as GET /transaction/export.
+
+    python -m app.jobs.export_ledger --start 2025-12-01 --end 2026-01-01 --output dec.csv.gz --gzip
+    python -m app.jobs.export_ledger --format ndjson --scheme-id 3 > scheme3.ndjson
+"""
+import argparse
+import sys
+from datetime import datetime
+from app.services.ledger_export import stream_export, EXPORT_FORMATS, EXPORT_CHUNK_SIZE
+
+
+def export_ledger(output, fmt: str = "csv", compress: bool = False, start: datetime = None,
+                  end: datetime = None, scheme_id: int = None, service_id: int = None,
+                  chunk_size: int = EXPORT_CHUNK_SIZE) -> int:
+    """Writes the export to the binary file `output`; returns bytes written."""
+    written = 0
+    for data in stream_export(fmt, compress, start, end, scheme_id, service_id, chunk_size):
+        output.write(data)
+        written += len(data)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export transactions + commission ledger")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--scheme-id", type=int, default=None)
+    parser.add_argument("--service-id", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    parser.add_argument("--output", default="-", help="File path, '-' for stdout")
+    args = parser.parse_args()
+
+    filters = dict(
+        fmt=args.format,
+        compress=args.gzip,
+        start=args.start,
+        end=args.end,
+        scheme_id=args.scheme_id,
+        service_id=args.service_id,
+        chunk_size=args.chunk_size
+    )
+
+    if args.output == "-":
+        export_ledger(sys.stdout.buffer, **filters)
+    else:
+        with open(args.output, "wb") as output:
+            written = export_ledger(output, **filters)
+        print(f"✅ Exported {written} bytes to {args.output}")
@@ -0,0 +1,38 @@
+# app/jobs/rebuild_earnings.py
+"""
+Recompute the daily earnings rollups from the commission ledger
+(hot tables + archives).
+
+    python -m app.jobs.rebuild_earnings                       # everything
+    python -m app.jobs.rebuild_earnings --start 2025-12-01 --end 2026-01-01
+"""
+import argparse
+from datetime import date
+from app.core.database import SessionLocal
+from app.services.earnings_rollup import rebuild_rollups
+
+
+def rebuild_earnings(start: date = None, end: date = None) -> dict:
+    db = SessionLocal()
+
+    try:
+        stats = rebuild_rollups(db, start, end)
+        db.commit()
+        print(f"✅ Rebuilt {stats['rollup_rows']} rollup rows from {stats['stores']} ledger store(s)")
+        return stats
+
+    except Exception:
+        db.rollback()
+        raise
+
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild earnings_daily from the commission ledger")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="Day after the last one")
+    args = parser.parse_args()
+
+    rebuild_earnings(args.start, args.end)
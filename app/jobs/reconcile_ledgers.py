@@ -0,0 +1,53 @@
+# app/jobs/reconcile_ledgers.py
+"""
+Check every transaction's ledger against today's commission config and
+the payees' margins, across all cores. Read-only.
+
+    python -m app.jobs.reconcile_ledgers --output recon.ndjson
+    python -m app.jobs.reconcile_ledgers --workers 8 --range-size 500000
+
+Exits 1 when anything is found; the report has one NDJSON line per
+finding (missing / mismatched / unexpected / over_margin). Fix with
+app.jobs.replay_ledgers. Transactions of deleted users are listed as
+`orphaned` and do not fail the run. Exits 2 when the commission config
+changed during the run - ranges were checked against different
+configs; re-run.
+"""
+import argparse
+import sys
+from datetime import datetime
+from app.services.ledger_reconcile import reconcile_ledgers, RECONCILE_RANGE_SIZE, FINDINGS
+from app.services.ledger_replay import REPLAY_CHUNK_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile commission ledgers in parallel")
+    parser.add_argument("--output", default=f"reconcile_{datetime.utcnow():%Y%m%d_%H%M%S}.ndjson")
+    parser.add_argument("--workers", type=int, default=None, help="Processes, default: all cores")
+    parser.add_argument("--range-size", type=int, default=RECONCILE_RANGE_SIZE)
+    parser.add_argument("--chunk-size", type=int, default=REPLAY_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    totals = reconcile_ledgers(
+        output=args.output,
+        workers=args.workers,
+        range_size=args.range_size,
+        chunk_size=args.chunk_size,
+        on_range=lambda stats, totals: print(
+            f"... ({stats['after_id']}, {stats['until_id']}]: {totals['transactions']} transactions checked"
+        )
+    )
+
+    if totals["config_changed"]:
+        print(f"❌ Commission config changed during the run (versions {totals['hierarchy_versions']}), re-run:", totals)
+        sys.exit(2)
+
+    if any(totals[kind] for kind in FINDINGS):
+        print(f"❌ Reconciliation found problems, see {args.output}:", totals)
+        sys.exit(1)
+
+    print("✅ Ledgers reconcile:", totals)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# app/jobs/replay_ledgers.py
+"""
+Re-settle existing transactions against the current commission config.
+
+    python -m app.jobs.replay_ledgers --job fix-dmt-dec --scheme-id 5 --service-id 2 \
+        --start 2025-12-01 --end 2026-01-01
+
+Re-running the same --job with the same filters resumes from its
+checkpoint; --restart starts it over (with new filters, if given).
+"""
+import argparse
+import sys
+from datetime import datetime
+from app.core.database import SessionLocal
+from app.services.ledger_replay import replay_ledgers, ReplayFiltersMismatch, REPLAY_CHUNK_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute commission ledgers for a filter")
+    parser.add_argument("--job", required=True, help="Checkpoint name, reuse it to resume")
+    parser.add_argument("--scheme-id", type=int)
+    parser.add_argument("--service-id", type=int)
+    parser.add_argument("--start", type=datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.fromisoformat)
+    parser.add_argument("--chunk-size", type=int, default=REPLAY_CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Only report the diff")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        stats = replay_ledgers(
+            db,
+            job_name=args.job,
+            scheme_id=args.scheme_id,
+            service_id=args.service_id,
+            start=args.start,
+            end=args.end,
+            chunk_size=args.chunk_size,
+            dry_run=args.dry_run,
+            restart=args.restart,
+            on_chunk=lambda last_id, stats: print(f"... up to transaction {last_id}: {stats}")
+        )
+        print("✅ Replay finished:", stats)
+    except ReplayFiltersMismatch as exc:
+        print(f"❌ {exc}")
+        sys.exit(2)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
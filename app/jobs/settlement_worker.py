@@ -0,0 +1,36 @@
+# app/jobs/settlement_worker.py
+"""
+Drain the settlement outbox.
+
+    python -m app.jobs.settlement_worker --workers 4
+"""
+import argparse
+import logging
+import signal
+from app.services.settlement_outbox import start_workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Settle queued transactions from the outbox")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    threads, stop_event = start_workers(args.workers, args.batch_size)
+    print(f"✅ Settlement worker started with {args.workers} threads")
+
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    try:
+        while not stop_event.wait(1):
+            pass
+    except KeyboardInterrupt:
+        stop_event.set()
+
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# app/jobs/snapshot_ledger.py
+"""
+Columnar analytics snapshots of transactions + commission_ledger.
+
+    python -m app.jobs.snapshot_ledger write                   # append rows above the watermark
+    python -m app.jobs.snapshot_ledger write --rebuild         # after replays / deletes
+    python -m app.jobs.snapshot_ledger query commission_ledger --by role --start 2025-12-01
+
+`query` reads the memory-mapped files only - no database connection.
+"""
+import argparse
+from datetime import datetime
+from app.core.config import SNAPSHOT_DIR
+from app.core.database import SessionLocal, ReadSessionLocal
+from app.services.ledger_snapshot import TABLES, GROUP_KEYS, SNAPSHOT_CHUNK_SIZE, write_snapshot, group_sum
+
+
+def snapshot_ledger(tables=tuple(TABLES), directory: str = SNAPSHOT_DIR,
+                    chunk_size: int = SNAPSHOT_CHUNK_SIZE, rebuild: bool = False) -> list:
+    db = (ReadSessionLocal or SessionLocal)()
+
+    try:
+        results = []
+        for table in tables:
+            result = write_snapshot(db, table, directory, chunk_size, rebuild)
+            print(f"✅ {table}: appended {result['appended']} rows (watermark {result['watermark']})")
+            results.append(result)
+        return results
+
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write or query columnar ledger snapshots")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    write = commands.add_parser("write")
+    write.add_argument("--table", choices=sorted(TABLES), action="append", default=None)
+    write.add_argument("--chunk-size", type=int, default=SNAPSHOT_CHUNK_SIZE)
+    write.add_argument("--rebuild", action="store_true", help="Rebuild the snapshot from id 0 and swap it in when done")
+
+    query = commands.add_parser("query")
+    query.add_argument("table", choices=sorted(TABLES))
+    query.add_argument("--by", choices=GROUP_KEYS, required=True)
+    query.add_argument("--start", type=datetime.fromisoformat, default=None)
+    query.add_argument("--end", type=datetime.fromisoformat, default=None)
+
+    args = parser.parse_args()
+
+    if args.command == "write":
+        snapshot_ledger(args.table or tuple(TABLES), args.dir, args.chunk_size, args.rebuild)
+    else:
+        for row in group_sum(args.table, args.by, args.start, args.end, args.dir):
+            print(row)
@@ -0,0 +1,93 @@
+# app/migrations/__init__.py
+"""
+Versioned schema migrations.
+
+Each migration is a module with an `upgrade(conn)` function, listed in
+MIGRATIONS in order. Applied versions are recorded in `schema_migrations`;
+each migration runs in its own DB transaction together with its record.
+
+Migrations must be idempotent: `create_all` already builds the current
+schema for a fresh database, and the migrations are then only stamped.
+
+    python -m app.migrations            # upgrade to latest
+    python -m app.migrations --status
+"""
+from datetime import datetime
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData, select, insert, inspect
+from sqlalchemy.exc import IntegrityError
+from app.migrations import (
+    m0001_minor_units,
+    m0002_hot_path_indexes,
+    m0003_summary_service_index,
+    m0004_earnings_rollup,
+    m0005_user_closure,
+    m0006_cache_versions,
+    m0007_autoincrement_ids,
+    m0008_unique_ledger_payee
+)
+
+# (version, name, module) - append only, never renumber
+MIGRATIONS = [
+    (1, "minor_units", m0001_minor_units),
+    (2, "hot_path_indexes", m0002_hot_path_indexes),
+    (3, "summary_service_index", m0003_summary_service_index),
+    (4, "earnings_rollup", m0004_earnings_rollup),
+    (5, "user_closure", m0005_user_closure),
+    (6, "cache_versions", m0006_cache_versions),
+    (7, "autoincrement_ids", m0007_autoincrement_ids),
+    (8, "unique_ledger_payee", m0008_unique_ledger_payee),
+]
+
+_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def applied_versions(engine) -> set:
+    if not inspect(engine).has_table(schema_migrations.name):
+        return set()
+    with engine.connect() as conn:
+        return set(conn.scalars(select(schema_migrations.c.version)))
+
+
+def current_version(engine) -> int:
+    return max(applied_versions(engine), default=0)
+
+
+def upgrade(engine, target: int = None) -> list:
+    """
+    Apply every pending migration up to `target` (default: latest).
+    Returns the versions applied by this call.
+    """
+    schema_migrations.create(engine, checkfirst=True)
+    done = applied_versions(engine)
+    applied = []
+
+    for version, name, module in MIGRATIONS:
+        if version in done or (target is not None and version > target):
+            continue
+
+        try:
+            with engine.begin() as conn:
+                module.upgrade(conn)
+                conn.execute(insert(schema_migrations).values(
+                    version=version,
+                    name=name,
+                    applied_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            # Another process (e.g. a second API worker) applied it first -
+            # anything else is the migration's own failure
+            if version in applied_versions(engine):
+                continue
+            raise
+
+        applied.append(version)
+
+    return applied
@@ -0,0 +1,31 @@
+# app/migrations/__main__.py
+import argparse
+from app.core.database import engine, Base
+from app.models import *
+from app.migrations import MIGRATIONS, applied_versions, upgrade
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument("--target", type=int, default=None, help="Stop at this version")
+    parser.add_argument("--status", action="store_true", help="List migrations and exit")
+    args = parser.parse_args()
+
+    if args.status:
+        done = applied_versions(engine)
+        for version, name, _ in MIGRATIONS:
+            print(f"{'✅' if version in done else '⏳'} {version:04d} {name}")
+        return
+
+    # Same order as the app's startup: new tables first, then the
+    # migrations that alter existing ones (and index the new ones)
+    Base.metadata.create_all(bind=engine)
+    applied = upgrade(engine, target=args.target)
+    if applied:
+        print(f"✅ Applied migrations: {', '.join(f'{version:04d}' for version in applied)}")
+    else:
+        print("✅ Schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# app/migrations/m0001_minor_units.py
+"""
+Integer money columns (paise / basis points), filled from the float columns.
+"""
+from sqlalchemy import inspect, text
+from app.utils.money import to_minor, to_bps
+
+MINOR_UNIT_COLUMNS = {
+    "transactions": {
+        "amount_minor": "BIGINT",
+    },
+    "commission_ledger": {
+        "commission_bps": "INTEGER",
+        "commission_amount_minor": "BIGINT",
+    },
+}
+
+# minor column -> (float column, converter). Converted in Python with the
+# same helpers the app writes with (Decimal, half up) - SQL ROUND() of a
+# float drifts on values like 1.005
+BACKFILL_COLUMNS = {
+    "transactions": {
+        "amount_minor": ("amount", to_minor),
+    },
+    "commission_ledger": {
+        "commission_bps": ("commission_percent", to_bps),
+        "commission_amount_minor": ("commission_amount", to_minor),
+    },
+}
+
+BACKFILL_CHUNK_SIZE = 10000
+
+
+def _backfill(conn, table: str, column: str, source: str, convert):
+    select_rows = text(
+        f"SELECT id, {source} FROM {table} "
+        f"WHERE {column} IS NULL AND {source} IS NOT NULL AND id > :after_id "
+        f"ORDER BY id LIMIT :limit"
+    )
+    update_row = text(f"UPDATE {table} SET {column} = :value WHERE id = :id")
+    last_id = 0
+
+    while True:
+        rows = conn.execute(select_rows, {"after_id": last_id, "limit": BACKFILL_CHUNK_SIZE}).all()
+        if not rows:
+            return
+        conn.execute(update_row, [{"id": row_id, "value": convert(value)} for row_id, value in rows])
+        last_id = rows[-1][0]
+
+
+def upgrade(conn):
+    inspector = inspect(conn)
+
+    for table, columns in MINOR_UNIT_COLUMNS.items():
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        for name, ddl_type in columns.items():
+            if name not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl_type}"))
+
+    for table, columns in BACKFILL_COLUMNS.items():
+        for column, (source, convert) in columns.items():
+            _backfill(conn, table, column, source, convert)
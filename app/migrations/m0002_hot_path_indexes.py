@@ -0,0 +1,49 @@
+# app/migrations/m0002_hot_path_indexes.py
+"""
+Indexes for the lookups the routers, settlement and jobs run on every
+request. Mirrored by `__table_args__` in the models so create_all builds
+the same schema for a fresh database.
+"""
+from sqlalchemy import inspect, text
+
+# name -> (table, columns)
+INDEXES = {
+    # my-summary / totals: one user's transactions, oldest first by (created_at, id)
+    "ix_transactions_user_created": ("transactions", ("user_id", "created_at", "id")),
+    # delete_commission, replay and simulation filters, keyset on id
+    "ix_transactions_scheme_service": ("transactions", ("scheme_id", "service_id", "id")),
+    # backfill / archive / export time ranges
+    "ix_transactions_created": ("transactions", ("created_at", "id")),
+
+    # distribution per transaction, ledger deletes, outbox dedup, replay diff
+    "ix_commission_ledger_transaction": ("commission_ledger", ("transaction_id",)),
+    # a payee's earnings over time
+    "ix_commission_ledger_user_created": ("commission_ledger", ("user_id", "created_at")),
+
+    # child protection on delete, downward subtree walks
+    "ix_schemes_parent": ("schemes", ("parent_scheme_id",)),
+    # non-superadmin scheme listing
+    "ix_schemes_created_by": ("schemes", ("created_by",)),
+
+    # downline walks
+    "ix_users_parent": ("users", ("parent_id",)),
+
+    # outbox claim query
+    "ix_settlement_outbox_status_next": ("settlement_outbox", ("status", "next_attempt_at")),
+}
+
+
+def create_indexes(conn, indexes: dict):
+    """Create each (table, columns) index that does not exist yet."""
+    inspector = inspect(conn)
+    existing = {}
+
+    for name, (table, columns) in indexes.items():
+        if table not in existing:
+            existing[table] = {index["name"] for index in inspector.get_indexes(table)}
+        if name not in existing[table]:
+            conn.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+
+
+def upgrade(conn):
+    create_indexes(conn, INDEXES)
@@ -0,0 +1,14 @@
+# app/migrations/m0003_summary_service_index.py
+"""
+my-summary filtered by service: keyset pages walk this index directly
+instead of skipping over the user's other services.
+"""
+from app.migrations.m0002_hot_path_indexes import create_indexes
+
+INDEXES = {
+    "ix_transactions_user_service_created": ("transactions", ("user_id", "service_id", "created_at", "id")),
+}
+
+
+def upgrade(conn):
+    create_indexes(conn, INDEXES)
@@ -0,0 +1,13 @@
+# app/migrations/m0004_earnings_rollup.py
+"""
+earnings_daily: create it and fill it from the existing ledger (hot
+tables + archives). From here on every ledger write keeps it current.
+"""
+from app.models import EarningsRollup, ArchivePartition
+from app.services.earnings_rollup import rebuild_rollups
+
+
+def upgrade(conn):
+    EarningsRollup.__table__.create(conn, checkfirst=True)
+    ArchivePartition.__table__.create(conn, checkfirst=True)
+    rebuild_rollups(conn)
@@ -0,0 +1,12 @@
+# app/migrations/m0005_user_closure.py
+"""
+user_closure: create it and build it from User.parent_id. onboard_user
+and delete_user maintain it from here on.
+"""
+from app.models import UserClosure
+from app.services.user_closure import rebuild_closure
+
+
+def upgrade(conn):
+    UserClosure.__table__.create(conn, checkfirst=True)
+    rebuild_closure(conn)
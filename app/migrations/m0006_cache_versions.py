@@ -0,0 +1,9 @@
+# app/migrations/m0006_cache_versions.py
+"""
+cache_versions: the version counters behind ETags (GET /scheme/tree).
+"""
+from app.models import CacheVersion
+
+
+def upgrade(conn):
+    CacheVersion.__table__.create(conn, checkfirst=True)
@@ -0,0 +1,74 @@
+# app/migrations/m0007_autoincrement_ids.py
+"""
+AUTOINCREMENT on the SQLite transactions / commission_ledger keys.
+
+Without it SQLite hands out max(id) + 1, so once the newest rows are
+archived their ids come back and the archive unions see duplicates.
+SQLite can't add AUTOINCREMENT in place: each table is rebuilt, and its
+sequence starts above every id already used, archives included.
+"""
+import os
+import sqlite3
+from sqlalchemy import inspect, select, text
+from sqlalchemy.schema import CreateTable
+from app.models import Transaction, CommissionLedger, ArchivePartition
+
+TABLES = (Transaction.__table__, CommissionLedger.__table__)
+
+
+def _has_autoincrement(conn, table) -> bool:
+    sql = conn.scalar(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": table.name}
+    )
+    return "AUTOINCREMENT" in (sql or "").upper()
+
+
+def _archived_max_id(conn, table) -> int:
+    highest = 0
+    if not inspect(conn).has_table(ArchivePartition.__tablename__):
+        return highest
+
+    for path in conn.scalars(select(ArchivePartition.path)):
+        if not os.path.exists(path):
+            continue
+        with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as archive:
+            highest = max(highest, archive.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table.name}").fetchone()[0])
+    return highest
+
+
+def _rebuild(conn, table):
+    rebuilt = f"{table.name}_rebuild"
+    ddl = str(CreateTable(table).compile(dialect=conn.dialect))
+    columns = ", ".join(column.name for column in table.columns)
+    highest = max(conn.scalar(text(f"SELECT COALESCE(MAX(id), 0) FROM {table.name}")),
+                  _archived_max_id(conn, table))
+
+    indexes = list(conn.scalars(
+        text("SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = :name AND sql IS NOT NULL"),
+        {"name": table.name}
+    ))
+
+    # The model's DDL (AUTOINCREMENT included) under a temporary name
+    conn.execute(text(ddl.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {rebuilt} ", 1)))
+    conn.execute(text(f"INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM {table.name}"))
+    conn.execute(text(f"DROP TABLE {table.name}"))
+    conn.execute(text(f"ALTER TABLE {rebuilt} RENAME TO {table.name}"))
+
+    # The indexes the table had - later migrations add the rest
+    for sql in indexes:
+        conn.execute(text(sql))
+
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {"name": table.name})
+    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                 {"name": table.name, "seq": highest})
+
+
+def upgrade(conn):
+    # Server databases draw ids from sequences that never go back
+    if conn.dialect.name != "sqlite":
+        return
+
+    for table in TABLES:
+        if not _has_autoincrement(conn, table):
+            _rebuild(conn, table)
@@ -0,0 +1,25 @@
+# app/migrations/m0008_unique_ledger_payee.py
+"""
+One ledger row per (transaction, payee, role): a settlement delivered
+twice can no longer pay twice. Duplicates already in the table are
+dropped (lowest id kept) and the earnings rollups rebuilt without them.
+"""
+from sqlalchemy import inspect, text
+from app.services.earnings_rollup import rebuild_rollups
+
+INDEX = "ux_commission_ledger_payee"
+
+
+def upgrade(conn):
+    if INDEX in {index["name"] for index in inspect(conn).get_indexes("commission_ledger")}:
+        return
+
+    duplicates = conn.execute(text(
+        "DELETE FROM commission_ledger WHERE id NOT IN ("
+        "SELECT MIN(id) FROM commission_ledger GROUP BY transaction_id, user_id, role)"
+    )).rowcount
+
+    if duplicates:
+        rebuild_rollups(conn)
+
+    conn.execute(text(f"CREATE UNIQUE INDEX {INDEX} ON commission_ledger (transaction_id, user_id, role)"))
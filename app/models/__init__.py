@@ -1,13 +1,18 @@
 # Import all models
-from .user import User
+from .user import User, UserClosure
 from .scheme import Scheme, Service
 from .commission import SchemeCommission
-from .models import Role, RoleEnum, CommissionTypeEnum
+from .models import Role, RoleEnum, CommissionTypeEnum, SettlementStatusEnum
 from .trasactions import Transaction, CommissionLedger
+from .settlement import SettlementOutbox, ReplayCheckpoint
+from .archive import ArchivePartition
+from .earnings import EarningsRollup
+from .cache_version import CacheVersion
 
 # Optional: define __all__ for cleaner exports
 __all__ = [
     "User",
+    "UserClosure",
     "Scheme",
     "Service",
     "SchemeCommission",
@@ -16,4 +21,10 @@ __all__ = [
     "CommissionTypeEnum",
     "Transaction",
     "CommissionLedger",
+    "SettlementStatusEnum",
+    "SettlementOutbox",
+    "ReplayCheckpoint",
+    "ArchivePartition",
+    "EarningsRollup",
+    "CacheVersion",
 ]
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime
+
+from app.core.database import Base
+
+
+class ArchivePartition(Base):
+    """
+    One closed month of transactions + ledgers moved out of the hot
+    tables into its own SQLite file. Readers consult this registry to
+    decide which archives a requested date range reaches.
+    """
+    __tablename__ = "archive_partitions"
+
+    id = Column(Integer, primary_key=True)
+
+    # "YYYY-MM"
+    period = Column(String, nullable=False, unique=True)
+    path = Column(String, nullable=False)
+
+    # [range_start, range_end) on transactions.created_at
+    range_start = Column(DateTime, nullable=False)
+    range_end = Column(DateTime, nullable=False)
+
+    transactions = Column(Integer, nullable=False, default=0)
+    ledgers = Column(Integer, nullable=False, default=0)
+
+    archived_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime
+
+from app.core.database import Base
+
+
+class CacheVersion(Base):
+    """
+    Named version counters for cached read models. Writers bump the
+    counter in the same DB transaction as their change, so every API
+    process sees a new version (and a new ETag) once it commits.
+    """
+    __tablename__ = "cache_versions"
+
+    # e.g. "scheme_tree"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
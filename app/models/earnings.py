@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, BigInteger, Date, DateTime, ForeignKey, UniqueConstraint
+from datetime import datetime
+
+from app.core.database import Base
+
+
+class EarningsRollup(Base):
+    """
+    Commission earned per payee, service and day - the running sum of
+    commission_ledger.commission_amount_minor, kept up to date by every
+    ledger write and delete. Archiving a month does not touch it.
+    """
+    __tablename__ = "earnings_daily"
+
+    id = Column(Integer, primary_key=True)
+
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    service_id = Column(Integer, ForeignKey("services.id"), nullable=False)
+    # UTC day of commission_ledger.created_at
+    day = Column(Date, nullable=False)
+
+    earned_minor = Column(BigInteger, nullable=False, default=0)
+    ledger_count = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "service_id", "day", name="uq_earnings_daily_user_service_day"),
+    )
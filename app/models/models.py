@@ -23,6 +23,13 @@ class CommissionTypeEnum(str, enum.Enum):
     FLAT = "FLAT"
 
 
+class SettlementStatusEnum(str, enum.Enum):
+    PENDING = "PENDING"
+    PROCESSING = "PROCESSING"
+    SETTLED = "SETTLED"
+    FAILED = "FAILED"
+
+
 class Role(Base):
     __tablename__ = "roles"
 
@@ -1,7 +1,7 @@
 from sqlalchemy import UniqueConstraint
 from sqlalchemy import (
     Column, Integer, String, Boolean, ForeignKey,
-    Float, DateTime, Enum
+    Float, DateTime, Enum, Index
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -43,3 +43,8 @@ class Scheme(Base):
         foreign_keys="[User.scheme_id]"  # <--- Specify foreign key here
     )
 
+    __table_args__ = (
+        Index("ix_schemes_parent", "parent_scheme_id"),
+        Index("ix_schemes_created_by", "created_by"),
+    )
+
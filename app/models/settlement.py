@@ -0,0 +1,61 @@
+from sqlalchemy import (
+    Column, Integer, String, Boolean, ForeignKey,
+    DateTime, Enum, Index
+)
+from sqlalchemy.orm import relationship
+from datetime import datetime
+
+from app.core.database import Base
+from app.models.models import SettlementStatusEnum
+
+
+class SettlementOutbox(Base):
+    """
+    One row per transaction whose commission settlement is deferred.
+    Written in the same DB transaction as the Transaction row.
+    """
+    __tablename__ = "settlement_outbox"
+
+    id = Column(Integer, primary_key=True)
+
+    # Unique: a transaction is enqueued at most once
+    transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=False, unique=True)
+
+    status = Column(Enum(SettlementStatusEnum), nullable=False, default=SettlementStatusEnum.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    transaction = relationship("Transaction")
+
+    __table_args__ = (
+        Index("ix_settlement_outbox_status_next", "status", "next_attempt_at"),
+    )
+
+
+class ReplayCheckpoint(Base):
+    """
+    Progress of a ledger replay job - the last transaction id whose
+    ledgers were rewritten, committed together with those rewrites.
+    """
+    __tablename__ = "replay_checkpoints"
+
+    job_name = Column(String, primary_key=True)
+
+    # Filter the job was started with (JSON) - a resume must match it
+    filters = Column(String, nullable=False)
+
+    last_transaction_id = Column(Integer, nullable=False, default=0)
+    is_done = Column(Boolean, nullable=False, default=False)
+
+    inserted = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    deleted = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,6 +1,6 @@
 from sqlalchemy import (
-    Column, Integer, String, Boolean, ForeignKey,
-    Float, DateTime, Enum
+    Column, Integer, BigInteger, String, Boolean, ForeignKey,
+    Float, DateTime, Enum, Index
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -18,6 +18,8 @@ class Transaction(Base):
     service_id = Column(Integer, ForeignKey("services.id"), nullable=False)
 
     amount = Column(Float, nullable=False)
+    # Exact amount in paise - source of truth, `amount` mirrors it
+    amount_minor = Column(BigInteger)
 
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -25,6 +27,16 @@ class Transaction(Base):
     scheme = relationship("Scheme")
     service = relationship("Service")
 
+    # Kept in sync with app/migrations/m0002_hot_path_indexes.py + m0003.
+    # AUTOINCREMENT (m0007): ids of archived rows are never handed out again
+    __table_args__ = (
+        Index("ix_transactions_user_created", "user_id", "created_at", "id"),
+        Index("ix_transactions_user_service_created", "user_id", "service_id", "created_at", "id"),
+        Index("ix_transactions_scheme_service", "scheme_id", "service_id", "id"),
+        Index("ix_transactions_created", "created_at", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
 
 class CommissionLedger(Base):
     __tablename__ = "commission_ledger"
@@ -43,6 +55,10 @@ class CommissionLedger(Base):
     commission_percent = Column(Float, nullable=False)
     commission_amount = Column(Float, nullable=False)
 
+    # Exact values (basis points / paise) - the float columns mirror them
+    commission_bps = Column(Integer)
+    commission_amount_minor = Column(BigInteger)
+
     created_at = Column(DateTime, default=datetime.utcnow)
 
     transaction = relationship("Transaction")
@@ -50,3 +66,11 @@ class CommissionLedger(Base):
     scheme = relationship("Scheme")
     service = relationship("Service")
 
+    __table_args__ = (
+        Index("ix_commission_ledger_transaction", "transaction_id"),
+        Index("ix_commission_ledger_user_created", "user_id", "created_at"),
+        # m0008: a redelivered settlement can't pay a payee twice
+        Index("ux_commission_ledger_payee", "transaction_id", "user_id", "role", unique=True),
+        {"sqlite_autoincrement": True},
+    )
+
@@ -1,6 +1,6 @@
 from sqlalchemy import (
     Column, Integer, String, Boolean, ForeignKey,
-    Float, DateTime, Enum
+    Float, DateTime, Enum, Index
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -36,3 +36,25 @@ class User(Base):
         foreign_keys=[created_by],
         backref="created_users"  # All users created by this user
     )
+
+    __table_args__ = (
+        Index("ix_users_parent", "parent_id"),
+    )
+
+
+class UserClosure(Base):
+    """
+    Transitive closure of User.parent_id: one row per (ancestor,
+    descendant) pair, including depth 0 for the user itself. A downline
+    is a single PK range on ancestor_id instead of a recursive walk.
+    """
+    __tablename__ = "user_closure"
+
+    ancestor_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    depth = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # upline lookups + detaching a subtree
+        Index("ix_user_closure_descendant", "descendant_id", "depth"),
+    )
@@ -1,9 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordBearer
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
 from app.models import User
-from app.utils.auth import verify_password, create_access_token,decode_access_token
+from app.utils.auth import create_access_token
+from app.services.password_pool import verify_password_async, PasswordPoolSaturated
+from app.services.auth_cache import (
+    Principal,
+    verify_token,
+    cached_principal,
+    principal_generation,
+    principal_from_user,
+    remember_principal,
+    sync_principal_cache,
+    sync_principal_cache_async
+)
 from app.schema.auth import *
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -11,26 +24,76 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    payload = decode_access_token(token)
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    payload = verify_token(token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid token")
     user_id = payload.get("user_id")
-    user = db.query(User).filter(User.id == user_id).first()
+
+    # Another process may have deleted or deactivated a user since
+    sync_principal_cache(db)
+    principal = cached_principal(user_id)
+    if principal is not None:
+        return principal
+
+    generation = principal_generation()
+    user = db.query(User).options(joinedload(User.role)).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+
+    principal = principal_from_user(user)
+    remember_principal(principal, generation)
+    return principal
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme),
+                                 db: AsyncSession = Depends(get_async_db)) -> Principal:
+    payload = verify_token(token)
+    if not payload:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    user_id = payload.get("user_id")
+
+    await sync_principal_cache_async(db)
+    principal = cached_principal(user_id)
+    if principal is not None:
+        return principal
+
+    generation = principal_generation()
+    # Role is read by every route - load it now, lazy loads fail in async code
+    user = await db.scalar(
+        select(User).options(joinedload(User.role)).where(User.id == user_id)
+    )
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    principal = principal_from_user(user)
+    remember_principal(principal, generation)
+    return principal
 
 
 @router.post("/login")
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == payload.email).first()
+async def login(payload: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(
+        select(User).options(joinedload(User.role)).where(User.email == payload.email)
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if not verify_password(payload.password, user.password):
+    # bcrypt runs in the password pool; shed load instead of queueing
+    try:
+        valid, new_hash = await verify_password_async(payload.password, user.password)
+    except PasswordPoolSaturated:
+        raise HTTPException(status_code=503, detail="Too many logins, retry shortly",
+                            headers={"Retry-After": "1"})
+
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid password")
 
+    # Stored hash uses an outdated cost - upgrade it transparently
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
+
     token = create_access_token({
         "user_id": user.id,
         "role": user.role.name
@@ -1,12 +1,27 @@
 # app/routers/commission_routes.py
+from datetime import datetime, date
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.models import SchemeCommission, User,Scheme, RoleEnum, Transaction, CommissionLedger
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db, get_async_read_db
+from app.models import SchemeCommission, User,Scheme, RoleEnum, Transaction, CommissionLedger, SettlementOutbox
 from app.schema.commission import CommissionSetup, CommissionResponse
-from app.routers.auth_routes import get_current_user
+from app.routers.auth_routes import get_current_user, get_current_user_async
 from app.utils.commission_validation import validate_commission_payload
 from app.utils.role_hierarchy import ROLE_FIELD_MAP
+from app.utils.money import from_minor, from_bps
+from app.services.commission_engine import (
+    invalidate_scheme_commissions,
+    bump_hierarchy_version,
+    fetch_commission_chain,
+    fetch_commission_matrix,
+    merge_commission_chain,
+    calculate_commission_earnings,
+    absolute_bps
+)
+from app.services.commission_simulator import simulate_commission_change
+from app.services.earnings_rollup import subtract_transactions, earnings_summary
 
 router = APIRouter(prefix="/commissions", tags=["Commission Management"])
 
@@ -68,9 +83,13 @@ def set_commission(
     commission.commission_type = payload.commission_type
     commission.set_by_user_id = current_user.id
 
+    bump_hierarchy_version(db)
     db.commit()
     db.refresh(commission)
 
+    # Child schemes inherit from this one - drop their compiled config too
+    invalidate_scheme_commissions(scheme.id)
+
     return commission
 
 
@@ -94,62 +113,194 @@ def delete_commission(
         Transaction.service_id == commission.service_id
     ).all()
 
+    # Their ledgers leave the earnings rollups
+    subtract_transactions(db, [txn.id for txn in transactions])
+
     for txn in transactions:
         # Delete related ledgers
         db.query(CommissionLedger).filter(CommissionLedger.transaction_id == txn.id).delete()
+        db.query(SettlementOutbox).filter(SettlementOutbox.transaction_id == txn.id).delete()
         # Delete transaction
         db.delete(txn)
 
     # Delete the commission itself
+    scheme_id = commission.scheme_id
     db.delete(commission)
+    bump_hierarchy_version(db)
     db.commit()
 
+    invalidate_scheme_commissions(scheme_id)
+
     return {"message": f"Commission {commission_id} and related transactions & ledgers deleted successfully"}
 
 
+def _commission_chain(chain: list) -> list:
+    return [
+        {
+            "scheme_id": level["scheme_id"],
+            "scheme_name": level["scheme_name"],
+            "is_root": level["parent_scheme_id"] is None,
+            "commissions": (
+                {
+                    role.name: level["commission"][field]
+                    for role, field in ROLE_FIELD_MAP.items()
+                }
+                if level["commission"] else None
+            )
+        }
+        for level in chain
+    ]
+
+
+async def _readable_scheme(db: AsyncSession, scheme_id: int, current_user: User) -> Scheme:
+    scheme = await db.get(Scheme, scheme_id)
+    if not scheme:
+        raise HTTPException(status_code=404, detail="Scheme not found")
+
+    # 🔒 Optional access control
+    if current_user.role.name not in {RoleEnum.ADMIN, RoleEnum.SUPER_ADMIN} \
+       and scheme.created_by != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    return scheme
+
+
 @router.get("/scheme/{scheme_id}")
-def get_commissions_by_scheme(
+async def get_commissions_by_scheme(
     scheme_id: int,
     service_id: int,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    scheme = await _readable_scheme(db, scheme_id, current_user)
+
+    # Whole ancestor chain + its commission rows in one query
+    chain = await db.run_sync(fetch_commission_chain, scheme.id, service_id)
+
+    return {
+        "scheme_id": scheme_id,
+        "service_id": service_id,
+        "commission_chain": _commission_chain(chain)
+    }
+
+
+@router.get("/scheme/{scheme_id}/matrix")
+async def get_commission_matrix(
+    scheme_id: int,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """
+    Rate card of a scheme: for every service, the values configured at
+    each ancestor plus the resolved absolute and margin per role.
+    """
+    scheme = await _readable_scheme(db, scheme_id, current_user)
+
+    # Ancestor chain x services + commission rows, one query
+    matrix = await db.run_sync(fetch_commission_matrix, scheme.id)
+
+    services = []
+    for service_id, service in matrix.items():
+        absolute = merge_commission_chain(service["chain"])
+        # Margins in basis points, so they are exact
+        margin_bps = calculate_commission_earnings(absolute_bps(absolute))
+
+        services.append({
+            "service_id": service_id,
+            "service_code": service["service_code"],
+            "service_name": service["service_name"],
+            "commission_chain": _commission_chain(service["chain"]),
+            "absolute": {role.name: value for role, value in absolute.items()},
+            "margin": {role.name: from_bps(bps) for role, bps in margin_bps.items()}
+        })
+
+    return {
+        "scheme_id": scheme_id,
+        "services": services
+    }
+
+
+@router.post("/simulate")
+def simulate_commission(
+    payload: CommissionSetup,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    scheme = db.query(Scheme).filter(Scheme.id == scheme_id).first()
+    """
+    What-if: payout impact of `payload` on past transactions of the
+    scheme and its child schemes. Nothing is saved.
+    """
+    scheme = db.query(Scheme).filter(Scheme.id == payload.scheme_id).first()
     if not scheme:
         raise HTTPException(status_code=404, detail="Scheme not found")
 
-    # 🔒 Optional access control
     if current_user.role.name not in {RoleEnum.ADMIN, RoleEnum.SUPER_ADMIN} \
        and scheme.created_by != current_user.id:
         raise HTTPException(status_code=403, detail="Access denied")
 
-    commission_chain = []
-    current_scheme = scheme
-
-    while current_scheme:
-        commission = db.query(SchemeCommission).filter(
-            SchemeCommission.scheme_id == current_scheme.id,
-            SchemeCommission.service_id == service_id
+    # Same rules as set_commission: a proposal it would reject is not simulated
+    parent_commission = None
+    if scheme.parent_scheme:
+        parent_commission = db.query(SchemeCommission).filter(
+            SchemeCommission.scheme_id == scheme.parent_scheme.id,
+            SchemeCommission.service_id == payload.service_id
         ).first()
 
-        commission_chain.append({
-            "scheme_id": current_scheme.id,
-            "scheme_name": current_scheme.name,
-            "is_root": current_scheme.parent_scheme_id is None,
-            "commissions": (
-                {
-                    role.name: getattr(commission, field)
-                    for role, field in ROLE_FIELD_MAP.items()
-                }
-                if commission else None
-            )
-        })
+    validate_commission_payload(
+        current_user=current_user,
+        payload=payload,
+        parent_commission=parent_commission
+    )
+
+    try:
+        return simulate_commission_change(
+            db=db,
+            proposal=payload,
+            start=start,
+            end=end
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
 
-        current_scheme = current_scheme.parent_scheme
+@router.get("/earnings")
+async def get_earnings(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    service_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """
+    Commission earned over the days [start, end), served from the daily
+    rollups - cost depends on the number of days, not of ledger rows.
+    Admins may pass `user_id` to see another payee.
+    """
+    if user_id is None:
+        user_id = current_user.id
+    elif user_id != current_user.id and current_user.role.name not in {RoleEnum.ADMIN, RoleEnum.SUPER_ADMIN}:
+        raise HTTPException(status_code=403, detail="Access denied")
 
+    summary = await earnings_summary(db, user_id=user_id, start=start, end=end, service_id=service_id)
 
     return {
-        "scheme_id": scheme_id,
-        "service_id": service_id,
-        "commission_chain": commission_chain
+        "user_id": user_id,
+        "start": start,
+        "end": end,
+        "earned": from_minor(summary["earned_minor"]),
+        "by_service": [
+            {
+                "service_id": row["service_id"],
+                "earned": from_minor(row["earned_minor"]),
+                "ledger_count": row["ledger_count"]
+            }
+            for row in summary["by_service"]
+        ],
+        "by_day": [
+            {"day": row["day"], "earned": from_minor(row["earned_minor"])}
+            for row in summary["by_day"]
+        ]
     }
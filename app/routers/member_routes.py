@@ -1,13 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db, get_async_read_db
 from app.models import User, RoleEnum, Scheme
-from app.routers.auth_routes import get_current_user
-from passlib.context import CryptContext
-from app.schema.member import UserCreate, UserResponse, UserUpdateStatus
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.routers.auth_routes import get_current_user, get_current_user_async
+from app.schema.member import (
+    UserCreate,
+    UserResponse,
+    UserUpdateStatus,
+    DOWNLINE_PAGE_SIZE,
+    MAX_DOWNLINE_PAGE_SIZE
+)
+from app.services.commission_engine import invalidate_user_payees, bump_hierarchy_version
+from app.services.auth_cache import invalidate_principal, bump_principals_version
+from app.services.scheme_tree import bump_tree_version
+from app.services.password_pool import hash_password_async, PasswordPoolSaturated
+from app.services.user_closure import (
+    add_user,
+    remove_user,
+    is_in_downline,
+    downline_summary,
+    downline_members
+)
+from app.utils.money import from_minor
 
 router = APIRouter(prefix="/users", tags=["User Management"])
 
@@ -57,14 +76,22 @@ ROLE_LEVEL_MAP = {
 # ---------------------------
 # CREATE / ONBOARD USER
 # ---------------------------
+def _link_new_user(db: Session, user: User):
+    add_user(db, user.id, user.parent_id)
+    bump_hierarchy_version(db)
+    if user.scheme_id:
+        # Member counts in GET /scheme/tree
+        bump_tree_version(db)
+
+
 @router.post("/onboard", response_model=UserResponse)
-def onboard_user(payload: UserCreate,
-                 db: Session = Depends(get_db),
-                 current_user: User = Depends(get_current_user)):
+async def onboard_user(payload: UserCreate,
+                       db: AsyncSession = Depends(get_async_db),
+                       current_user: User = Depends(get_current_user_async)):
 
     # Prevent multiple SUPER_ADMINs
     if payload.role_id == RoleEnum.SUPER_ADMIN:
-        existing_superadmin = db.query(User).filter(User.role_id == RoleEnum.SUPER_ADMIN).first()
+        existing_superadmin = await db.scalar(select(User.id).where(User.role_id == RoleEnum.SUPER_ADMIN).limit(1))
         if existing_superadmin:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="SUPER_ADMIN already exists")
 
@@ -78,17 +105,22 @@ def onboard_user(payload: UserCreate,
         )
 
     # Check if email exists
-    if db.query(User).filter(User.email == payload.email).first():
+    if await db.scalar(select(User.id).where(User.email == payload.email)):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already exists")
 
     # Check scheme if provided
     if payload.scheme_id:
-        scheme = db.query(Scheme).filter(Scheme.id == payload.scheme_id).first()
+        scheme = await db.get(Scheme, payload.scheme_id)
         if not scheme:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Scheme not found")
 
-    # Hash password
-    hashed_password = pwd_context.hash(payload.password)
+    # Hash password in the pool - awaited, so no request thread waits on bcrypt
+    try:
+        hashed_password = await hash_password_async(payload.password)
+    except PasswordPoolSaturated:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Password hashing is saturated, retry shortly",
+                            headers={"Retry-After": "1"})
 
     user = User(
         name=payload.name,
@@ -100,8 +132,12 @@ def onboard_user(payload: UserCreate,
         created_by=current_user.id
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.flush()
+    await db.run_sync(_link_new_user, user)
+    await db.commit()
+    await db.refresh(user)
+
+    invalidate_user_payees(user.id)
     return user
 
 
@@ -121,8 +157,17 @@ def delete_user(user_id: int, db: Session = Depends(get_db),
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Not authorized to delete this user")
 
+    remove_user(db, user.id)
+    bump_hierarchy_version(db)
+    bump_principals_version(db)
+    if user.scheme_id:
+        bump_tree_version(db)
     db.delete(user)
     db.commit()
+
+    # Everyone below this user had it in their upline
+    invalidate_user_payees(user_id)
+    invalidate_principal(user_id)
     return {"message": f"User {user.name} deleted successfully"}
 
 
@@ -144,6 +189,82 @@ def update_user_status(user_id: int, payload: UserUpdateStatus,
                             detail="Not authorized to change status of this user")
 
     user.is_active = payload.is_active
+    bump_hierarchy_version(db)
+    bump_principals_version(db)
     db.commit()
     db.refresh(user)
+
+    invalidate_user_payees(user.id)
+    invalidate_principal(user.id)
     return user
+
+
+# ---------------------------
+# DOWNLINE REPORTING
+# ---------------------------
+async def _check_downline_access(db: AsyncSession, current_user: User, user_id: int):
+    """Admins, the user itself and anyone above it in the hierarchy."""
+    if current_user.role.name in {RoleEnum.SUPER_ADMIN, RoleEnum.ADMIN}:
+        return
+    if not await is_in_downline(db, current_user.id, user_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="User is not in your downline")
+
+
+@router.get("/{user_id}/downline")
+async def get_downline(user_id: int,
+                       max_depth: Optional[int] = Query(None, ge=1),
+                       after_id: Optional[int] = None,
+                       limit: int = Query(DOWNLINE_PAGE_SIZE, ge=1, le=MAX_DOWNLINE_PAGE_SIZE),
+                       db: AsyncSession = Depends(get_async_read_db),
+                       current_user: User = Depends(get_current_user_async)):
+    await _check_downline_access(db, current_user, user_id)
+
+    # Keyset on user id - pass `next_after_id` back as `after_id`
+    members = await downline_members(db, user_id, limit, after_id=after_id, max_depth=max_depth)
+
+    return {
+        "user_id": user_id,
+        "members": members,
+        "next_after_id": members[-1]["id"] if len(members) == limit else None
+    }
+
+
+@router.get("/{user_id}/downline/summary")
+async def get_downline_summary(user_id: int,
+                               start: Optional[datetime] = None,
+                               end: Optional[datetime] = None,
+                               max_depth: Optional[int] = Query(None, ge=1),
+                               include_self: bool = False,
+                               db: AsyncSession = Depends(get_async_read_db),
+                               current_user: User = Depends(get_current_user_async)):
+    await _check_downline_access(db, current_user, user_id)
+
+    summary = await downline_summary(
+        db,
+        ancestor_id=user_id,
+        start=start,
+        end=end,
+        max_depth=max_depth,
+        include_self=include_self
+    )
+
+    return {
+        "user_id": user_id,
+        "members": summary["members"],
+        "total_members": sum(summary["members"].values()),
+        "volume": from_minor(sum(row["volume_minor"] for row in summary["volume"])),
+        "commission_earned": from_minor(sum(row["earned_minor"] for row in summary["earned"])),
+        "by_service": [
+            {
+                "service_id": row["service_id"],
+                "transactions": row["transactions"],
+                "volume": from_minor(row["volume_minor"])
+            }
+            for row in summary["volume"]
+        ],
+        "earned_by_service": [
+            {"service_id": row["service_id"], "commission_earned": from_minor(row["earned_minor"])}
+            for row in summary["earned"]
+        ]
+    }
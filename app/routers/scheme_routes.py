@@ -1,10 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db, get_async_read_db
 from app.models import Scheme, RoleEnum, User
-from app.routers.auth_routes import get_current_user
+from app.routers.auth_routes import get_current_user, get_current_user_async
 from app.schema.scheme import *
+from app.services.commission_engine import invalidate_scheme_commissions, bump_hierarchy_version
+from app.services.scheme_tree import (
+    bump_tree_version,
+    tree_version,
+    tree_etag,
+    etag_matches,
+    serialized_tree
+)
 
 router = APIRouter(prefix="/scheme", tags=["Scheme Management"])
 
@@ -55,6 +65,7 @@ def create_scheme(
     )
 
     db.add(scheme)
+    bump_tree_version(db)
     db.commit()
     db.refresh(scheme)
 
@@ -68,17 +79,53 @@ def create_scheme(
 # GET ALL SCHEMES
 # -----------------------------
 @router.get("/", response_model=List[SchemeResponse])
-def get_schemes(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def get_schemes(
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     if current_user.role.name == RoleEnum.SUPER_ADMIN:
-        return db.query(Scheme).all()
+        return (await db.scalars(select(Scheme))).all()
 
     # Non-superadmin sees only own tree
-    return db.query(Scheme).filter(
-        Scheme.created_by == current_user.id
-    ).all()
+    return (await db.scalars(
+        select(Scheme).where(Scheme.created_by == current_user.id)
+    )).all()
+
+
+
+# -----------------------------
+# GET SCHEME TREE
+# -----------------------------
+# Declared before /{scheme_id} so "tree" is not parsed as an id
+@router.get("/tree")
+async def get_scheme_tree(
+    with_members: bool = False,
+    if_none_match: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    # Super Admin sees the whole forest, everyone else the subtree of their scheme
+    root_scheme_id = None
+    if current_user.role.name != RoleEnum.SUPER_ADMIN:
+        if not current_user.scheme_id:
+            raise HTTPException(status_code=400, detail="You are not assigned to any scheme")
+        root_scheme_id = current_user.scheme_id
+
+    # Primary, not the replica: a lagging replica would hand back the
+    # pre-write ETag (and 304) right after a write. The body is built at
+    # most once per version, so reading it there too costs little
+    version = await tree_version(db)
+    etag = tree_etag(version, with_members, root_scheme_id)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    return Response(
+        content=await serialized_tree(db, version, with_members, root_scheme_id),
+        media_type="application/json",
+        headers=headers
+    )
 
 
 
@@ -86,12 +133,12 @@ def get_schemes(
 # GET SCHEME BY ID
 # -----------------------------
 @router.get("/{scheme_id}", response_model=SchemeResponse)
-def get_scheme(
+async def get_scheme(
     scheme_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user_async)
 ):
-    scheme = db.query(Scheme).filter(Scheme.id == scheme_id).first()
+    scheme = await db.get(Scheme, scheme_id)
 
     if not scheme:
         raise HTTPException(status_code=404, detail="Scheme not found")
@@ -131,9 +178,13 @@ def update_scheme(
     if payload.is_active is not None:
         scheme.is_active = payload.is_active
 
+    bump_tree_version(db)
+    bump_hierarchy_version(db)
     db.commit()
     db.refresh(scheme)
 
+    invalidate_scheme_commissions(scheme.id)
+
     return scheme
 
 
@@ -168,7 +219,11 @@ def delete_scheme(
         )
 
     db.delete(scheme)
+    bump_tree_version(db)
+    bump_hierarchy_version(db)
     db.commit()
 
+    invalidate_scheme_commissions(scheme_id)
+
     return {"message": "Scheme deleted successfully"}
 
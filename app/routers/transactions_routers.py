@@ -1,19 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-from app.core.database import get_db
-from app.models import Scheme, RoleEnum, User,Transaction,CommissionLedger
-from app.routers.auth_routes import get_current_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Optional
+from app.core.database import get_db, get_async_db, get_async_read_db
+from app.models import Scheme, RoleEnum, User,Transaction,CommissionLedger, SettlementStatusEnum, SettlementOutbox
+from app.routers.auth_routes import get_current_user, get_current_user_async
 from app.schema.transactions import *
-from app.services.commission_engine import settle_commission
+from app.services.commission_engine import settle_commission_async
+from app.services.transaction_batch import process_transaction_batch
+from app.services.transaction_summary import summarize_page
+from app.services.earnings_rollup import subtract_transactions
+from app.services.ledger_export import stream_export, EXPORT_FORMATS
+from app.services.settlement_outbox import enqueue_settlement, get_settlement_status
+from app.core.config import SETTLEMENT_MODE
+from app.utils.money import to_minor, from_minor
 
 router = APIRouter(prefix="/transaction", tags=["transaction Management"])
 
 @router.post("/")
-def create_transaction(
+async def create_transaction(
     payload: TransactionCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     # ❌ Admin / SuperAdmin never initiate transactions
     if current_user.role in {RoleEnum.SUPER_ADMIN, RoleEnum.ADMIN}:
@@ -28,86 +38,169 @@ def create_transaction(
             detail="User is not assigned to any scheme"
         )
 
+    amount_minor = to_minor(payload.amount)
+
     txn = Transaction(
         user_id=current_user.id,
         scheme_id=current_user.scheme_id,
         service_id=payload.service_id,
-        amount=payload.amount
+        amount=from_minor(amount_minor),
+        amount_minor=amount_minor
     )
 
     db.add(txn)
-    db.flush()  # get transaction.id
+    await db.flush()  # get transaction.id
+
+    # ⏳ Outbox mode: commit txn + outbox row, a worker settles it
+    if SETTLEMENT_MODE == "outbox":
+        enqueue_settlement(db=db, transaction=txn)
+        await db.commit()
 
-    # 🔥 Commission settlement (role-agnostic)
-    settle_commission(
+        return {
+            "transaction_id": txn.id,
+            "initiated_by_role": current_user.role,
+            "settlement_status": SettlementStatusEnum.PENDING,
+            "message": "Transaction accepted, settlement pending"
+        }
+
+    # 🔥 Commission settlement (role-agnostic, commits txn + ledgers)
+    await settle_commission_async(
         db=db,
         transaction=txn
     )
 
-    db.commit()
-
     return {
         "transaction_id": txn.id,
         "initiated_by_role": current_user.role,
+        "settlement_status": SettlementStatusEnum.SETTLED,
         "message": "Transaction completed successfully"
     }
 
 
-@router.get("/my-summary")
-def my_transaction_summary(
+@router.post("/batch", response_model=TransactionBatchResponse)
+def create_transactions_batch(
+    payload: TransactionBatchCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # 1. Fetch user transactions
-    transactions = db.query(Transaction).filter(
-        Transaction.user_id == current_user.id
-    ).all()
-
-    response = []
-
-    for txn in transactions:
-        # 2. Fetch commission distribution
-        ledgers = db.query(CommissionLedger).filter(
-            CommissionLedger.transaction_id == txn.id
-        ).all()
-
-        distribution = []
-        my_commission = None
-
-        for ledger in ledgers:
-            entry = {
-                "user_id": ledger.user_id,
-                "role": ledger.role.name if hasattr(ledger.role, "name") else ledger.role,
-                "percent": ledger.commission_percent,
-                "amount": ledger.commission_amount
-            }
-
-            distribution.append(entry)
-
-            if ledger.user_id == current_user.id:
-                my_commission = {
-                    "percent": ledger.commission_percent,
-                    "amount": ledger.commission_amount
-                }
-
-        response.append({
-            "transaction_id": txn.id,
-            "amount": txn.amount,
-            "service_id": txn.service_id,
-            "created_at": txn.created_at,
-            "my_commission": my_commission,
-            "commission_distribution": distribution
-        })
+    # Same entry rules as a single transaction
+    if current_user.role in {RoleEnum.SUPER_ADMIN, RoleEnum.ADMIN}:
+        raise HTTPException(
+            status_code=403,
+            detail="This role cannot initiate transactions"
+        )
+
+    if not current_user.scheme_id:
+        raise HTTPException(
+            status_code=400,
+            detail="User is not assigned to any scheme"
+        )
+
+    results = process_transaction_batch(
+        db=db,
+        user_id=current_user.id,
+        scheme_id=current_user.scheme_id,
+        items=payload.items,
+        outbox=SETTLEMENT_MODE == "outbox"
+    )
+
+    succeeded = sum(1 for result in results if result["status"] != "FAILED")
+
+    return {
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results
+    }
+
+
+@router.get("/my-summary")
+async def my_transaction_summary(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    service_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(SUMMARY_PAGE_SIZE, ge=1, le=MAX_SUMMARY_PAGE_SIZE),
+    with_totals: bool = False,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    # Keyset pages - pass back `next_cursor` for the next one. Totals
+    # scan the whole filtered range (archives included), so only on request
+    try:
+        summary = await summarize_page(
+            db=db,
+            user_id=current_user.id,
+            limit=limit,
+            cursor=cursor,
+            start=start,
+            end=end,
+            service_id=service_id,
+            with_totals=with_totals
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    totals = None
+    if summary["totals"] is not None:
+        totals = {
+            "volume": from_minor(summary["totals"]["volume_minor"]),
+            "commission_earned": from_minor(summary["totals"]["earned_minor"])
+        }
 
     return {
         "user": {
             "id": current_user.id,
             "role": current_user.role.name
         },
-        "transactions": response
+        "totals": totals,
+        "transactions": summary["transactions"],
+        "next_cursor": summary["next_cursor"]
     }
 
 
+@router.get("/export")
+def export_ledger(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    scheme_id: Optional[int] = None,
+    service_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Transactions + commission ledger as CSV / NDJSON for reconciliation,
+    streamed in constant memory. Admins only.
+    """
+    if current_user.role.name not in {RoleEnum.SUPER_ADMIN, RoleEnum.ADMIN}:
+        raise HTTPException(status_code=403, detail="Only admins can export the ledger")
+
+    filename = f"ledger_export.{format}" + (".gz" if gzip else "")
+
+    return StreamingResponse(
+        stream_export(format, gzip, start, end, scheme_id, service_id),
+        media_type="application/gzip" if gzip else EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/{txn_id}/settlement")
+async def transaction_settlement_status(
+    txn_id: int,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    txn = await db.get(Transaction, txn_id)
+    if not txn:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+
+    if current_user.role.name not in {RoleEnum.SUPER_ADMIN, RoleEnum.ADMIN} and txn.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not allowed to view this transaction")
+
+    return await db.run_sync(get_settlement_status, txn.id)
+
+
 @router.delete("/delete/{txn_id}", status_code=204)
 def delete_transaction(
     txn_id: int,
@@ -122,8 +215,10 @@ def delete_transaction(
     if current_user.role.name not in {RoleEnum.SUPER_ADMIN, RoleEnum.ADMIN} and txn.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not allowed to delete this transaction")
 
-    # Delete associated commission ledgers
+    # Delete associated commission ledgers (taking them out of the rollups first)
+    subtract_transactions(db, [txn.id])
     db.query(CommissionLedger).filter(CommissionLedger.transaction_id == txn.id).delete()
+    db.query(SettlementOutbox).filter(SettlementOutbox.transaction_id == txn.id).delete()
 
     # Delete transaction
     db.delete(txn)
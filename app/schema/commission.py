@@ -1,8 +1,9 @@
 # app/schema/commission.py
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import Optional
 from app.models import CommissionTypeEnum
+from app.utils.money import exact_in_hundredths
 
 class CommissionSetup(BaseModel):
     scheme_id: int
@@ -16,6 +17,14 @@ class CommissionSetup(BaseModel):
     retailer: Optional[float] = None
     customer: Optional[float] = None
 
+    @field_validator("admin", "white_label", "master_distributor", "distributor", "retailer", "customer")
+    @classmethod
+    def at_most_two_decimals(cls, value):
+        # Stored as whole bps / paise - 0.125% would otherwise pay 13 bps
+        if value is not None and not exact_in_hundredths(value):
+            raise ValueError("Commission allows at most 2 decimals")
+        return value
+
 class CommissionResponse(BaseModel):
     id: int
     scheme_id: int
@@ -1,6 +1,10 @@
 from typing import List
 from pydantic import BaseModel, EmailStr
 
+# GET /users/{id}/downline page size
+DOWNLINE_PAGE_SIZE = 100
+MAX_DOWNLINE_PAGE_SIZE = 1000
+
 # ---------------------------
 # Pydantic Schemas
 # ---------------------------
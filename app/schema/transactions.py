@@ -1,5 +1,41 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
+from app.utils.money import exact_in_hundredths
+
+# Upper bound for one POST /transaction/batch call
+MAX_BATCH_SIZE = 10000
+
+# GET /transaction/my-summary page size
+SUMMARY_PAGE_SIZE = 50
+MAX_SUMMARY_PAGE_SIZE = 500
+
 
 class TransactionCreate(BaseModel):
     service_id: int
-    amount: float
+    amount: float = Field(..., gt=0, allow_inf_nan=False)
+
+    @field_validator("amount")
+    @classmethod
+    def whole_paise(cls, value):
+        # Stored as integer paise - 10.005 would otherwise be rounded to 10.01
+        if not exact_in_hundredths(value):
+            raise ValueError("Amount allows at most 2 decimals")
+        return value
+
+
+class TransactionBatchCreate(BaseModel):
+    items: List[TransactionCreate] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class TransactionBatchItemResult(BaseModel):
+    index: int
+    status: str                  # SETTLED / PENDING (outbox mode) / FAILED
+    transaction_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class TransactionBatchResponse(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    results: List[TransactionBatchItemResult]
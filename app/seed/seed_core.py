@@ -2,6 +2,7 @@ from sqlalchemy.orm import Session
 from app.core.database import SessionLocal, Base, engine
 from app.models import RoleEnum, Role, Service, User
 from app.utils.auth import hash_password
+from app.services.user_closure import add_user
 
 # -------------------------
 # Create all tables
@@ -63,6 +64,8 @@ def seed_core_data():
                 is_active=True
             )
             db.add(super_admin)
+            db.flush()
+            add_user(db, super_admin.id)
             db.commit()
 
         print("✅ Roles, Services, and Super Admin seeded successfully!")
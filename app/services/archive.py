@@ -0,0 +1,285 @@
+# app/services/archive.py
+"""
+Monthly archival of transactions + their ledgers into attached SQLite
+files, and the lookups readers use to union archives back in.
+
+Moving a month is two separate commits, so a crash can never lose rows:
+  1. copy into the archive file (ATTACHed), idempotent - the file is
+     refilled from scratch on every run
+  2. register the partition + delete from the hot tables, in one transaction
+Until step 2 commits, readers ignore the archive file entirely. Step 2
+deletes only rows that are in the archive, and refuses if the month's
+hot rows changed since step 1 - re-run to copy them again.
+"""
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import create_engine, select, func, text, bindparam, DateTime, insert, and_
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import ARCHIVE_DIR
+from app.models import (
+    Transaction,
+    CommissionLedger,
+    SettlementOutbox,
+    SettlementStatusEnum,
+    ArchivePartition
+)
+
+ARCHIVE_SCHEMA = "archive"
+
+# "CREATE TABLE x" / "CREATE [UNIQUE] INDEX x" -> same object in the archive
+CREATE_PATTERN = re.compile(r"^(CREATE (?:UNIQUE )?(?:TABLE|INDEX)) ")
+
+# Tables moved per month, parents first
+ARCHIVED_TABLES = (Transaction.__table__, CommissionLedger.__table__)
+
+
+def month_bounds(period: str):
+    """'2025-12' -> (2025-12-01, 2026-01-01)"""
+    start = datetime.strptime(period, "%Y-%m")
+    return start, shift_month(start, 1)
+
+
+def shift_month(day: datetime, months: int) -> datetime:
+    index = day.year * 12 + day.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def archive_path(period: str) -> str:
+    return os.path.join(ARCHIVE_DIR, f"ledger_{period.replace('-', '_')}.db")
+
+
+def _range_params(statement: str):
+    return text(statement).bindparams(
+        bindparam("start", type_=DateTime),
+        bindparam("end", type_=DateTime)
+    )
+
+
+def _copy_schema(conn):
+    """
+    Mirror the live DDL (columns, keys, indexes) of the archived tables
+    into the attached file.
+    """
+    for table in ARCHIVED_TABLES:
+        rows = conn.execute(
+            text("SELECT type, sql FROM main.sqlite_master WHERE tbl_name = :name AND sql IS NOT NULL"),
+            {"name": table.name}
+        ).all()
+
+        for _, sql in sorted(rows, key=lambda row: row.type != "table"):
+            conn.execute(text(CREATE_PATTERN.sub(rf"\1 IF NOT EXISTS {ARCHIVE_SCHEMA}.", sql, count=1)))
+
+
+def _copy_month(engine: Engine, path: str, start: datetime, end: datetime) -> dict:
+    """Step 1: copy the month into the archive file and commit it there."""
+    transaction_columns = ", ".join(column.name for column in Transaction.__table__.columns)
+    ledger_columns = ", ".join(column.name for column in CommissionLedger.__table__.columns)
+    ledger_select = ", ".join(f"l.{column.name}" for column in CommissionLedger.__table__.columns)
+
+    with engine.connect() as conn:
+        conn.exec_driver_sql(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (path,))
+        try:
+            _copy_schema(conn)
+
+            # Left over by a run that crashed before step 2
+            for table in reversed(ARCHIVED_TABLES):
+                conn.execute(text(f"DELETE FROM {ARCHIVE_SCHEMA}.{table.name}"))
+
+            transactions = conn.execute(_range_params(
+                f"INSERT INTO {ARCHIVE_SCHEMA}.transactions ({transaction_columns}) "
+                f"SELECT {transaction_columns} FROM main.transactions "
+                "WHERE created_at >= :start AND created_at < :end"
+            ), {"start": start, "end": end}).rowcount
+
+            # Ledgers follow their transaction's month
+            ledgers = conn.execute(_range_params(
+                f"INSERT INTO {ARCHIVE_SCHEMA}.commission_ledger ({ledger_columns}) "
+                f"SELECT {ledger_select} FROM main.commission_ledger l "
+                "JOIN main.transactions t ON t.id = l.transaction_id "
+                "WHERE t.created_at >= :start AND t.created_at < :end"
+            ), {"start": start, "end": end}).rowcount
+
+            conn.commit()
+        finally:
+            conn.exec_driver_sql(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+
+    return {"transactions": transactions, "ledgers": ledgers}
+
+
+def _month_rows(table) -> str:
+    """SELECT of `table`'s hot rows in [:start, :end); ledgers follow their transaction's month."""
+    columns = ", ".join(f"x.{column.name}" for column in table.columns)
+    if table is Transaction.__table__:
+        return f"SELECT {columns} FROM main.transactions x WHERE x.created_at >= :start AND x.created_at < :end"
+    return (
+        f"SELECT {columns} FROM main.{table.name} x "
+        "JOIN main.transactions t ON t.id = x.transaction_id "
+        "WHERE t.created_at >= :start AND t.created_at < :end"
+    )
+
+
+def _archived_rows(table) -> str:
+    columns = ", ".join(column.name for column in table.columns)
+    return f"SELECT {columns} FROM {ARCHIVE_SCHEMA}.{table.name}"
+
+
+def _move_month(engine: Engine, path: str, period: str, start: datetime, end: datetime) -> dict:
+    """
+    Step 2: register the partition and delete exactly the archived rows
+    from the hot tables, in one transaction.
+    """
+    params = {"start": start, "end": end}
+
+    with engine.connect() as conn:
+        conn.exec_driver_sql(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (path,))
+        try:
+            counts = {
+                key: conn.scalar(text(f"SELECT COUNT(*) FROM {ARCHIVE_SCHEMA}.{table.name}"))
+                for key, table in zip(("transactions", "ledgers"), ARCHIVED_TABLES)
+            }
+
+            # The first write takes SQLite's write lock: from here on no
+            # transaction or ledger can land in the month until we commit
+            conn.execute(insert(ArchivePartition).values(
+                period=period,
+                path=os.path.abspath(path),
+                range_start=start,
+                range_end=end,
+                archived_at=datetime.utcnow(),
+                **counts
+            ))
+
+            # Rows written, changed or deleted in the month since step 1
+            for table in ARCHIVED_TABLES:
+                hot, archived = _month_rows(table), _archived_rows(table)
+                changed = conn.execute(_range_params(
+                    f"SELECT (SELECT COUNT(*) FROM ({hot} EXCEPT {archived})) "
+                    f"+ (SELECT COUNT(*) FROM ({archived} EXCEPT {hot}))"
+                ), params).scalar()
+                if changed:
+                    conn.rollback()
+                    raise ValueError(
+                        f"{period}: {changed} {table.name} rows changed while the month was copied - re-run"
+                    )
+
+            archived_ids = f"SELECT id FROM {ARCHIVE_SCHEMA}.transactions"
+            conn.execute(text(
+                f"DELETE FROM main.commission_ledger WHERE id IN (SELECT id FROM {ARCHIVE_SCHEMA}.commission_ledger)"
+            ))
+            conn.execute(text(f"DELETE FROM main.settlement_outbox WHERE transaction_id IN ({archived_ids})"))
+            conn.execute(text(f"DELETE FROM main.transactions WHERE id IN ({archived_ids})"))
+            conn.commit()
+        finally:
+            conn.exec_driver_sql(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+
+    return counts
+
+
+def archive_month(engine: Engine, db: Session, period: str, now: datetime = None) -> dict:
+    """
+    Move one closed month out of the hot tables. Safe to re-run after a
+    crash at any point.
+    """
+    if engine.dialect.name != "sqlite":
+        raise ValueError("Archival to attached files needs a SQLite primary database")
+
+    if db.scalar(select(ArchivePartition.id).where(ArchivePartition.period == period)) is not None:
+        return {"period": period, "skipped": True}
+
+    start, end = month_bounds(period)
+    if end > (now or datetime.utcnow()):
+        raise ValueError(f"{period} is not closed yet - only past months can be archived")
+
+    in_month = and_(Transaction.created_at >= start, Transaction.created_at < end)
+
+    unsettled = db.scalar(
+        select(func.count(SettlementOutbox.id))
+        .join(Transaction, Transaction.id == SettlementOutbox.transaction_id)
+        .where(in_month, SettlementOutbox.status != SettlementStatusEnum.SETTLED)
+    )
+    if unsettled:
+        raise ValueError(f"{period} has {unsettled} unsettled outbox entries - drain them before archiving")
+
+    # Step 2 runs on its own connection - don't hold a read snapshot here
+    db.rollback()
+
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = archive_path(period)
+    _copy_month(engine, path, start, end)
+    moved = _move_month(engine, path, period, start, end)
+
+    return {"period": period, **moved}
+
+
+def closed_periods(db: Session, keep_months: int, now: datetime = None) -> list:
+    """
+    Months with hot rows that fall entirely before the open window
+    (current month + `keep_months` before it).
+    """
+    cutoff = shift_month(now or datetime.utcnow(), -keep_months)
+    month = func.strftime("%Y-%m", Transaction.created_at)
+
+    return list(db.scalars(
+        select(month)
+        .where(Transaction.created_at < cutoff)
+        .group_by(month)
+        .order_by(month)
+    ))
+
+
+# -----------------------------
+# Read side
+# -----------------------------
+def _partitions_query(start: datetime = None, end: datetime = None):
+    """Registered archives overlapping [start, end), oldest first."""
+    query = select(ArchivePartition).order_by(ArchivePartition.range_start)
+    if start is not None:
+        query = query.where(ArchivePartition.range_end > start)
+    if end is not None:
+        query = query.where(ArchivePartition.range_start < end)
+    return query
+
+
+async def partitions_for_range(db: AsyncSession, start: datetime = None, end: datetime = None) -> list:
+    """Registered archives overlapping [start, end) - none for a hot-only range."""
+    return list((await db.scalars(_partitions_query(start, end))).all())
+
+
+def partitions_in_range(db: Session, start: datetime = None, end: datetime = None) -> list:
+    """Sync partitions_for_range, for jobs and streaming exports."""
+    return list(db.scalars(_partitions_query(start, end)).all())
+
+
+_archive_engines = {}
+_archive_engines_lock = threading.Lock()
+
+
+def archive_async_engine(path: str):
+    """Read-only async engine per archive file, created once per process."""
+    with _archive_engines_lock:
+        engine = _archive_engines.get(path)
+        if engine is None:
+            engine = _archive_engines[path] = create_async_engine(
+                f"sqlite+aiosqlite:///file:{path}?mode=ro&uri=true"
+            )
+        return engine
+
+
+def archive_session(partition: ArchivePartition) -> AsyncSession:
+    return AsyncSession(bind=archive_async_engine(partition.path), expire_on_commit=False)
+
+
+@contextmanager
+def archive_connection(path: str):
+    """Short-lived read-only sync connection to one archive file, for jobs."""
+    engine = create_engine(f"sqlite:///file:{path}?mode=ro&uri=true")
+    try:
+        with engine.connect() as conn:
+            yield conn
+    finally:
+        engine.dispose()
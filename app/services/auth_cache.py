@@ -0,0 +1,118 @@
+# app/services/auth_cache.py
+"""
+Per-process caches behind get_current_user: verified JWT payloads and
+the resolved principal, so a warm authenticated request only reads the
+`principals` version counter.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS
+from app.models import User, RoleEnum
+from app.utils.auth import decode_access_token
+from app.services.cache_versions import bump_version, current_version, current_version_async
+from app.utils.ttl_cache import TTLCache
+
+
+@dataclass(frozen=True)
+class PrincipalRole:
+    id: int
+    name: RoleEnum
+    level: int
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Immutable stand-in for the authenticated User: the fields routes read
+    (`id`, `role.name`, `scheme_id`, ...), detached from any session.
+    """
+    id: int
+    role: PrincipalRole | None
+    scheme_id: int | None
+    parent_id: int | None
+    is_active: bool
+
+
+# token -> payload
+_verified_tokens = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+# user_id -> Principal
+_principals = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+
+def verify_token(token: str) -> dict | None:
+    payload = _verified_tokens.get(token)
+    if payload is not None:
+        return payload
+
+    payload = decode_access_token(token)
+    if payload:
+        # Never outlive the token itself
+        _verified_tokens.put(token, payload, ttl=payload.get("exp", 0) - time.time())
+    return payload
+
+
+def principal_from_user(user: User) -> Principal:
+    role = user.role
+    return Principal(
+        id=user.id,
+        role=PrincipalRole(id=role.id, name=role.name, level=role.level) if role else None,
+        scheme_id=user.scheme_id,
+        parent_id=user.parent_id,
+        is_active=user.is_active
+    )
+
+
+def cached_principal(user_id: int) -> Principal | None:
+    return _principals.get(user_id)
+
+
+def principal_generation() -> int:
+    return _principals.generation
+
+
+def remember_principal(principal: Principal, generation: int):
+    # Skipped if the user changed while it was being loaded
+    _principals.put(principal.id, principal, generation=generation)
+
+
+def invalidate_principal(user_id: int):
+    _principals.invalidate(user_id)
+
+
+# -----------------------------
+# Cross-process invalidation
+# -----------------------------
+# invalidate_principal only reaches this process. Status changes and
+# deletes also bump this counter, and get_current_user drops every
+# cached principal once it moved - a deleted user is refused by every
+# worker as soon as the delete commits, not after the TTL.
+PRINCIPALS = "principals"
+
+_principals_version = None
+_principals_version_lock = threading.Lock()
+
+
+def bump_principals_version(db):
+    """A user status change or delete other processes must see. Call before commit."""
+    bump_version(db, PRINCIPALS)
+
+
+def _apply_principals_version(version: int):
+    global _principals_version
+    with _principals_version_lock:
+        # Never step back: a lagging read must not undo a newer clear
+        if _principals_version is not None and version <= _principals_version:
+            return
+        _principals.clear()
+        _principals_version = version
+
+
+def sync_principal_cache(db):
+    _apply_principals_version(current_version(db, PRINCIPALS))
+
+
+async def sync_principal_cache_async(db: AsyncSession):
+    _apply_principals_version(await current_version_async(db, PRINCIPALS))
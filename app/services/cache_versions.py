@@ -0,0 +1,63 @@
+# app/services/cache_versions.py
+"""
+Named version counters (cache_versions) for process-local caches.
+
+A writer bumps the counter in the same DB transaction as its change;
+every process compares the counter with the version its cache was built
+at, so an API worker or settlement worker notices a change another
+process committed.
+"""
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.dialects import sqlite, postgresql, mysql
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import CacheVersion
+
+
+def _on_conflict_bump(dialect_insert, name: str):
+    """INSERT ... ON CONFLICT (name) DO UPDATE - SQLite / PostgreSQL."""
+    statement = dialect_insert(CacheVersion).values(name=name, version=1, updated_at=datetime.utcnow())
+    return statement.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"version": CacheVersion.version + 1, "updated_at": statement.excluded.updated_at}
+    )
+
+
+def _on_duplicate_key_bump(name: str):
+    """INSERT ... ON DUPLICATE KEY UPDATE - MySQL."""
+    statement = mysql.insert(CacheVersion).values(name=name, version=1, updated_at=datetime.utcnow())
+    return statement.on_duplicate_key_update(
+        version=CacheVersion.version + 1,
+        updated_at=statement.inserted.updated_at
+    )
+
+
+# Same backends as earnings_rollup's upserts
+_DIALECT_BUMPS = {
+    "sqlite": lambda name: _on_conflict_bump(sqlite.insert, name),
+    "postgresql": lambda name: _on_conflict_bump(postgresql.insert, name),
+    "mysql": _on_duplicate_key_bump,
+}
+
+
+def bump_version(db, name: str):
+    """
+    +1 on `name`, creating it at 1. One upsert, so two first writers
+    can't race each other into a duplicate key. Call before the
+    writer's commit.
+    """
+    dialect = db.dialect if isinstance(db, Connection) else db.get_bind().dialect
+    db.execute(_DIALECT_BUMPS[dialect.name](name))
+
+
+def _version_query(name: str):
+    return select(CacheVersion.version).where(CacheVersion.name == name)
+
+
+def current_version(db, name: str) -> int:
+    return db.scalar(_version_query(name)) or 0
+
+
+async def current_version_async(db: AsyncSession, name: str) -> int:
+    return await db.scalar(_version_query(name)) or 0
@@ -1,58 +1,217 @@
 # app/services/commission_engine.py
-from sqlalchemy.orm import Session
-from app.models import SchemeCommission, User,Scheme, Transaction,CommissionLedger
-from app.models.models import CommissionTypeEnum,RoleEnum
-from app.utils.role_hierarchy import ROLE_FIELD_MAP,ROLE_LEVEL
-
-# app/services/commission_engine.py
-from sqlalchemy.orm import Session
-from app.models import SchemeCommission, Scheme
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import NamedTuple
+from sqlalchemy import select, literal, and_, true
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import SchemeCommission, User, Scheme, Service, Role, Transaction, CommissionLedger
+from app.models.models import CommissionTypeEnum, RoleEnum
 from app.utils.role_hierarchy import ROLE_FIELD_MAP, ROLE_LEVEL
+from app.utils.hierarchy_cache import HierarchyCache
+from app.utils.money import to_minor, from_minor, to_bps, from_bps, commission_minor
+from app.core.config import SETTLEMENT_LOG_SAMPLE_RATE
+from app.services.earnings_rollup import rollup_deltas, apply_rollup, apply_rollup_async
+from app.services.cache_versions import bump_version, current_version, current_version_async
+from app.core.metrics import (
+    stage_timer,
+    SETTLEMENT_SECONDS,
+    SETTLEMENT_TRANSACTIONS,
+    SETTLEMENT_LEDGER_ROWS
+)
 
+logger = logging.getLogger(__name__)
 
-def resolve_absolute_commission(db: Session, scheme: Scheme, service_id: int) -> dict:
-    resolved = {}
 
-    def get_root(s):
-        while s.parent_scheme:
-            s = s.parent_scheme
-        return s
+# Guards the recursive walk against a corrupted (cyclic) scheme tree
+MAX_SCHEME_DEPTH = 32
 
-    root_scheme = get_root(scheme)
 
-    for role, field in ROLE_FIELD_MAP.items():
-        current_scheme = scheme
+class HierarchyDepthExceeded(RuntimeError):
+    """A recursive walk hit its depth cap - the tree is cyclic or too deep."""
+
+
+def _check_scheme_chain(rows, scheme_id: int):
+    """
+    The walk stops at MAX_SCHEME_DEPTH; a level there that still has a
+    parent means the chain was cut short - never settle on part of it.
+    """
+    for row in rows:
+        if row.depth >= MAX_SCHEME_DEPTH and row.parent_scheme_id is not None:
+            logger.error("Scheme %s: ancestor chain exceeds %d levels", scheme_id, MAX_SCHEME_DEPTH)
+            raise HierarchyDepthExceeded(
+                f"Scheme {scheme_id} has more than {MAX_SCHEME_DEPTH} ancestors - is the scheme tree cyclic?"
+            )
 
-        # Walk hierarchy
-        while current_scheme:
-            record = db.query(SchemeCommission).filter(
-                SchemeCommission.scheme_id == current_scheme.id,
-                SchemeCommission.service_id == service_id
-            ).first()
 
-            if record:
-                value = getattr(record, field)
-                if value is not None:
-                    resolved[role] = value
-                    break
+def _scheme_chain_cte(scheme_id: int):
+    """`scheme_id` and its ancestors up to the root, with their depth."""
+    chain = (
+        select(
+            Scheme.id,
+            Scheme.name,
+            Scheme.parent_scheme_id,
+            literal(0).label("depth")
+        )
+        .where(Scheme.id == scheme_id)
+        .cte("scheme_chain", recursive=True)
+    )
+
+    parent = aliased(Scheme)
+    return chain.union_all(
+        select(
+            parent.id,
+            parent.name,
+            parent.parent_scheme_id,
+            chain.c.depth + 1
+        )
+        .where(
+            parent.id == chain.c.parent_scheme_id,
+            chain.c.depth < MAX_SCHEME_DEPTH
+        )
+    )
 
-            current_scheme = current_scheme.parent_scheme
 
-        # Root fallback
-        if role not in resolved:
-            root_record = db.query(SchemeCommission).filter(
-                SchemeCommission.scheme_id == root_scheme.id,
+def _chain_level(row, fields: list) -> dict:
+    return {
+        "scheme_id": row.id,
+        "scheme_name": row.name,
+        "parent_scheme_id": row.parent_scheme_id,
+        "commission": (
+            {field: getattr(row, field) for field in fields}
+            if row.commission_id is not None else None
+        )
+    }
+
+
+def fetch_commission_chain(db: Session, scheme_id: int, service_id: int) -> list:
+    """
+    Scheme chain from `scheme_id` up to its root, each level joined with
+    its commission row for the service - one recursive CTE round trip.
+    Ordered child -> root. `commission` is None when a level has no row.
+    """
+    chain = _scheme_chain_cte(scheme_id)
+
+    fields = list(ROLE_FIELD_MAP.values())
+    rows = db.execute(
+        select(
+            chain.c.id,
+            chain.c.name,
+            chain.c.parent_scheme_id,
+            chain.c.depth,
+            SchemeCommission.id.label("commission_id"),
+            *[getattr(SchemeCommission, field) for field in fields]
+        )
+        .select_from(chain)
+        .outerjoin(
+            SchemeCommission,
+            and_(
+                SchemeCommission.scheme_id == chain.c.id,
                 SchemeCommission.service_id == service_id
-            ).first()
+            )
+        )
+        .order_by(chain.c.depth)
+    ).all()
+
+    _check_scheme_chain(rows, scheme_id)
+    return [_chain_level(row, fields) for row in rows]
+
+
+def fetch_commission_matrix(db: Session, scheme_id: int) -> dict:
+    """
+    fetch_commission_chain for every service at once: the ancestor chain
+    x services, outer joined with scheme_commissions - one round trip.
+    service_id -> {"service_code", "service_name", "chain"}, by service id.
+    """
+    chain = _scheme_chain_cte(scheme_id)
+
+    fields = list(ROLE_FIELD_MAP.values())
+    rows = db.execute(
+        select(
+            Service.id.label("service_id"),
+            Service.code.label("service_code"),
+            Service.name.label("service_name"),
+            chain.c.id,
+            chain.c.name,
+            chain.c.parent_scheme_id,
+            chain.c.depth,
+            SchemeCommission.id.label("commission_id"),
+            *[getattr(SchemeCommission, field) for field in fields]
+        )
+        .select_from(chain)
+        .join(Service, true())
+        .outerjoin(
+            SchemeCommission,
+            and_(
+                SchemeCommission.scheme_id == chain.c.id,
+                SchemeCommission.service_id == Service.id
+            )
+        )
+        .order_by(Service.id, chain.c.depth)
+    ).all()
+
+    _check_scheme_chain(rows, scheme_id)
+
+    matrix = {}
+    for row in rows:
+        service = matrix.setdefault(row.service_id, {
+            "service_code": row.service_code,
+            "service_name": row.service_name,
+            "chain": []
+        })
+        service["chain"].append(_chain_level(row, fields))
+
+    return matrix
+
+
+def fetch_scheme_subtree(db: Session, scheme_id: int) -> list:
+    """
+    `scheme_id` and every descendant scheme id, in one recursive CTE.
+    """
+    subtree = (
+        select(Scheme.id, literal(0).label("depth"))
+        .where(Scheme.id == scheme_id)
+        .cte("scheme_subtree", recursive=True)
+    )
+
+    child = aliased(Scheme)
+    subtree = subtree.union_all(
+        select(child.id, subtree.c.depth + 1)
+        .where(
+            child.parent_scheme_id == subtree.c.id,
+            subtree.c.depth < MAX_SCHEME_DEPTH
+        )
+    )
 
-            if root_record:
-                value = getattr(root_record, field)
-                if value is not None:
-                    resolved[role] = value
+    return list(db.scalars(select(subtree.c.id).order_by(subtree.c.depth, subtree.c.id)))
+
+
+def merge_commission_chain(chain: list) -> dict:
+    """
+    First non-null value per role wins, walking child -> root.
+    The root is the last level, so it is the final fallback.
+    """
+    resolved = {}
+
+    for role, field in ROLE_FIELD_MAP.items():
+        for level in chain:
+            commission = level["commission"]
+            if commission and commission[field] is not None:
+                resolved[role] = commission[field]
+                break
 
     return resolved
 
 
+def resolve_absolute_commission(db: Session, scheme: Scheme, service_id: int) -> dict:
+    chain = fetch_commission_chain(db=db, scheme_id=scheme.id, service_id=service_id)
+    return merge_commission_chain(chain)
+
+
 
 
 
@@ -86,55 +245,406 @@ def calculate_commission_earnings(absolute: dict) -> dict:
 
 
 
-def calculate_commission(amount, percent, commission_type):
-    if commission_type == CommissionTypeEnum.PERCENTAGE:
-        return round((amount * percent) / 100, 2)
-    return round(percent, 2)
+# -----------------------------
+# Compiled commission cache
+# -----------------------------
+@dataclass(frozen=True)
+class CompiledCommission:
+    """
+    Resolved commission config for one (scheme, service).
+    `absolute` and `earnings` are shared between callers - never mutate them.
+    `earnings_bps` is the same margin in integer basis points.
+    """
+    scheme_id: int
+    service_id: int
+    absolute: dict
+    earnings: dict
+    earnings_bps: dict
+    scheme_chain: tuple
 
 
+# (scheme_id, service_id) -> CompiledCommission
+_compiled_commissions = HierarchyCache()
 
-def settle_commission(db: Session, transaction: Transaction):
-    user = db.query(User).get(transaction.user_id)
 
-    # Step 1: Resolve absolute commission
-    absolute = resolve_absolute_commission(
-        db=db,
-        scheme=user.scheme,
-        service_id=transaction.service_id
+def resolve_compiled_commission(db: Session, scheme_id: int, service_id: int) -> CompiledCommission:
+    """
+    Absolute + margin commission for a scheme/service, served from memory.
+    Falls back to the hierarchy walk on a cache miss.
+    """
+    key = (scheme_id, service_id)
+    compiled = _compiled_commissions.get(key)
+    if compiled is not None:
+        return compiled
+
+    generation = _compiled_commissions.generation
+
+    chain = fetch_commission_chain(db=db, scheme_id=scheme_id, service_id=service_id)
+    absolute = merge_commission_chain(chain)
+    scheme_chain = [level["scheme_id"] for level in chain]
+
+    compiled = CompiledCommission(
+        scheme_id=scheme_id,
+        service_id=service_id,
+        absolute=absolute,
+        earnings=calculate_commission_earnings(absolute),
+        earnings_bps=calculate_commission_earnings(absolute_bps(absolute)),
+        scheme_chain=tuple(scheme_chain)
     )
-    
-    print("Absolute Commissions:", absolute)
-
-    # Step 2: Convert to margin
-    earnings = calculate_commission_earnings(absolute)
-    print("Earnings Distribution:", earnings)
-
-    # Step 3: Pay only real users in hierarchy
-    current = user
-    while current:
-        role_enum = RoleEnum[current.role.name]
-
-        percent = earnings.get(role_enum)
-        if percent and percent > 0:
-            amount = calculate_commission(
-                transaction.amount,
-                percent,
-                CommissionTypeEnum.PERCENTAGE
+
+    # A scheme that does not exist yet has no chain to invalidate through,
+    # so only remember resolutions backed by real rows
+    if scheme_chain:
+        _compiled_commissions.put(key, compiled, scheme_chain, generation=generation)
+
+    return compiled
+
+
+def invalidate_scheme_commissions(scheme_id: int):
+    """
+    Drop every compiled entry that inherits from `scheme_id`
+    (the scheme itself and all of its descendants).
+    """
+    _compiled_commissions.invalidate(scheme_id)
+
+
+# -----------------------------
+# Cached payee (upline) chain
+# -----------------------------
+# Guards the recursive walk against a corrupted (cyclic) user tree
+MAX_USER_DEPTH = 32
+
+
+class Payee(NamedTuple):
+    user_id: int
+    role: RoleEnum | None
+    scheme_id: int | None
+    parent_id: int | None = None
+
+
+def fetch_payee_chain(db: Session, user_id: int) -> list:
+    """
+    The user followed by every ancestor up to the root, with role names,
+    in one recursive CTE round trip. Ordered user -> root. Raises
+    HierarchyDepthExceeded rather than return a chain cut at MAX_USER_DEPTH.
+    """
+    chain = (
+        select(
+            User.id,
+            User.role_id,
+            User.scheme_id,
+            User.parent_id,
+            literal(0).label("depth")
+        )
+        .where(User.id == user_id)
+        .cte("payee_chain", recursive=True)
+    )
+
+    parent = aliased(User)
+    chain = chain.union_all(
+        select(
+            parent.id,
+            parent.role_id,
+            parent.scheme_id,
+            parent.parent_id,
+            chain.c.depth + 1
+        )
+        .where(
+            parent.id == chain.c.parent_id,
+            chain.c.depth < MAX_USER_DEPTH
+        )
+    )
+
+    rows = db.execute(
+        select(chain.c.id, Role.name, chain.c.scheme_id, chain.c.parent_id, chain.c.depth)
+        .select_from(chain)
+        .outerjoin(Role, Role.id == chain.c.role_id)
+        .order_by(chain.c.depth)
+    ).all()
+
+    # A deleted upline also leaves a parent_id behind - only the cap is an error
+    if rows and rows[-1].depth >= MAX_USER_DEPTH and rows[-1].parent_id is not None:
+        logger.error("User %s: upline exceeds %d levels", user_id, MAX_USER_DEPTH)
+        raise HierarchyDepthExceeded(
+            f"User {user_id} has more than {MAX_USER_DEPTH} uplines - is the user tree cyclic?"
+        )
+
+    return [
+        Payee(
+            user_id=row.id,
+            role=row.name,
+            scheme_id=row.scheme_id,
+            parent_id=row.parent_id
+        )
+        for row in rows
+    ]
+
+
+def payee_chain_complete(chain) -> bool:
+    """
+    False when the initiator no longer exists (empty chain) or the walk
+    stopped at a deleted upline user (the last payee still has a parent).
+    Ledgers of such transactions can't be recomputed.
+    """
+    return bool(chain) and chain[-1].parent_id is None
+
+
+# user_id -> tuple of Payee
+_payee_chains = HierarchyCache()
+
+
+def resolve_payee_chain(db: Session, user_id: int) -> tuple:
+    chain = _payee_chains.get(user_id)
+    if chain is not None:
+        return chain
+
+    generation = _payee_chains.generation
+    chain = tuple(fetch_payee_chain(db=db, user_id=user_id))
+
+    if chain:
+        _payee_chains.put(
+            user_id,
+            chain,
+            [payee.user_id for payee in chain],
+            generation=generation
+        )
+
+    return chain
+
+
+def invalidate_user_payees(user_id: int):
+    """
+    Drop the cached chain of `user_id` and of everyone below it.
+    """
+    _payee_chains.invalidate(user_id)
+
+
+# -----------------------------
+# Cross-process invalidation
+# -----------------------------
+# The invalidate_* calls above only reach the process that made the
+# change. Writers also bump this counter in their DB transaction, and
+# every settlement path compares it with the version the caches were
+# filled at - one primary-key read - before resolving anything.
+COMMISSION_HIERARCHY = "commission_hierarchy"
+
+_hierarchy_version = None
+_hierarchy_version_lock = threading.Lock()
+
+
+def bump_hierarchy_version(db):
+    """A commission, scheme or user change other processes must see. Call before commit."""
+    bump_version(db, COMMISSION_HIERARCHY)
+
+
+def _apply_hierarchy_version(version: int):
+    global _hierarchy_version
+    with _hierarchy_version_lock:
+        # Never step back: a lagging read must not undo a newer clear
+        if _hierarchy_version is not None and version <= _hierarchy_version:
+            return
+        _compiled_commissions.clear()
+        _payee_chains.clear()
+        _hierarchy_version = version
+
+
+def sync_hierarchy_caches(db: Session) -> int:
+    """
+    Drop both caches if another process changed the hierarchy since they
+    were filled. Returns the version read.
+    """
+    version = current_version(db, COMMISSION_HIERARCHY)
+    _apply_hierarchy_version(version)
+    return version
+
+
+async def sync_hierarchy_caches_async(db: AsyncSession):
+    _apply_hierarchy_version(await current_version_async(db, COMMISSION_HIERARCHY))
+
+
+def absolute_bps(absolute: dict) -> dict:
+    return {role: to_bps(value) for role, value in absolute.items()}
+
+
+def calculate_commission(amount, percent, commission_type):
+    """
+    Float facade over the integer path: paise x basis points,
+    rounded once, half to even.
+    """
+    return from_minor(commission_minor(to_minor(amount), to_bps(percent), commission_type))
+
+
+def build_ledger_rows(transaction_id: int, amount_minor: int, service_id: int,
+                      earnings_bps: dict, payees) -> list:
+    """
+    CommissionLedger column values for one transaction.
+    Plain dicts so callers can either build ORM rows or bulk insert.
+    Integer columns are the source of truth, floats mirror them.
+    """
+    rows = []
+
+    for payee in payees:
+        bps = earnings_bps.get(payee.role)
+        if bps and bps > 0:
+            amount = commission_minor(amount_minor, bps, CommissionTypeEnum.PERCENTAGE)
+            rows.append({
+                "transaction_id": transaction_id,
+                "user_id": payee.user_id,
+                "role": payee.role,
+                "scheme_id": payee.scheme_id,
+                "service_id": service_id,
+                "commission_type": CommissionTypeEnum.PERCENTAGE,
+                "commission_bps": bps,
+                "commission_amount_minor": amount,
+                "commission_percent": from_bps(bps),
+                "commission_amount": from_minor(amount)
+            })
+
+    return rows
+
+
+def _log_sampled() -> bool:
+    # Level check first: with DEBUG off this never touches the RNG
+    return logger.isEnabledFor(logging.DEBUG) and random.random() < SETTLEMENT_LOG_SAMPLE_RATE
+
+
+def _settlement_ledger_rows(transaction: Transaction, compiled: CompiledCommission, payees) -> list:
+    """
+    Margin maths for one transaction (shared by the sync and async
+    settlement paths - no I/O; the caller inserts the rows).
+    """
+    service_id = transaction.service_id
+
+    if _log_sampled():
+        logger.debug(
+            "Transaction %s scheme %s service %s: absolute=%s earnings=%s",
+            transaction.id, transaction.scheme_id, service_id,
+            compiled.absolute, compiled.earnings
+        )
+
+    if transaction.amount_minor is None:
+        transaction.amount_minor = to_minor(transaction.amount)
+
+    with stage_timer("margin", service_id):
+        ledger_rows = build_ledger_rows(
+            transaction_id=transaction.id,
+            amount_minor=transaction.amount_minor,
+            service_id=service_id,
+            earnings_bps=compiled.earnings_bps,
+            payees=payees
+        )
+
+    # Stamped here so the rollup day matches the ledger rows exactly
+    now = datetime.utcnow()
+    for row in ledger_rows:
+        row["created_at"] = now
+
+    return ledger_rows
+
+
+def _record_settlement(service_id: int, started: float, ledger_count: int):
+    SETTLEMENT_SECONDS.labels(service_id=str(service_id)).observe(time.perf_counter() - started)
+    SETTLEMENT_TRANSACTIONS.labels(service_id=str(service_id), outcome="settled").inc()
+    SETTLEMENT_LEDGER_ROWS.labels(service_id=str(service_id)).inc(ledger_count)
+
+
+def _record_failure(service_id: int):
+    SETTLEMENT_TRANSACTIONS.labels(service_id=str(service_id), outcome="failed").inc()
+
+
+def settle_commission(db: Session, transaction: Transaction):
+    service_id = transaction.service_id
+    started = time.perf_counter()
+
+    try:
+        # Step 1 + 2: Absolute commission and margins (cached per scheme/service)
+        with stage_timer("resolve", service_id):
+            sync_hierarchy_caches(db)
+            compiled = resolve_compiled_commission(
+                db=db,
+                scheme_id=transaction.scheme_id,
+                service_id=service_id
             )
 
-            ledger = CommissionLedger(
-                transaction_id=transaction.id,
-                user_id=current.id,
-                role=role_enum,
-                scheme_id=current.scheme_id,
-                service_id=transaction.service_id,
-                commission_type=CommissionTypeEnum.PERCENTAGE,
-                commission_percent=percent,
-                commission_amount=amount
+        # Step 3: Pay only real users in hierarchy (cached upline, no lazy loads)
+        with stage_timer("upline_walk", service_id):
+            payees = resolve_payee_chain(db=db, user_id=transaction.user_id)
+
+        ledger_rows = _settlement_ledger_rows(transaction, compiled, payees)
+
+        # Flushed here: with autoflush off the INSERTs would otherwise
+        # run (and be timed) under "commit"
+        with stage_timer("ledger_insert", service_id):
+            db.add_all([CommissionLedger(**row) for row in ledger_rows])
+            db.flush()
+
+        # Same DB transaction as the ledger rows
+        with stage_timer("rollup", service_id):
+            apply_rollup(db, rollup_deltas(ledger_rows))
+
+        with stage_timer("commit", service_id):
+            db.commit()
+    except Exception:
+        _record_failure(service_id)
+        raise
+
+    _record_settlement(service_id, started, len(ledger_rows))
+
+
+# -----------------------------
+# Async settlement
+# -----------------------------
+async def resolve_compiled_commission_async(db: AsyncSession, scheme_id: int,
+                                            service_id: int) -> CompiledCommission:
+    compiled = _compiled_commissions.get((scheme_id, service_id))
+    if compiled is not None:
+        return compiled
+
+    # Miss: run the sync resolver on this session's connection
+    return await db.run_sync(resolve_compiled_commission, scheme_id, service_id)
+
+
+async def resolve_payee_chain_async(db: AsyncSession, user_id: int) -> tuple:
+    chain = _payee_chains.get(user_id)
+    if chain is not None:
+        return chain
+
+    return await db.run_sync(resolve_payee_chain, user_id)
+
+
+async def settle_commission_async(db: AsyncSession, transaction: Transaction):
+    """
+    settle_commission for an AsyncSession: cache hits never leave the
+    event loop, misses and the commit await the driver.
+    """
+    service_id = transaction.service_id
+    started = time.perf_counter()
+
+    try:
+        with stage_timer("resolve", service_id):
+            await sync_hierarchy_caches_async(db)
+            compiled = await resolve_compiled_commission_async(
+                db=db,
+                scheme_id=transaction.scheme_id,
+                service_id=service_id
             )
 
-            db.add(ledger)
+        with stage_timer("upline_walk", service_id):
+            payees = await resolve_payee_chain_async(db=db, user_id=transaction.user_id)
+
+        ledger_rows = _settlement_ledger_rows(transaction, compiled, payees)
+
+        with stage_timer("ledger_insert", service_id):
+            db.add_all([CommissionLedger(**row) for row in ledger_rows])
+            await db.flush()
+
+        with stage_timer("rollup", service_id):
+            await apply_rollup_async(db, rollup_deltas(ledger_rows))
 
-        current = current.parent
+        with stage_timer("commit", service_id):
+            await db.commit()
+    except Exception:
+        _record_failure(service_id)
+        raise
 
-    db.commit()
+    _record_settlement(service_id, started, len(ledger_rows))
@@ -0,0 +1,178 @@
+# app/services/commission_simulator.py
+from datetime import datetime
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models import Transaction, CommissionTypeEnum
+from app.schema.commission import CommissionSetup
+from app.services.commission_engine import (
+    fetch_commission_chain,
+    fetch_scheme_subtree,
+    merge_commission_chain,
+    calculate_commission_earnings,
+    absolute_bps
+)
+from app.services.settlement_kernel import (
+    KERNEL_ROLES,
+    SettlementPlan,
+    build_earnings_matrix,
+    compute_ledger_amounts
+)
+from app.services.ledger_replay import split_orphaned
+from app.utils.role_hierarchy import ROLE_FIELD_MAP
+from app.utils.money import from_minor
+
+SIMULATION_CHUNK_SIZE = 100000
+
+
+def apply_commission_override(chain: list, proposal: CommissionSetup) -> list:
+    """
+    Copy of `chain` with the proposal applied the way set_commission
+    would upsert it: only non-null payload fields overwrite the row.
+    """
+    overridden = []
+
+    for level in chain:
+        if level["scheme_id"] == proposal.scheme_id:
+            commission = dict(level["commission"] or {field: None for field in ROLE_FIELD_MAP.values()})
+            for field in ROLE_FIELD_MAP.values():
+                value = getattr(proposal, field)
+                if value is not None:
+                    commission[field] = value
+            level = {**level, "commission": commission}
+        overridden.append(level)
+
+    return overridden
+
+
+def simulate_commission_change(db: Session, proposal: CommissionSetup,
+                               start: datetime = None, end: datetime = None,
+                               chunk_size: int = SIMULATION_CHUNK_SIZE) -> dict:
+    """
+    Replay historical transactions of the proposal's scheme subtree under
+    the current and the proposed config and report the payout delta.
+    Read-only: the proposal only exists in memory, nothing is written.
+
+    Transactions whose initiator or an upline user was deleted are only
+    counted (`orphaned`) - replay never rewrites their ledgers.
+    """
+    # Settlement pays every rate as a percentage of the amount
+    if proposal.commission_type != CommissionTypeEnum.PERCENTAGE:
+        raise ValueError("Only PERCENTAGE commissions can be simulated - settlement pays rates as a percentage")
+
+    service_id = proposal.service_id
+
+    # 1️⃣ Before / after margins for every scheme that inherits the change
+    scheme_ids = fetch_scheme_subtree(db, proposal.scheme_id)
+    scheme_index = {scheme_id: i for i, scheme_id in enumerate(scheme_ids)}
+
+    before, after = [], []
+    absolute_before = absolute_after = None
+
+    for scheme_id in scheme_ids:
+        chain = fetch_commission_chain(db=db, scheme_id=scheme_id, service_id=service_id)
+        absolute = merge_commission_chain(chain)
+        proposed = merge_commission_chain(apply_commission_override(chain, proposal))
+
+        before.append(calculate_commission_earnings(absolute_bps(absolute)))
+        after.append(calculate_commission_earnings(absolute_bps(proposed)))
+
+        if scheme_id == proposal.scheme_id:
+            absolute_before, absolute_after = absolute, proposed
+
+    before_matrix = build_earnings_matrix(before)
+    after_matrix = build_earnings_matrix(after)
+
+    # 2️⃣ Stream the subtree's transactions, accumulate exact paise per role / user
+    plan = SettlementPlan(db)
+    role_totals = np.zeros((2, len(KERNEL_ROLES)), dtype=np.int64)
+    user_totals = {}
+    transactions = 0
+    orphaned = 0
+    volume = 0
+    last_id = 0
+
+    while scheme_ids:
+        query = select(
+            Transaction.id,
+            Transaction.user_id,
+            Transaction.scheme_id,
+            Transaction.amount_minor
+        ).where(
+            Transaction.id > last_id,
+            Transaction.scheme_id.in_(scheme_ids),
+            Transaction.service_id == service_id
+        )
+        if start is not None:
+            query = query.where(Transaction.created_at >= start)
+        if end is not None:
+            query = query.where(Transaction.created_at < end)
+
+        rows = db.execute(query.order_by(Transaction.id).limit(chunk_size)).all()
+        if not rows:
+            break
+
+        last_id = rows[-1].id
+        rows, skipped = split_orphaned(plan, rows)
+        orphaned += len(skipped)
+        if not rows:
+            continue
+
+        _, user_ids, txn_scheme_ids, amounts = zip(*rows)
+
+        amounts = np.asarray(amounts, dtype=np.int64)
+        earnings_index = np.fromiter((scheme_index[s] for s in txn_scheme_ids), dtype=np.int64, count=len(rows))
+        payee_index, payees = plan.chunk_payees(user_ids)
+
+        for side, matrix in enumerate((before_matrix, after_matrix)):
+            batch = compute_ledger_amounts(
+                amounts=amounts,
+                earnings_index=earnings_index,
+                payee_index=payee_index,
+                earnings_matrix=matrix,
+                payees=payees
+            )
+
+            np.add.at(role_totals[side], batch.role_index, batch.amount_minor)
+
+            users, first, inverse = np.unique(batch.user_id, return_index=True, return_inverse=True)
+            sums = np.zeros(len(users), dtype=np.int64)
+            np.add.at(sums, inverse, batch.amount_minor)
+            for user_id, role_index, total in zip(
+                users.tolist(),
+                batch.role_index[first].tolist(),
+                sums.tolist()
+            ):
+                entry = user_totals.setdefault(user_id, {"role": KERNEL_ROLES[role_index], "totals": [0, 0]})
+                entry["totals"][side] += total
+
+        transactions += len(rows)
+        volume += int(amounts.sum())
+
+    def delta_entry(before_total, after_total):
+        return {
+            "before": from_minor(int(before_total)),
+            "after": from_minor(int(after_total)),
+            "delta": from_minor(int(after_total - before_total))
+        }
+
+    return {
+        "scheme_id": proposal.scheme_id,
+        "service_id": service_id,
+        "affected_schemes": scheme_ids,
+        "transactions": transactions,
+        "orphaned": orphaned,
+        "volume": from_minor(volume),
+        "absolute_before": {role.name: value for role, value in (absolute_before or {}).items()},
+        "absolute_after": {role.name: value for role, value in (absolute_after or {}).items()},
+        "by_role": [
+            {"role": role.name, **delta_entry(role_totals[0][i], role_totals[1][i])}
+            for i, role in enumerate(KERNEL_ROLES)
+            if role_totals[0][i] or role_totals[1][i]
+        ],
+        "by_user": [
+            {"user_id": user_id, "role": entry["role"].name, **delta_entry(*entry["totals"])}
+            for user_id, entry in sorted(user_totals.items())
+        ],
+        "total": delta_entry(role_totals[0].sum(), role_totals[1].sum())
+    }
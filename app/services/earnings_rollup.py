@@ -0,0 +1,228 @@
+# app/services/earnings_rollup.py
+"""
+Earnings per payee, service and day (earnings_daily), maintained
+incrementally so "how much did I earn" never sums the ledger.
+
+Every ledger writer adds its rows in the same DB transaction as the
+ledger insert (one upsert per batch: ON CONFLICT, or ON DUPLICATE KEY
+UPDATE on MySQL); deletes subtract what the ledgers they remove held,
+and drop the rows that no ledger contributes to any more.
+`rebuild_rollups` recomputes the table from the ledger - hot tables
+plus archives - if it is ever in doubt.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time
+from sqlalchemy import select, func, delete, type_coerce, Date
+from sqlalchemy.dialects import sqlite, postgresql, mysql
+from sqlalchemy.engine import Connection
+from app.models import CommissionLedger, EarningsRollup, ArchivePartition
+from app.services.archive import archive_connection
+
+# IN-list size for per-transaction adjustments
+ADJUST_CHUNK_SIZE = 500
+
+def _on_conflict_upsert(dialect_insert):
+    """INSERT ... ON CONFLICT (user_id, service_id, day) DO UPDATE - SQLite / PostgreSQL."""
+    statement = dialect_insert(EarningsRollup)
+    return statement.on_conflict_do_update(
+        index_elements=["user_id", "service_id", "day"],
+        set_={
+            "earned_minor": EarningsRollup.earned_minor + statement.excluded.earned_minor,
+            "ledger_count": EarningsRollup.ledger_count + statement.excluded.ledger_count,
+            "updated_at": statement.excluded.updated_at,
+        }
+    )
+
+
+def _on_duplicate_key_upsert():
+    """INSERT ... ON DUPLICATE KEY UPDATE - MySQL, via uq_earnings_daily_user_service_day."""
+    statement = mysql.insert(EarningsRollup)
+    return statement.on_duplicate_key_update(
+        earned_minor=EarningsRollup.earned_minor + statement.inserted.earned_minor,
+        ledger_count=EarningsRollup.ledger_count + statement.inserted.ledger_count,
+        updated_at=statement.inserted.updated_at,
+    )
+
+
+# One upsert per backend ASYNC_DRIVERS offers
+_DIALECT_UPSERTS = {
+    "sqlite": lambda: _on_conflict_upsert(sqlite.insert),
+    "postgresql": lambda: _on_conflict_upsert(postgresql.insert),
+    "mysql": _on_duplicate_key_upsert,
+}
+
+
+def _upsert_statement(db):
+    dialect = db.dialect if isinstance(db, Connection) else db.get_bind().dialect
+    return _DIALECT_UPSERTS[dialect.name]()
+
+
+def rollup_deltas(ledger_rows, sign: int = 1) -> list:
+    """
+    Ledger insert dicts -> one upsert param set per (user, service, day).
+    Rows without created_at count for today.
+    """
+    today = datetime.utcnow().date()
+    totals = defaultdict(lambda: [0, 0])
+
+    for row in ledger_rows:
+        created_at = row.get("created_at")
+        key = (row["user_id"], row["service_id"], created_at.date() if created_at else today)
+        totals[key][0] += sign * row["commission_amount_minor"]
+        totals[key][1] += sign
+
+    return [
+        {"user_id": user_id, "service_id": service_id, "day": day,
+         "earned_minor": earned_minor, "ledger_count": ledger_count}
+        for (user_id, service_id, day), (earned_minor, ledger_count) in totals.items()
+    ]
+
+
+def apply_rollup(db, deltas: list):
+    """Add `deltas` to earnings_daily. Caller commits."""
+    if deltas:
+        db.execute(_upsert_statement(db), deltas)
+
+
+async def apply_rollup_async(db, deltas: list):
+    if deltas:
+        await db.execute(_upsert_statement(db), deltas)
+
+
+def _grouped_ledgers(*conditions):
+    day = type_coerce(func.date(CommissionLedger.created_at), Date)
+    return (
+        select(
+            CommissionLedger.user_id,
+            CommissionLedger.service_id,
+            day.label("day"),
+            func.sum(CommissionLedger.commission_amount_minor).label("earned_minor"),
+            func.count(CommissionLedger.id).label("ledger_count")
+        )
+        .where(*conditions)
+        .group_by(CommissionLedger.user_id, CommissionLedger.service_id, day)
+    )
+
+
+def transaction_deltas(db, transaction_ids, sign: int = 1) -> list:
+    """What the ledgers of `transaction_ids` currently contribute, times `sign`."""
+    transaction_ids = list(transaction_ids)
+    deltas = []
+
+    for start in range(0, len(transaction_ids), ADJUST_CHUNK_SIZE):
+        chunk = transaction_ids[start:start + ADJUST_CHUNK_SIZE]
+        for row in db.execute(_grouped_ledgers(CommissionLedger.transaction_id.in_(chunk))):
+            deltas.append({
+                "user_id": row.user_id,
+                "service_id": row.service_id,
+                "day": row.day,
+                "earned_minor": sign * row.earned_minor,
+                "ledger_count": sign * row.ledger_count
+            })
+
+    return deltas
+
+
+def subtract_transactions(db, transaction_ids):
+    """
+    Negative adjustment for ledgers about to be deleted - call before the
+    delete, in the same DB transaction. Days left without ledgers are
+    removed rather than kept as zero rows.
+    """
+    deltas = transaction_deltas(db, transaction_ids, sign=-1)
+    apply_rollup(db, deltas)
+
+    if deltas:
+        db.execute(delete(EarningsRollup).where(
+            EarningsRollup.ledger_count <= 0,
+            EarningsRollup.user_id.in_({delta["user_id"] for delta in deltas})
+        ))
+
+
+def rebuild_rollups(db, start: date = None, end: date = None) -> dict:
+    """
+    Recompute days in [start, end) from commission_ledger and every
+    archive partition. Runs in the caller's transaction: on SQLite the
+    first DELETE takes the write lock, so settlements wait instead of
+    racing the rebuild.
+    """
+    day_range = []
+    ledger_range = []
+    if start is not None:
+        day_range.append(EarningsRollup.day >= start)
+        ledger_range.append(CommissionLedger.created_at >= datetime.combine(start, time.min))
+    if end is not None:
+        day_range.append(EarningsRollup.day < end)
+        ledger_range.append(CommissionLedger.created_at < datetime.combine(end, time.min))
+
+    # Works on a Session or a bare Connection (the migration)
+    db.execute(delete(EarningsRollup).where(*day_range))
+
+    def rows_of(store) -> list:
+        return [dict(row._mapping) for row in store.execute(_grouped_ledgers(*ledger_range))]
+
+    stats = {"stores": 1, "rollup_rows": 0}
+    rows = rows_of(db)
+
+    for path in db.execute(select(ArchivePartition.path)).scalars().all():
+        with archive_connection(path) as archive_db:
+            rows += rows_of(archive_db)
+        stats["stores"] += 1
+
+    # A day can span the hot tables and an archive - merge before upserting
+    apply_rollup(db, _merge(rows))
+    stats["rollup_rows"] = db.scalar(select(func.count(EarningsRollup.id)).where(*day_range))
+    return stats
+
+
+def _merge(rows: list) -> list:
+    totals = defaultdict(lambda: [0, 0])
+    for row in rows:
+        key = (row["user_id"], row["service_id"], row["day"])
+        totals[key][0] += row["earned_minor"]
+        totals[key][1] += row["ledger_count"]
+
+    return [
+        {"user_id": user_id, "service_id": service_id, "day": day,
+         "earned_minor": earned_minor, "ledger_count": ledger_count}
+        for (user_id, service_id, day), (earned_minor, ledger_count) in totals.items()
+    ]
+
+
+# -----------------------------
+# Read side
+# -----------------------------
+async def earnings_summary(db, user_id: int, start: date = None, end: date = None,
+                           service_id: int = None) -> dict:
+    """Earnings over [start, end) days, by service and by day - index range reads only."""
+    conditions = [EarningsRollup.user_id == user_id]
+    if start is not None:
+        conditions.append(EarningsRollup.day >= start)
+    if end is not None:
+        conditions.append(EarningsRollup.day < end)
+    if service_id is not None:
+        conditions.append(EarningsRollup.service_id == service_id)
+
+    by_service = (await db.execute(
+        select(
+            EarningsRollup.service_id,
+            func.sum(EarningsRollup.earned_minor).label("earned_minor"),
+            func.sum(EarningsRollup.ledger_count).label("ledger_count")
+        )
+        .where(*conditions)
+        .group_by(EarningsRollup.service_id)
+        .order_by(EarningsRollup.service_id)
+    )).all()
+
+    by_day = (await db.execute(
+        select(EarningsRollup.day, func.sum(EarningsRollup.earned_minor).label("earned_minor"))
+        .where(*conditions)
+        .group_by(EarningsRollup.day)
+        .order_by(EarningsRollup.day)
+    )).all()
+
+    return {
+        "earned_minor": sum(row.earned_minor for row in by_service),
+        "by_service": [row._asdict() for row in by_service],
+        "by_day": [row._asdict() for row in by_day]
+    }
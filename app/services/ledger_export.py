@@ -0,0 +1,180 @@
+# app/services/ledger_export.py
+"""
+Streaming export of transactions joined with their ledger rows, for
+reconciliation.
+
+Rows are read with a server-side cursor in `yield_per` chunks and
+encoded chunk by chunk (CSV or NDJSON, optionally gzipped), so memory
+is bounded by EXPORT_CHUNK_SIZE whatever the size of the export.
+Archived months in range are streamed first, oldest first.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from sqlalchemy import select
+from app.core.database import SessionLocal, ReadSessionLocal
+from app.models import Transaction, CommissionLedger
+from app.services.archive import partitions_in_range, archive_connection
+from app.utils.money import from_minor, from_bps
+
+EXPORT_CHUNK_SIZE = 5000
+
+# format -> media type
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# One record per ledger row; a transaction without ledgers gives one
+# record with empty ledger columns
+EXPORT_COLUMNS = (
+    "transaction_id",
+    "user_id",
+    "scheme_id",
+    "service_id",
+    "amount",
+    "amount_minor",
+    "created_at",
+    "ledger_id",
+    "payee_user_id",
+    "payee_role",
+    "payee_scheme_id",
+    "commission_percent",
+    "commission_bps",
+    "commission_amount",
+    "commission_amount_minor",
+    "settled_at",
+)
+
+
+def export_query(start: datetime = None, end: datetime = None,
+                 scheme_id: int = None, service_id: int = None):
+    conditions = []
+    if start is not None:
+        conditions.append(Transaction.created_at >= start)
+    if end is not None:
+        conditions.append(Transaction.created_at < end)
+    if scheme_id is not None:
+        conditions.append(Transaction.scheme_id == scheme_id)
+    if service_id is not None:
+        conditions.append(Transaction.service_id == service_id)
+
+    return (
+        select(
+            Transaction.id.label("transaction_id"),
+            Transaction.user_id,
+            Transaction.scheme_id,
+            Transaction.service_id,
+            Transaction.amount_minor,
+            Transaction.created_at,
+            CommissionLedger.id.label("ledger_id"),
+            CommissionLedger.user_id.label("payee_user_id"),
+            CommissionLedger.role.label("payee_role"),
+            CommissionLedger.scheme_id.label("payee_scheme_id"),
+            CommissionLedger.commission_bps,
+            CommissionLedger.commission_amount_minor,
+            CommissionLedger.created_at.label("settled_at")
+        )
+        .outerjoin(CommissionLedger, CommissionLedger.transaction_id == Transaction.id)
+        .where(*conditions)
+        .order_by(Transaction.created_at, Transaction.id, CommissionLedger.id)
+    )
+
+
+def _record(row) -> dict:
+    return {
+        "transaction_id": row.transaction_id,
+        "user_id": row.user_id,
+        "scheme_id": row.scheme_id,
+        "service_id": row.service_id,
+        "amount": from_minor(row.amount_minor),
+        "amount_minor": row.amount_minor,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "ledger_id": row.ledger_id,
+        "payee_user_id": row.payee_user_id,
+        "payee_role": row.payee_role.name if row.payee_role else None,
+        "payee_scheme_id": row.payee_scheme_id,
+        "commission_percent": from_bps(row.commission_bps),
+        "commission_bps": row.commission_bps,
+        "commission_amount": from_minor(row.commission_amount_minor),
+        "commission_amount_minor": row.commission_amount_minor,
+        "settled_at": row.settled_at.isoformat() if row.settled_at else None,
+    }
+
+
+def iter_export_records(db, start: datetime = None, end: datetime = None,
+                        scheme_id: int = None, service_id: int = None,
+                        chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Lists of at most `chunk_size` records: archives in range, then the hot tables."""
+    query = export_query(start, end, scheme_id, service_id).execution_options(yield_per=chunk_size)
+
+    for partition in partitions_in_range(db, start, end):
+        with archive_connection(partition.path) as archive_db:
+            for rows in archive_db.execute(query).partitions():
+                yield [_record(row) for row in rows]
+
+    for rows in db.execute(query).partitions():
+        yield [_record(row) for row in rows]
+
+
+# -----------------------------
+# Encoders - iterables of record chunks -> bytes
+# -----------------------------
+def encode_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+
+    for records in chunks:
+        writer.writerows(records)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Header only, for an empty export
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def encode_ndjson(chunks):
+    for records in chunks:
+        yield "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records).encode()
+
+
+def gzip_stream(body):
+    """Incremental gzip - never holds more than one chunk."""
+    compressor = zlib.compressobj(wbits=31)   # 31 = gzip container
+
+    for data in body:
+        compressed = compressor.compress(data)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
+
+
+ENCODERS = {
+    "csv": encode_csv,
+    "ndjson": encode_ndjson,
+}
+
+
+def stream_export(fmt: str = "csv", compress: bool = False, start: datetime = None,
+                  end: datetime = None, scheme_id: int = None, service_id: int = None,
+                  chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Bytes of the whole export. Opens its own session (the replica when
+    configured): a streamed body outlives the request's dependencies.
+    """
+    db = (ReadSessionLocal or SessionLocal)()
+
+    try:
+        body = ENCODERS[fmt](iter_export_records(db, start, end, scheme_id, service_id, chunk_size))
+        if compress:
+            body = gzip_stream(body)
+        yield from body
+
+    finally:
+        db.close()
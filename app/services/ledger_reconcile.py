@@ -0,0 +1,270 @@
+# app/services/ledger_reconcile.py
+"""
+Parallel ledger reconciliation: proves every transaction's ledger is what
+today's config (resolve_absolute_commission + calculate_commission_earnings,
+via the settlement kernel) would write, and that no payee was paid more
+than its margin. Transactions whose initiator or an upline user was
+deleted can't be recomputed; they are reported as `orphaned` and are
+not findings.
+
+The transaction id space is cut into ranges that a process pool checks
+independently - each worker has its own session, and its compiled
+commission cache resolves each (scheme, service) once for all the ranges
+it handles. Each range reads the commission_hierarchy version before
+and after its checks, dropping the worker's caches when it moved on
+since the previous range. Writers bump that version with every config
+change, so a run that saw more than one version was checked against a
+config that changed mid-run, and is flagged (`config_changed`).
+Workers write their findings to one NDJSON part per range; the parts
+are concatenated, in id order, into the report. Read-only, hot tables
+only.
+"""
+import json
+import multiprocessing
+import os
+import shutil
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sqlalchemy import select, func
+from app.core.database import SessionLocal, ReadSessionLocal
+from app.models import Transaction
+from app.models.models import CommissionTypeEnum
+from app.services.commission_engine import (
+    COMMISSION_HIERARCHY,
+    resolve_compiled_commission,
+    sync_hierarchy_caches
+)
+from app.services.cache_versions import current_version
+from app.services.settlement_kernel import SettlementPlan
+from app.services.ledger_replay import (
+    REPLAY_CHUNK_SIZE,
+    fetch_transaction_chunk,
+    fetch_existing_ledgers,
+    expected_ledgers,
+    diff_ledgers,
+    split_orphaned
+)
+from app.utils.money import commission_minor
+
+# Transaction ids per work unit - many more units than workers keeps
+# every core busy when some ranges are denser than others
+RECONCILE_RANGE_SIZE = 200000
+
+FINDINGS = ("missing", "mismatched", "unexpected", "over_margin")
+
+# Transactions whose initiator or an upline user was deleted: their
+# ledgers can't be recomputed, so they are listed but never fail the run
+ORPHANED = "orphaned"
+
+
+def transaction_id_ranges(db, range_size: int = RECONCILE_RANGE_SIZE) -> list:
+    """(after_id, until_id] ranges covering every transaction id."""
+    first, last = db.execute(select(func.min(Transaction.id), func.max(Transaction.id))).one()
+    if first is None:
+        return []
+    return [(low, min(low + range_size, last)) for low in range(first - 1, last, range_size)]
+
+
+def _role_name(role):
+    return role.name if hasattr(role, "name") else role
+
+
+def _ledger_findings(transactions: list, expected: list, existing: list, margins: dict) -> list:
+    inserts, updates, deletes = diff_ledgers(expected, existing)
+    existing_by_id = {row["id"]: row for row in existing}
+    findings = []
+
+    for row in inserts:
+        findings.append({
+            "kind": "missing",
+            "transaction_id": row["transaction_id"],
+            "user_id": row["user_id"],
+            "role": _role_name(row["role"]),
+            "expected_scheme_id": row["scheme_id"],
+            "expected_bps": row["commission_bps"],
+            "expected_minor": row["commission_amount_minor"]
+        })
+
+    for row in updates:
+        actual = existing_by_id[row["id"]]
+        findings.append({
+            "kind": "mismatched",
+            "ledger_id": actual["id"],
+            "transaction_id": actual["transaction_id"],
+            "user_id": actual["user_id"],
+            "role": _role_name(actual["role"]),
+            "expected_scheme_id": row["scheme_id"],
+            "actual_scheme_id": actual["scheme_id"],
+            "expected_bps": row["commission_bps"],
+            "actual_bps": actual["commission_bps"],
+            "expected_minor": row["commission_amount_minor"],
+            "actual_minor": actual["commission_amount_minor"]
+        })
+
+    for ledger_id in deletes:
+        actual = existing_by_id[ledger_id]
+        findings.append({
+            "kind": "unexpected",
+            "ledger_id": ledger_id,
+            "transaction_id": actual["transaction_id"],
+            "user_id": actual["user_id"],
+            "role": _role_name(actual["role"]),
+            "actual_bps": actual["commission_bps"],
+            "actual_minor": actual["commission_amount_minor"]
+        })
+
+    # Margin check: what each payee holds per transaction (duplicates
+    # included) against the margin of its role under today's config
+    paid = defaultdict(int)
+    for row in existing:
+        paid[(row["transaction_id"], row["user_id"], row["role"])] += row["commission_amount_minor"] or 0
+
+    transactions_by_id = {txn.id: txn for txn in transactions}
+
+    for (transaction_id, user_id, role), paid_minor in paid.items():
+        txn = transactions_by_id[transaction_id]
+        margin_bps = margins[(txn.scheme_id, txn.service_id)].get(role, 0)
+        allowed_minor = commission_minor(txn.amount_minor, margin_bps, CommissionTypeEnum.PERCENTAGE)
+
+        if paid_minor > allowed_minor:
+            findings.append({
+                "kind": "over_margin",
+                "transaction_id": transaction_id,
+                "user_id": user_id,
+                "role": _role_name(role),
+                "margin_bps": margin_bps,
+                "allowed_minor": allowed_minor,
+                "paid_minor": paid_minor
+            })
+
+    return findings
+
+
+def _orphaned_findings(orphaned: list, existing: list) -> list:
+    ledgers = defaultdict(int)
+    for row in existing:
+        ledgers[row["transaction_id"]] += 1
+
+    return [
+        {
+            "kind": ORPHANED,
+            "transaction_id": txn.id,
+            "user_id": txn.user_id,
+            "ledgers": ledgers[txn.id]
+        }
+        for txn in orphaned
+    ]
+
+
+def reconcile_range(after_id: int, until_id: int, part_path: str,
+                    chunk_size: int = REPLAY_CHUNK_SIZE) -> dict:
+    """
+    Check transactions in (after_id, until_id] chunk by chunk; findings go
+    to `part_path` as NDJSON. Runs in a pool worker, on its own session.
+    """
+    db = (ReadSessionLocal or SessionLocal)()
+    # The config this range checks against; re-read at the end
+    hierarchy_version = sync_hierarchy_caches(db)
+    plan = SettlementPlan(db)
+    margins = {}
+    stats = {"after_id": after_id, "until_id": until_id, "hierarchy_version": hierarchy_version,
+             "transactions": 0, "ledgers": 0, ORPHANED: 0, **{kind: 0 for kind in FINDINGS}}
+
+    try:
+        with open(part_path, "w") as part:
+            last_id = after_id
+
+            while True:
+                transactions = fetch_transaction_chunk(db, last_id, chunk_size, until_id=until_id)
+                if not transactions:
+                    break
+                last_id = transactions[-1].id
+
+                for txn in transactions:
+                    key = (txn.scheme_id, txn.service_id)
+                    if key not in margins:
+                        margins[key] = resolve_compiled_commission(db, *key).earnings_bps
+
+                existing = fetch_existing_ledgers(db, [txn.id for txn in transactions])
+
+                settleable, orphaned = split_orphaned(plan, transactions)
+                orphaned_ids = {txn.id for txn in orphaned}
+                findings = _orphaned_findings(orphaned, existing) + _ledger_findings(
+                    settleable,
+                    expected_ledgers(plan, settleable),
+                    [row for row in existing if row["transaction_id"] not in orphaned_ids],
+                    margins
+                )
+
+                stats["transactions"] += len(transactions)
+                stats["ledgers"] += len(existing)
+                for finding in findings:
+                    stats[finding["kind"]] += 1
+                    part.write(json.dumps(finding, separators=(",", ":")) + "\n")
+
+        stats["config_changed"] = current_version(db, COMMISSION_HIERARCHY) != hierarchy_version
+        return stats
+
+    finally:
+        db.close()
+
+
+def reconcile_ledgers(output: str, workers: int = None, range_size: int = RECONCILE_RANGE_SIZE,
+                      chunk_size: int = REPLAY_CHUNK_SIZE, on_range=None) -> dict:
+    """
+    Reconcile every transaction across `workers` processes (default: all
+    cores) and write the findings to `output`. Returns the totals, with
+    the hierarchy versions the ranges checked against.
+    """
+    db = (ReadSessionLocal or SessionLocal)()
+    try:
+        ranges = transaction_id_ranges(db, range_size)
+    finally:
+        db.close()
+
+    parts_dir = f"{output}.parts"
+    os.makedirs(parts_dir, exist_ok=True)
+
+    def part_path(after_id, until_id):
+        return os.path.join(parts_dir, f"{after_id:012d}_{until_id:012d}.ndjson")
+
+    totals = {"ranges": len(ranges), "transactions": 0, "ledgers": 0, ORPHANED: 0,
+              **{kind: 0 for kind in FINDINGS}}
+    summed = list(totals.keys() - {"ranges"})
+    versions = set()
+    config_changed = False
+
+    # spawn: workers build their own engines instead of inheriting ours
+    pool = ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+    try:
+        futures = [
+            pool.submit(reconcile_range, after_id, until_id, part_path(after_id, until_id), chunk_size)
+            for after_id, until_id in ranges
+        ]
+
+        for future in as_completed(futures):
+            stats = future.result()
+            for key in summed:
+                totals[key] += stats[key]
+            versions.add(stats["hierarchy_version"])
+            config_changed = config_changed or stats["config_changed"]
+            if on_range:
+                on_range(stats, totals)
+
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    with open(output, "wb") as report:
+        for after_id, until_id in ranges:
+            with open(part_path(after_id, until_id), "rb") as part:
+                shutil.copyfileobj(part, report)
+
+    shutil.rmtree(parts_dir)
+
+    totals["hierarchy_versions"] = sorted(versions)
+    totals["config_changed"] = config_changed or len(versions) > 1
+    return totals
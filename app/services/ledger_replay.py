@@ -0,0 +1,265 @@
+# app/services/ledger_replay.py
+import json
+from datetime import datetime
+import numpy as np
+from sqlalchemy import select, insert, update, delete, bindparam
+from sqlalchemy.orm import Session
+from app.models import Transaction, CommissionLedger, ReplayCheckpoint
+from app.services.commission_engine import fetch_scheme_subtree
+from app.services.settlement_kernel import SettlementPlan, ledger_rows_from_batch
+from app.services.earnings_rollup import transaction_deltas, subtract_transactions, apply_rollup
+
+REPLAY_CHUNK_SIZE = 5000
+
+# Ledger columns compared by the diff (the rest is derived from the key)
+LEDGER_VALUE_FIELDS = ("scheme_id", "commission_bps", "commission_amount_minor")
+
+# Columns rewritten for a changed row - the exact values plus their float mirrors
+LEDGER_WRITE_FIELDS = LEDGER_VALUE_FIELDS + ("commission_percent", "commission_amount")
+
+
+def fetch_transaction_chunk(db: Session, last_id: int, chunk_size: int,
+                            scheme_ids=None, service_id=None, start=None, end=None,
+                            until_id: int = None) -> list:
+    """
+    Next keyset-ordered chunk of transactions after `last_id` (and up to
+    `until_id`, inclusive) matching the filter. `scheme_ids` is a list -
+    a scheme's rates also pay out in its child schemes.
+    """
+    query = select(
+        Transaction.id,
+        Transaction.user_id,
+        Transaction.scheme_id,
+        Transaction.service_id,
+        Transaction.amount_minor,
+        Transaction.created_at
+    ).where(Transaction.id > last_id)
+
+    if scheme_ids is not None:
+        query = query.where(Transaction.scheme_id.in_(scheme_ids))
+    if service_id is not None:
+        query = query.where(Transaction.service_id == service_id)
+    if start is not None:
+        query = query.where(Transaction.created_at >= start)
+    if end is not None:
+        query = query.where(Transaction.created_at < end)
+    if until_id is not None:
+        query = query.where(Transaction.id <= until_id)
+
+    return db.execute(query.order_by(Transaction.id).limit(chunk_size)).all()
+
+
+def split_orphaned(plan: SettlementPlan, transactions: list):
+    """
+    (transactions, orphaned): orphaned transactions were initiated by a
+    deleted user, or one whose upline lost a user. Their ledgers record
+    payouts to a hierarchy that no longer exists - never recompute them.
+    """
+    settleable = []
+    orphaned = []
+    for txn in transactions:
+        (settleable if plan.chain_complete(txn.user_id) else orphaned).append(txn)
+    return settleable, orphaned
+
+
+def expected_ledgers(plan: SettlementPlan, transactions: list) -> list:
+    """
+    Ledger rows the current config + hierarchy would produce.
+    """
+    if not transactions:
+        return []
+
+    ids, user_ids, scheme_ids, service_ids, amounts, created_at = zip(*transactions)
+
+    batch = plan.compute(
+        amounts=np.asarray(amounts, dtype=np.int64),
+        scheme_ids=scheme_ids,
+        service_ids=service_ids,
+        user_ids=user_ids
+    )
+
+    return ledger_rows_from_batch(
+        batch,
+        transaction_ids=ids,
+        service_ids=service_ids,
+        created_at=created_at
+    )
+
+
+def fetch_existing_ledgers(db: Session, transaction_ids: list) -> list:
+    return [
+        row._asdict() for row in db.execute(
+            select(
+                CommissionLedger.id,
+                CommissionLedger.transaction_id,
+                CommissionLedger.user_id,
+                CommissionLedger.role,
+                CommissionLedger.scheme_id,
+                CommissionLedger.commission_bps,
+                CommissionLedger.commission_amount_minor
+            ).where(CommissionLedger.transaction_id.in_(transaction_ids))
+        )
+    ]
+
+
+def diff_ledgers(expected: list, existing: list):
+    """
+    Compare ledger rows keyed by (transaction_id, user_id, role).
+    Returns (inserts, updates, deletes):
+      inserts - expected rows with no existing match
+      updates - existing rows (with `id`) whose values changed
+      deletes - ids of existing rows that should not be there
+    """
+    existing_by_key = {}
+    deletes = []
+
+    for row in existing:
+        key = (row["transaction_id"], row["user_id"], row["role"])
+        if key in existing_by_key:
+            # Duplicate payout for the same payee/role
+            deletes.append(row["id"])
+        else:
+            existing_by_key[key] = row
+
+    inserts = []
+    updates = []
+
+    for row in expected:
+        key = (row["transaction_id"], row["user_id"], row["role"])
+        current = existing_by_key.pop(key, None)
+
+        if current is None:
+            inserts.append(row)
+        elif any(current[field] != row[field] for field in LEDGER_VALUE_FIELDS):
+            updates.append({"id": current["id"], **{field: row[field] for field in LEDGER_WRITE_FIELDS}})
+
+    deletes.extend(row["id"] for row in existing_by_key.values())
+
+    return inserts, updates, deletes
+
+
+def apply_ledger_diff(db: Session, inserts: list, updates: list, deletes: list):
+    table = CommissionLedger.__table__
+
+    if inserts:
+        db.execute(insert(table), inserts)
+
+    if updates:
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values({field: bindparam(f"b_{field}") for field in LEDGER_WRITE_FIELDS}),
+            [{f"b_{key}": value for key, value in row.items()} for row in updates]
+        )
+
+    if deletes:
+        db.execute(delete(table).where(table.c.id.in_(deletes)))
+
+
+class ReplayFiltersMismatch(ValueError):
+    """A job name reused with other filters than its checkpoint was started with."""
+
+
+def _serialize_filters(scheme_id, service_id, start, end) -> str:
+    return json.dumps({
+        "scheme_id": scheme_id,
+        "service_id": service_id,
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None
+    }, sort_keys=True)
+
+
+def replay_ledgers(db: Session, job_name: str, scheme_id: int = None, service_id: int = None,
+                   start: datetime = None, end: datetime = None,
+                   chunk_size: int = REPLAY_CHUNK_SIZE, dry_run: bool = False,
+                   restart: bool = False, on_chunk=None) -> dict:
+    """
+    Recompute CommissionLedger rows for the filter against the current
+    commission config, writing only the differences.
+
+    Each chunk's changes commit together with the checkpoint, so a crashed
+    run resumes after the last committed chunk when started again with
+    the same `job_name` and filters; other filters raise
+    ReplayFiltersMismatch unless `restart` starts the job over with them.
+    Memory stays bounded by `chunk_size`.
+
+    Transactions whose initiator or upline was deleted are left alone and
+    only counted (`orphaned`).
+    """
+    filters = _serialize_filters(scheme_id, service_id, start, end)
+
+    checkpoint = db.get(ReplayCheckpoint, job_name)
+    if checkpoint is not None and checkpoint.filters != filters and not restart:
+        raise ReplayFiltersMismatch(
+            f"Replay job '{job_name}' was started with different filters ({checkpoint.filters}); "
+            f"use a new job name, or restart it with the new filters"
+        )
+
+    # A dry run never touches the checkpoint
+    if not dry_run and (checkpoint is None or restart):
+        if checkpoint is None:
+            checkpoint = ReplayCheckpoint(job_name=job_name, filters=filters)
+            db.add(checkpoint)
+        checkpoint.filters = filters
+        checkpoint.last_transaction_id = 0
+        checkpoint.is_done = False
+        checkpoint.inserted = checkpoint.updated = checkpoint.deleted = 0
+        db.commit()
+
+    resume = checkpoint is not None and not restart
+    last_id = checkpoint.last_transaction_id if resume else 0
+    if resume and checkpoint.is_done:
+        last_id = None
+
+    # Child schemes inherit the scheme's rates - replay them too
+    scheme_ids = fetch_scheme_subtree(db, scheme_id) if scheme_id is not None else None
+
+    plan = SettlementPlan(db)
+    stats = {"transactions": 0, "orphaned": 0, "inserted": 0, "updated": 0, "deleted": 0}
+
+    while last_id is not None:
+        transactions = fetch_transaction_chunk(
+            db, last_id, chunk_size,
+            scheme_ids=scheme_ids, service_id=service_id, start=start, end=end
+        )
+
+        if not transactions:
+            if not dry_run:
+                checkpoint.is_done = True
+                db.commit()
+            break
+
+        last_id = transactions[-1].id
+        stats["transactions"] += len(transactions)
+
+        transactions, orphaned = split_orphaned(plan, transactions)
+        stats["orphaned"] += len(orphaned)
+
+        inserts, updates, deletes = diff_ledgers(
+            expected=expected_ledgers(plan, transactions),
+            existing=fetch_existing_ledgers(db, [txn.id for txn in transactions])
+        )
+
+        stats["inserted"] += len(inserts)
+        stats["updated"] += len(updates)
+        stats["deleted"] += len(deletes)
+
+        if not dry_run:
+            if inserts or updates or deletes:
+                # Rollups: take the chunk's old ledgers out, put the new ones in
+                transaction_ids = [txn.id for txn in transactions]
+                subtract_transactions(db, transaction_ids)
+                apply_ledger_diff(db, inserts, updates, deletes)
+                apply_rollup(db, transaction_deltas(db, transaction_ids))
+
+            # Changes + checkpoint commit together: resume point is exact
+            checkpoint.last_transaction_id = last_id
+            checkpoint.inserted += len(inserts)
+            checkpoint.updated += len(updates)
+            checkpoint.deleted += len(deletes)
+            db.commit()
+
+        if on_chunk:
+            on_chunk(last_id, stats)
+
+    return stats
@@ -0,0 +1,285 @@
+# app/services/ledger_snapshot.py
+"""
+Columnar snapshots of transactions / commission_ledger for analytics.
+
+Each table lives under SNAPSHOT_DIR/<table>/ as append-only segments of
+per-column .npy files, plus manifest.json (segments, id watermark and
+the dictionaries). Role, service and scheme ids are dictionary-encoded
+into small integer codes. Queries memory-map the segments and never
+open the OLTP database.
+
+    snapshots/commission_ledger/
+        manifest.json
+        seg_000001/id.npy, role.npy, amount_minor.npy, created_at.npy, ...
+
+Appends are incremental: rows with id > watermark become new segments,
+and the manifest is replaced atomically last, so a crashed run leaves
+the previous snapshot intact. Snapshots follow inserts only - after a
+replay or deletes, rebuild. A rebuild is written beside the live table
+directory and swapped in once its manifest is complete, so queries keep
+reading the old snapshot until then.
+"""
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from datetime import datetime, date
+import numpy as np
+from sqlalchemy import select
+from app.core.config import SNAPSHOT_DIR
+from app.models import Transaction, CommissionLedger
+from app.services.archive import partitions_in_range, archive_connection
+from app.utils.money import from_minor
+
+SNAPSHOT_CHUNK_SIZE = 500000
+MANIFEST = "manifest.json"
+# Rebuilds are written under SNAPSHOT_DIR/.rebuild/<table>/ first
+REBUILD_DIR = ".rebuild"
+
+
+@dataclass(frozen=True)
+class SnapshotTable:
+    name: str
+    model: type
+    # column -> (model attribute, dtype)
+    columns: dict
+    # dictionary-encoded columns: stored as codes, decoded via the manifest
+    encoded: tuple
+    # summed column's name in query results
+    measure_name: str
+
+
+TABLES = {
+    "transactions": SnapshotTable(
+        name="transactions",
+        model=Transaction,
+        columns={
+            "id": ("id", np.int64),
+            "user_id": ("user_id", np.int64),
+            "scheme": ("scheme_id", np.int32),
+            "service": ("service_id", np.int16),
+            "amount_minor": ("amount_minor", np.int64),
+            "created_at": ("created_at", "datetime64[us]"),
+        },
+        encoded=("scheme", "service"),
+        measure_name="volume"
+    ),
+    "commission_ledger": SnapshotTable(
+        name="commission_ledger",
+        model=CommissionLedger,
+        columns={
+            "id": ("id", np.int64),
+            "transaction_id": ("transaction_id", np.int64),
+            "user_id": ("user_id", np.int64),
+            "role": ("role", np.int8),
+            "scheme": ("scheme_id", np.int32),
+            "service": ("service_id", np.int16),
+            "commission_bps": ("commission_bps", np.int32),
+            "amount_minor": ("commission_amount_minor", np.int64),
+            "created_at": ("created_at", "datetime64[us]"),
+        },
+        encoded=("role", "scheme", "service"),
+        measure_name="payout"
+    ),
+}
+
+# Query group keys: dictionary columns + calendar day
+GROUP_KEYS = ("role", "service", "scheme", "day")
+
+
+def _table_dir(table: SnapshotTable, directory: str) -> str:
+    return os.path.join(directory, table.name)
+
+
+def read_manifest(table: SnapshotTable, directory: str = SNAPSHOT_DIR) -> dict:
+    path = os.path.join(_table_dir(table, directory), MANIFEST)
+    if not os.path.exists(path):
+        return {"table": table.name, "watermark": 0, "rows": 0, "segments": [],
+                "dictionaries": {column: [] for column in table.encoded}}
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def _swap_in(table: SnapshotTable, build_directory: str, directory: str):
+    """Replace the live table directory with the finished rebuild."""
+    live = _table_dir(table, directory)
+    retired = live + ".old"
+    shutil.rmtree(retired, ignore_errors=True)
+    if os.path.exists(live):
+        os.rename(live, retired)
+    os.rename(_table_dir(table, build_directory), live)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def _write_manifest(table: SnapshotTable, directory: str, manifest: dict):
+    path = os.path.join(_table_dir(table, directory), MANIFEST)
+    with open(path + ".tmp", "w") as handle:
+        json.dump(manifest, handle, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+# -----------------------------
+# Writing
+# -----------------------------
+def _source_query(table: SnapshotTable, after_id: int, chunk_size: int):
+    model = table.model
+    return (
+        select(*[getattr(model, attribute) for attribute, _ in table.columns.values()])
+        .where(model.id > after_id)
+        .order_by(model.id)
+        .limit(chunk_size)
+    )
+
+
+def _encode(values, dictionary: list) -> list:
+    """Values -> codes, growing `dictionary` (stored as strings) in place."""
+    index = {value: code for code, value in enumerate(dictionary)}
+    codes = []
+    for value in values:
+        key = value.name if hasattr(value, "name") else str(value)
+        code = index.get(key)
+        if code is None:
+            code = index[key] = len(dictionary)
+            dictionary.append(key)
+        codes.append(code)
+    return codes
+
+
+def _write_segment(table: SnapshotTable, directory: str, manifest: dict, rows: list) -> dict:
+    number = max((segment["number"] for segment in manifest["segments"]), default=0) + 1
+    name = f"seg_{number:06d}"
+    path = os.path.join(_table_dir(table, directory), name)
+
+    # Leftover of a crashed run - never referenced by the manifest
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+    for position, (column, (_, dtype)) in enumerate(table.columns.items()):
+        values = [row[position] for row in rows]
+        if column in table.encoded:
+            values = _encode(values, manifest["dictionaries"][column])
+        np.save(os.path.join(path, f"{column}.npy"), np.asarray(values, dtype=dtype))
+
+    return {"number": number, "name": name, "rows": len(rows),
+            "min_id": rows[0][0], "max_id": rows[-1][0]}
+
+
+def write_snapshot(db, table_name: str, directory: str = SNAPSHOT_DIR,
+                   chunk_size: int = SNAPSHOT_CHUNK_SIZE, rebuild: bool = False) -> dict:
+    """
+    Append every row above the watermark (archives first, then the hot
+    table) as new segments. Returns {"table", "appended", "watermark"}.
+    `rebuild` starts from id 0 in a fresh directory and swaps it in last.
+    """
+    table = TABLES[table_name]
+    live_directory = directory
+    if rebuild:
+        # Leftover of a crashed rebuild is discarded, the live one untouched
+        directory = os.path.join(live_directory, REBUILD_DIR)
+        shutil.rmtree(_table_dir(table, directory), ignore_errors=True)
+    os.makedirs(_table_dir(table, directory), exist_ok=True)
+
+    manifest = read_manifest(table, directory)
+    start_watermark = manifest["watermark"]
+    appended = 0
+
+    def drain(store):
+        nonlocal appended
+        last_id = start_watermark
+        while True:
+            rows = store.execute(_source_query(table, last_id, chunk_size)).all()
+            if not rows:
+                return
+            manifest["segments"].append(_write_segment(table, directory, manifest, rows))
+            manifest["rows"] += len(rows)
+            manifest["watermark"] = max(manifest["watermark"], rows[-1][0])
+            appended += len(rows)
+            last_id = rows[-1][0]
+
+    for partition in partitions_in_range(db):
+        with archive_connection(partition.path) as archive_db:
+            drain(archive_db)
+    drain(db)
+
+    manifest["updated_at"] = datetime.utcnow().isoformat()
+    _write_manifest(table, directory, manifest)
+    if rebuild:
+        _swap_in(table, directory, live_directory)
+
+    return {"table": table.name, "appended": appended, "watermark": manifest["watermark"]}
+
+
+# -----------------------------
+# Querying
+# -----------------------------
+def _segments(table: SnapshotTable, directory: str, manifest: dict, columns: list):
+    """Memory-mapped columns, one dict per segment."""
+    for segment in manifest["segments"]:
+        path = os.path.join(_table_dir(table, directory), segment["name"])
+        yield {column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r") for column in columns}
+
+
+def _as_datetime64(value):
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    return np.datetime64(value, "us")
+
+
+def group_sum(table_name: str, by: str, start=None, end=None,
+              directory: str = SNAPSHOT_DIR) -> list:
+    """
+    Sum of the table's measure (volume for transactions, payout for
+    commission_ledger) and row count per `by` key over created_at in
+    [start, end). Exact: sums are int64 paise.
+    """
+    table = TABLES[table_name]
+    if by not in GROUP_KEYS or (by != "day" and by not in table.encoded):
+        raise ValueError(f"{table.name} cannot be grouped by {by}")
+
+    manifest = read_manifest(table, directory)
+    key_column = "created_at" if by == "day" else by
+    columns = sorted({key_column, "created_at", "amount_minor"})
+
+    sums = {}
+    counts = {}
+
+    for segment in _segments(table, directory, manifest, columns):
+        mask = np.ones(len(segment["created_at"]), dtype=bool)
+        if start is not None:
+            mask &= segment["created_at"] >= _as_datetime64(start)
+        if end is not None:
+            mask &= segment["created_at"] < _as_datetime64(end)
+
+        keys = segment[key_column][mask]
+        if by == "day":
+            keys = keys.astype("datetime64[D]").view(np.int64)
+        measure = segment["amount_minor"][mask]
+
+        unique, inverse = np.unique(keys, return_inverse=True)
+        segment_sums = np.zeros(len(unique), dtype=np.int64)
+        np.add.at(segment_sums, inverse, measure)
+        segment_counts = np.bincount(inverse, minlength=len(unique))
+
+        for key, total, count in zip(unique.tolist(), segment_sums.tolist(), segment_counts.tolist()):
+            sums[key] = sums.get(key, 0) + total
+            counts[key] = counts.get(key, 0) + count
+
+    dictionary = manifest["dictionaries"].get(by)
+    results = []
+
+    for key in sorted(sums):
+        if by == "day":
+            label = str(np.datetime64(key, "D"))
+        elif by == "role":
+            label = dictionary[key]
+        else:
+            label = int(dictionary[key])
+
+        results.append({
+            by: label,
+            f"{table.measure_name}_minor": sums[key],
+            table.measure_name: from_minor(sums[key]),
+            "count": counts[key]
+        })
+
+    return results
@@ -0,0 +1,68 @@
+# app/services/password_pool.py
+"""
+bcrypt off the request path: hashing and verification run in a small
+dedicated process pool, so a burst of logins burns those cores instead
+of the threadpool that serves transactions.
+
+Admission is bounded - at most workers + PASSWORD_QUEUE_LIMIT calls in
+flight per API process. Past that, callers get PasswordPoolSaturated
+immediately instead of queueing behind seconds of bcrypt work.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, Future
+from app.core.config import PASSWORD_POOL_WORKERS, PASSWORD_QUEUE_LIMIT
+from app.utils.auth import hash_password, verify_and_rehash
+
+
+class PasswordPoolSaturated(Exception):
+    """Every worker is busy and the queue is full."""
+
+
+_slots = threading.BoundedSemaphore(PASSWORD_POOL_WORKERS + PASSWORD_QUEUE_LIMIT)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: never fork a process that is running an event loop + threads
+            _executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _submit(fn, *args) -> Future:
+    if not _slots.acquire(blocking=False):
+        raise PasswordPoolSaturated()
+
+    try:
+        future = _get_executor().submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(_submit(hash_password, password))
+
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    """(valid, new hash or None) - see verify_and_rehash"""
+    return await asyncio.wrap_future(_submit(verify_and_rehash, plain_password, hashed_password))
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,119 @@
+# app/services/scheme_tree.py
+"""
+The whole scheme hierarchy as one nested document, for GET /scheme/tree.
+
+The tree is built from one query and cached per process, serialized,
+under the `scheme_tree` version counter (cache_versions). Scheme
+create / update / delete and member onboard / delete bump that counter
+in their own DB transaction, so the ETag changes for every process as
+soon as they commit - and a poll with a matching If-None-Match costs
+one primary-key read.
+"""
+import json
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Scheme, User
+from app.services.cache_versions import bump_version, current_version_async
+
+SCHEME_TREE = "scheme_tree"
+
+# (version, with_members, root_scheme_id) -> serialized tree; current version only
+_serialized = {}
+
+
+def bump_tree_version(db):
+    """Invalidate every cached tree. Call before the writer's commit."""
+    bump_version(db, SCHEME_TREE)
+
+
+async def tree_version(db: AsyncSession) -> int:
+    return await current_version_async(db, SCHEME_TREE)
+
+
+def tree_etag(version: int, with_members: bool, root_scheme_id: int = None) -> str:
+    root = root_scheme_id if root_scheme_id is not None else "all"
+    return f'"scheme-tree-{version}-{root}-{int(with_members)}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 asks for If-None-Match
+    return "*" in candidates or etag in [tag.removeprefix("W/") for tag in candidates]
+
+
+async def fetch_scheme_tree(db: AsyncSession, with_members: bool = False) -> list:
+    """Every scheme nested under its parent (roots first, children by id) - one query."""
+    columns = [
+        Scheme.id,
+        Scheme.name,
+        Scheme.parent_scheme_id,
+        Scheme.is_active,
+        Scheme.created_by,
+        Scheme.created_at
+    ]
+    query = select(*columns)
+
+    if with_members:
+        members = (
+            select(User.scheme_id, func.count(User.id).label("members"))
+            .where(User.scheme_id.is_not(None))
+            .group_by(User.scheme_id)
+            .subquery()
+        )
+        query = (
+            select(*columns, func.coalesce(members.c.members, 0).label("members"))
+            .outerjoin(members, members.c.scheme_id == Scheme.id)
+        )
+
+    nodes = {}
+    for row in (await db.execute(query.order_by(Scheme.id))).all():
+        node = row._asdict()
+        node["created_at"] = node["created_at"].isoformat() if node["created_at"] else None
+        node["children"] = []
+        nodes[row.id] = node
+
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node["parent_scheme_id"])
+        (parent["children"] if parent is not None else roots).append(node)
+
+    return roots
+
+
+def _find(nodes: list, scheme_id: int):
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if node["id"] == scheme_id:
+            return node
+        stack.extend(node["children"])
+    return None
+
+
+async def serialized_tree(db: AsyncSession, version: int, with_members: bool,
+                          root_scheme_id: int = None) -> bytes:
+    """
+    JSON body for one version of the tree (the whole forest, or the
+    subtree under `root_scheme_id`). Built at most once per process and
+    version; `version` must have been read on `db` in this transaction.
+    """
+    key = (version, with_members, root_scheme_id)
+    body = _serialized.get(key)
+    if body is not None:
+        return body
+
+    roots = await fetch_scheme_tree(db, with_members)
+    if root_scheme_id is not None:
+        root = _find(roots, root_scheme_id)
+        roots = [root] if root is not None else []
+
+    body = json.dumps({"version": version, "schemes": roots}, separators=(",", ":")).encode()
+
+    # Older versions can never be served again
+    for stale in [cached for cached in _serialized if cached[0] != version]:
+        _serialized.pop(stale, None)
+    _serialized[key] = body
+
+    return body
@@ -0,0 +1,235 @@
+# app/services/settlement_kernel.py
+"""
+Vectorized settlement for many transactions at once (backfills, bulk
+settlement, replays).
+
+Same integer maths as build_ledger_rows / commission_minor, but every
+ledger amount of a chunk is computed in one int64 NumPy pass:
+
+    amounts          (N,)    transaction amounts in paise
+    earnings_index   (N,)    row -> earnings vector (one per scheme/service)
+    payee_index      (N,)    row -> payee chain (one per initiating user)
+    earnings_matrix  (E, R)  margin in basis points per role
+    PayeeMatrix      (P, D)  user id / role / scheme id per upline slot
+
+The payee matrix only covers the distinct users of one chunk and is
+dropped with it, so a long run does the same work and holds the same
+memory per chunk.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+import numpy as np
+from sqlalchemy.orm import Session
+from app.utils.role_hierarchy import ROLE_LEVEL
+from app.services.commission_engine import (
+    resolve_compiled_commission,
+    fetch_payee_chain,
+    payee_chain_complete,
+    sync_hierarchy_caches
+)
+from app.models.models import CommissionTypeEnum
+from app.utils.money import BPS_SCALE, from_minor, from_bps
+from app.core.config import SETTLEMENT_PLAN_CHAIN_CACHE_SIZE
+
+# Column order of the earnings matrix: top of the hierarchy first
+KERNEL_ROLES = [role for role, _ in sorted(ROLE_LEVEL.items(), key=lambda x: x[1])]
+ROLE_INDEX = {role: index for index, role in enumerate(KERNEL_ROLES)}
+
+# Padding for empty payee slots
+NO_PAYEE = -1
+
+
+@dataclass
+class PayeeMatrix:
+    user_ids: np.ndarray      # (P, D) int64, NO_PAYEE padded
+    role_index: np.ndarray    # (P, D) int64 into KERNEL_ROLES, NO_PAYEE padded
+    scheme_ids: np.ndarray    # (P, D) int64, NO_PAYEE when the payee has no scheme
+
+
+@dataclass
+class LedgerBatch:
+    """
+    One entry per ledger row, grouped by transaction row and ordered
+    user -> root inside a row (same order as settle_commission).
+    """
+    row: np.ndarray
+    user_id: np.ndarray
+    role_index: np.ndarray
+    scheme_id: np.ndarray
+    bps: np.ndarray
+    amount_minor: np.ndarray
+
+    def __len__(self):
+        return len(self.row)
+
+
+def earnings_vector(earnings_bps: dict) -> np.ndarray:
+    vector = np.zeros(len(KERNEL_ROLES), dtype=np.int64)
+    for role, bps in earnings_bps.items():
+        vector[ROLE_INDEX[role]] = bps
+    return vector
+
+
+def build_earnings_matrix(earnings_list: list) -> np.ndarray:
+    if not earnings_list:
+        return np.zeros((0, len(KERNEL_ROLES)), dtype=np.int64)
+    return np.vstack([earnings_vector(earnings) for earnings in earnings_list])
+
+
+def build_payee_matrix(payee_chains: list) -> PayeeMatrix:
+    depth = max((len(chain) for chain in payee_chains), default=0)
+    shape = (len(payee_chains), max(depth, 1))
+
+    user_ids = np.full(shape, NO_PAYEE, dtype=np.int64)
+    role_index = np.full(shape, NO_PAYEE, dtype=np.int64)
+    scheme_ids = np.full(shape, NO_PAYEE, dtype=np.int64)
+
+    for p, chain in enumerate(payee_chains):
+        for d, payee in enumerate(chain):
+            user_ids[p, d] = payee.user_id
+            if payee.role in ROLE_INDEX:
+                role_index[p, d] = ROLE_INDEX[payee.role]
+            if payee.scheme_id is not None:
+                scheme_ids[p, d] = payee.scheme_id
+
+    return PayeeMatrix(user_ids=user_ids, role_index=role_index, scheme_ids=scheme_ids)
+
+
+def divide_round(numerator: np.ndarray, denominator: int) -> np.ndarray:
+    """Vectorized money.divide_round: integer division, ties to even."""
+    quotient, remainder = np.divmod(numerator, denominator)
+    twice = 2 * remainder
+    return quotient + ((twice > denominator) | ((twice == denominator) & (quotient % 2 == 1)))
+
+
+def compute_ledger_amounts(amounts: np.ndarray, earnings_index: np.ndarray,
+                           payee_index: np.ndarray, earnings_matrix: np.ndarray,
+                           payees: PayeeMatrix) -> LedgerBatch:
+    amounts = np.asarray(amounts, dtype=np.int64)
+    earnings_index = np.asarray(earnings_index, dtype=np.int64)
+    payee_index = np.asarray(payee_index, dtype=np.int64)
+
+    # (N, D): role held by each upline slot of each transaction
+    roles = payees.role_index[payee_index]
+    has_role = roles >= 0
+
+    rates = earnings_matrix[earnings_index[:, None], np.where(has_role, roles, 0)]
+    rates = np.where(has_role, rates, 0)
+
+    rows, slots = np.nonzero(rates > 0)
+    bps = rates[rows, slots]
+
+    return LedgerBatch(
+        row=rows,
+        user_id=payees.user_ids[payee_index[rows], slots],
+        role_index=roles[rows, slots],
+        scheme_id=payees.scheme_ids[payee_index[rows], slots],
+        bps=bps,
+        amount_minor=divide_round(amounts[rows] * bps, BPS_SCALE)
+    )
+
+
+class SettlementPlan:
+    """
+    Interns (scheme, service) earnings vectors for the kernel, backed by
+    the compiled commission cache, and keeps the payee chains of the
+    last `chain_cache_size` users seen. Chains are read straight from the
+    database on a miss, so a bulk run doesn't fill the process-wide
+    payee cache with every user it touches.
+    """
+
+    def __init__(self, db: Session, chain_cache_size: int = SETTLEMENT_PLAN_CHAIN_CACHE_SIZE):
+        self.db = db
+        sync_hierarchy_caches(db)
+        self._earnings_index = {}
+        self._earnings = []
+        self._earnings_matrix = None
+        self._chains = OrderedDict()    # user_id -> tuple of Payee, LRU
+        self._chain_cache_size = chain_cache_size
+
+    def earnings_index(self, scheme_id: int, service_id: int) -> int:
+        key = (scheme_id, service_id)
+        index = self._earnings_index.get(key)
+        if index is None:
+            compiled = resolve_compiled_commission(self.db, scheme_id, service_id)
+            index = self._earnings_index[key] = len(self._earnings)
+            self._earnings.append(compiled.earnings_bps)
+            self._earnings_matrix = None
+        return index
+
+    def payee_chain(self, user_id: int) -> tuple:
+        chain = self._chains.get(user_id)
+        if chain is not None:
+            self._chains.move_to_end(user_id)
+            return chain
+
+        chain = self._chains[user_id] = tuple(fetch_payee_chain(db=self.db, user_id=user_id))
+        while len(self._chains) > self._chain_cache_size:
+            self._chains.popitem(last=False)
+        return chain
+
+    def chain_complete(self, user_id: int) -> bool:
+        return payee_chain_complete(self.payee_chain(user_id))
+
+    def chunk_payees(self, user_ids) -> tuple:
+        """
+        (payee_index, PayeeMatrix) for one chunk: the matrix has a row per
+        distinct user of `user_ids` only.
+        """
+        users, payee_index = np.unique(np.asarray(user_ids, dtype=np.int64), return_inverse=True)
+        payees = build_payee_matrix([self.payee_chain(user_id) for user_id in users.tolist()])
+        return payee_index.reshape(-1), payees
+
+    def compute(self, amounts, scheme_ids, service_ids, user_ids) -> LedgerBatch:
+        earnings_index = np.fromiter(
+            (self.earnings_index(scheme_id, service_id)
+             for scheme_id, service_id in zip(scheme_ids, service_ids)),
+            dtype=np.int64,
+            count=len(amounts)
+        )
+        payee_index, payees = self.chunk_payees(user_ids)
+
+        if self._earnings_matrix is None:
+            self._earnings_matrix = build_earnings_matrix(self._earnings)
+
+        return compute_ledger_amounts(
+            amounts=amounts,
+            earnings_index=earnings_index,
+            payee_index=payee_index,
+            earnings_matrix=self._earnings_matrix,
+            payees=payees
+        )
+
+
+def ledger_rows_from_batch(batch: LedgerBatch, transaction_ids, service_ids, created_at=None) -> list:
+    """
+    Turn kernel output into CommissionLedger insert dicts.
+    `created_at` (optional) is per transaction row.
+    """
+    rows = []
+
+    for row, user_id, role_index, scheme_id, bps, amount in zip(
+        batch.row.tolist(),
+        batch.user_id.tolist(),
+        batch.role_index.tolist(),
+        batch.scheme_id.tolist(),
+        batch.bps.tolist(),
+        batch.amount_minor.tolist()
+    ):
+        ledger = {
+            "transaction_id": transaction_ids[row],
+            "user_id": user_id,
+            "role": KERNEL_ROLES[role_index],
+            "scheme_id": scheme_id if scheme_id != NO_PAYEE else None,
+            "service_id": service_ids[row],
+            "commission_type": CommissionTypeEnum.PERCENTAGE,
+            "commission_bps": bps,
+            "commission_amount_minor": amount,
+            "commission_percent": from_bps(bps),
+            "commission_amount": from_minor(amount)
+        }
+        if created_at is not None:
+            ledger["created_at"] = created_at[row]
+        rows.append(ledger)
+
+    return rows
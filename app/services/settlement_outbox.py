@@ -0,0 +1,228 @@
+# app/services/settlement_outbox.py
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import update, or_, and_
+from sqlalchemy.orm import Session
+from app.core.config import (
+    SETTLEMENT_MAX_ATTEMPTS,
+    SETTLEMENT_LEASE_SECONDS,
+    SETTLEMENT_POLL_SECONDS
+)
+from app.core.database import SessionLocal
+from app.models import SettlementOutbox, SettlementStatusEnum, Transaction, CommissionLedger
+from app.services.commission_engine import settle_commission
+
+logger = logging.getLogger(__name__)
+
+# Retry backoff is 2 ** attempts seconds, capped here
+MAX_BACKOFF_SECONDS = 300
+
+
+def enqueue_settlement(db: Session, transaction: Transaction) -> SettlementOutbox:
+    """
+    Add the outbox row for `transaction`. Caller commits, so the
+    transaction and its outbox row land together.
+    """
+    entry = SettlementOutbox(transaction_id=transaction.id)
+    db.add(entry)
+    return entry
+
+
+def claim_entries(db: Session, limit: int) -> list:
+    """
+    Mark up to `limit` due entries as PROCESSING for this worker.
+    PROCESSING rows whose lease expired (crashed worker) are claimed again,
+    which is what makes delivery at-least-once.
+    """
+    now = datetime.utcnow()
+    lease_cutoff = now - timedelta(seconds=SETTLEMENT_LEASE_SECONDS)
+
+    candidates = db.query(
+        SettlementOutbox.id,
+        SettlementOutbox.status,
+        SettlementOutbox.locked_at
+    ).filter(
+        or_(
+            and_(
+                SettlementOutbox.status == SettlementStatusEnum.PENDING,
+                SettlementOutbox.next_attempt_at <= now
+            ),
+            and_(
+                SettlementOutbox.status == SettlementStatusEnum.PROCESSING,
+                SettlementOutbox.locked_at < lease_cutoff
+            )
+        )
+    ).order_by(SettlementOutbox.id).limit(limit).all()
+
+    claimed = []
+    for entry_id, status, locked_at in candidates:
+        # Conditional update: only one worker wins each row
+        result = db.execute(
+            update(SettlementOutbox)
+            .where(
+                SettlementOutbox.id == entry_id,
+                SettlementOutbox.status == status,
+                SettlementOutbox.locked_at.is_not_distinct_from(locked_at)
+            )
+            .values(
+                status=SettlementStatusEnum.PROCESSING,
+                locked_at=now,
+                attempts=SettlementOutbox.attempts + 1
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            claimed.append(entry_id)
+
+    db.commit()
+    return claimed
+
+
+def _still_leased(claimed_at: datetime):
+    """This worker's claim is still the current one - no other worker re-claimed the entry."""
+    return and_(
+        SettlementOutbox.status == SettlementStatusEnum.PROCESSING,
+        SettlementOutbox.locked_at == claimed_at
+    )
+
+
+def process_entry(db: Session, entry_id: int) -> bool:
+    entry = db.get(SettlementOutbox, entry_id)
+    if entry is None or entry.status != SettlementStatusEnum.PROCESSING:
+        return False
+
+    claimed_at = entry.locked_at
+    transaction_id = entry.transaction_id
+
+    try:
+        txn = db.get(Transaction, transaction_id)
+        if txn is None:
+            raise LookupError(f"Transaction {transaction_id} not found")
+
+        # Conditional on our lease, and first in the DB transaction: a
+        # worker whose lease expired and was re-claimed settles nothing
+        finished = db.execute(
+            update(SettlementOutbox)
+            .where(SettlementOutbox.id == entry_id, _still_leased(claimed_at))
+            .values(status=SettlementStatusEnum.SETTLED, locked_at=None, last_error=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        if not finished:
+            db.rollback()
+            logger.warning("Lease on outbox entry %s expired - left to the worker that re-claimed it", entry_id)
+            return False
+
+        # Dedup: a redelivered entry may already have its ledger rows
+        already_settled = db.query(CommissionLedger.id).filter(
+            CommissionLedger.transaction_id == txn.id
+        ).first()
+
+        if already_settled:
+            db.commit()
+        else:
+            # settle_commission commits ledger rows + outbox status together
+            settle_commission(db=db, transaction=txn)
+
+        return True
+
+    except Exception as exc:
+        db.rollback()
+        logger.exception("Settlement of outbox entry %s failed", entry_id)
+        _record_failure(db, entry_id, claimed_at, exc)
+        return False
+
+
+def _record_failure(db: Session, entry_id: int, claimed_at: datetime, exc: Exception):
+    entry = db.get(SettlementOutbox, entry_id)
+    if entry is None:
+        return
+
+    if entry.attempts >= SETTLEMENT_MAX_ATTEMPTS:
+        values = {"status": SettlementStatusEnum.FAILED}
+    else:
+        backoff = min(2 ** entry.attempts, MAX_BACKOFF_SECONDS)
+        values = {
+            "status": SettlementStatusEnum.PENDING,
+            "next_attempt_at": datetime.utcnow() + timedelta(seconds=backoff)
+        }
+
+    # Only while we still hold the lease - never reset another worker's claim
+    db.execute(
+        update(SettlementOutbox)
+        .where(SettlementOutbox.id == entry_id, _still_leased(claimed_at))
+        .values(locked_at=None, last_error=f"{exc.__class__.__name__}: {exc}"[:500], **values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def drain_outbox(batch_size: int = 100) -> int:
+    """
+    Claim and settle one batch. Returns how many entries were claimed.
+    """
+    db = SessionLocal()
+    try:
+        claimed = claim_entries(db, batch_size)
+        for entry_id in claimed:
+            process_entry(db, entry_id)
+        return len(claimed)
+    finally:
+        db.close()
+
+
+def run_worker(stop_event: threading.Event, batch_size: int = 100,
+               poll_seconds: float = SETTLEMENT_POLL_SECONDS):
+    while not stop_event.is_set():
+        try:
+            claimed = drain_outbox(batch_size)
+        except Exception:
+            logger.exception("Settlement worker pass failed")
+            claimed = 0
+
+        # Only sleep when there was nothing to do
+        if not claimed:
+            stop_event.wait(poll_seconds)
+
+
+def start_workers(count: int, batch_size: int = 100):
+    """
+    Start `count` worker threads. Returns (threads, stop_event).
+    """
+    stop_event = threading.Event()
+    threads = []
+
+    for i in range(count):
+        thread = threading.Thread(
+            target=run_worker,
+            args=(stop_event, batch_size),
+            name=f"settlement-worker-{i}",
+            daemon=True
+        )
+        thread.start()
+        threads.append(thread)
+
+    return threads, stop_event
+
+
+def get_settlement_status(db: Session, transaction_id: int) -> dict:
+    entry = db.query(SettlementOutbox).filter(
+        SettlementOutbox.transaction_id == transaction_id
+    ).first()
+
+    # No outbox row: the transaction was settled inline
+    if entry is None:
+        return {
+            "transaction_id": transaction_id,
+            "settlement_status": SettlementStatusEnum.SETTLED,
+            "attempts": None,
+            "last_error": None
+        }
+
+    return {
+        "transaction_id": transaction_id,
+        "settlement_status": entry.status,
+        "attempts": entry.attempts,
+        "last_error": entry.last_error
+    }
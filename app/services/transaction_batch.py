@@ -0,0 +1,134 @@
+# app/services/transaction_batch.py
+import logging
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models import Service, Transaction, CommissionLedger, SettlementOutbox
+from app.utils.money import to_minor, from_minor
+from app.services.commission_engine import (
+    resolve_compiled_commission,
+    resolve_payee_chain,
+    build_ledger_rows,
+    sync_hierarchy_caches
+)
+from app.services.earnings_rollup import rollup_deltas, apply_rollup
+
+logger = logging.getLogger(__name__)
+
+# Transactions written (and committed) together
+BATCH_CHUNK_SIZE = 500
+
+
+def process_transaction_batch(db: Session, user_id: int, scheme_id: int,
+                              items: list, chunk_size: int = BATCH_CHUNK_SIZE,
+                              outbox: bool = False) -> list:
+    """
+    Insert + settle many transactions for one user.
+
+    Commission config is resolved once per distinct service, the payee
+    chain once per batch, and rows are bulk inserted one chunk at a time.
+    With `outbox`, each chunk commits its transactions with their outbox
+    rows instead and the settlement worker pays them (PENDING).
+    A failing chunk is rolled back on its own - earlier chunks stay committed.
+    Returns one result dict per item, in input order.
+    """
+    results = [None] * len(items)
+
+    # 1️⃣ Validate services with a single query
+    service_ids = {item.service_id for item in items}
+    known_services = {
+        service_id for (service_id,) in
+        db.query(Service.id).filter(Service.id.in_(service_ids))
+    }
+
+    pending = []
+    for index, item in enumerate(items):
+        if item.service_id not in known_services:
+            results[index] = {
+                "index": index,
+                "status": "FAILED",
+                "error": f"Service {item.service_id} not found"
+            }
+        else:
+            pending.append((index, item))
+
+    # 2️⃣ Resolve config once per (scheme, service) and the upline once -
+    # outbox mode leaves that to the worker
+    if not outbox:
+        sync_hierarchy_caches(db)
+        earnings_by_service = {
+            service_id: resolve_compiled_commission(
+                db=db,
+                scheme_id=scheme_id,
+                service_id=service_id
+            ).earnings_bps
+            for service_id in known_services
+        }
+        payees = resolve_payee_chain(db=db, user_id=user_id)
+
+    # 3️⃣ Bulk insert chunk by chunk
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        now = datetime.utcnow()
+
+        try:
+            transaction_ids = db.scalars(
+                insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "user_id": user_id,
+                        "scheme_id": scheme_id,
+                        "service_id": item.service_id,
+                        "amount": from_minor(to_minor(item.amount)),
+                        "amount_minor": to_minor(item.amount),
+                        "created_at": now
+                    }
+                    for _, item in chunk
+                ]
+            ).all()
+
+            if outbox:
+                db.execute(insert(SettlementOutbox), [
+                    {"transaction_id": transaction_id, "next_attempt_at": now, "created_at": now}
+                    for transaction_id in transaction_ids
+                ])
+            else:
+                ledger_rows = []
+                for transaction_id, (_, item) in zip(transaction_ids, chunk):
+                    for row in build_ledger_rows(
+                        transaction_id=transaction_id,
+                        amount_minor=to_minor(item.amount),
+                        service_id=item.service_id,
+                        earnings_bps=earnings_by_service[item.service_id],
+                        payees=payees
+                    ):
+                        row["created_at"] = now
+                        ledger_rows.append(row)
+
+                if ledger_rows:
+                    db.execute(insert(CommissionLedger), ledger_rows)
+                    apply_rollup(db, rollup_deltas(ledger_rows))
+
+            db.commit()
+
+        # Any failure - earlier chunks are already committed, so report
+        # this one per item instead of failing the whole request
+        except Exception as exc:
+            db.rollback()
+            logger.exception("Batch chunk of %d transactions rolled back", len(chunk))
+            for index, _ in chunk:
+                results[index] = {
+                    "index": index,
+                    "status": "FAILED",
+                    "error": f"Chunk rolled back: {exc.__class__.__name__}"
+                }
+            continue
+
+        for transaction_id, (index, _) in zip(transaction_ids, chunk):
+            results[index] = {
+                "index": index,
+                "status": "PENDING" if outbox else "SETTLED",
+                "transaction_id": transaction_id
+            }
+
+    return results
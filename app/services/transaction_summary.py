@@ -0,0 +1,192 @@
+# app/services/transaction_summary.py
+"""
+Keyset-paginated transaction summary.
+
+Pages are ordered oldest first by (created_at, id), archives before the
+hot tables, and the cursor is the key of the last row served, so every
+page is an ascending index range scan on ix_transactions_user_created
+(or ..._user_service_created) - page N costs the same as page 1. Ledgers for a page come from one IN query.
+"""
+import base64
+from datetime import datetime
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Transaction, CommissionLedger
+from app.services.archive import partitions_for_range, archive_session
+from app.utils.money import from_minor, from_bps
+
+
+def _in_range(column, start, end) -> list:
+    conditions = []
+    if start is not None:
+        conditions.append(column >= start)
+    if end is not None:
+        conditions.append(column < end)
+    return conditions
+
+
+def encode_cursor(created_at: datetime, transaction_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{transaction_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """-> (created_at, id); ValueError on anything we did not issue"""
+    try:
+        created_at, transaction_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(transaction_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _transaction_filters(user_id: int, start, end, service_id) -> list:
+    conditions = [Transaction.user_id == user_id, *_in_range(Transaction.created_at, start, end)]
+    if service_id is not None:
+        conditions.append(Transaction.service_id == service_id)
+    return conditions
+
+
+def _ledger_entry(ledger: CommissionLedger) -> dict:
+    return {
+        "user_id": ledger.user_id,
+        "role": ledger.role.name if hasattr(ledger.role, "name") else ledger.role,
+        "percent": from_bps(ledger.commission_bps),
+        "amount": from_minor(ledger.commission_amount_minor)
+    }
+
+
+async def fetch_page(db: AsyncSession, user_id: int, limit: int, after=None,
+                     start: datetime = None, end: datetime = None, service_id: int = None) -> list:
+    """
+    Up to `limit` summary rows of one store (hot tables or one archive)
+    after the `after` key. Two queries, whatever the page size.
+    """
+    conditions = _transaction_filters(user_id, start, end, service_id)
+    if after is not None:
+        conditions.append(tuple_(Transaction.created_at, Transaction.id) > tuple_(*after))
+
+    # 1. One page of transactions, straight off the index
+    transactions = (await db.scalars(
+        select(Transaction)
+        .where(*conditions)
+        .order_by(Transaction.created_at, Transaction.id)
+        .limit(limit)
+    )).all()
+
+    if not transactions:
+        return []
+
+    # 2. Their whole commission distribution in one IN query
+    ledgers = (await db.scalars(
+        select(CommissionLedger)
+        .where(CommissionLedger.transaction_id.in_([txn.id for txn in transactions]))
+        .order_by(CommissionLedger.transaction_id, CommissionLedger.id)
+    )).all()
+
+    by_transaction = {}
+    for ledger in ledgers:
+        by_transaction.setdefault(ledger.transaction_id, []).append(ledger)
+
+    response = []
+
+    for txn in transactions:
+        distribution = []
+        my_commission = None
+
+        for ledger in by_transaction.get(txn.id, []):
+            distribution.append(_ledger_entry(ledger))
+
+            if ledger.user_id == user_id:
+                my_commission = {
+                    "percent": from_bps(ledger.commission_bps),
+                    "amount": from_minor(ledger.commission_amount_minor)
+                }
+
+        response.append({
+            "transaction_id": txn.id,
+            "amount": from_minor(txn.amount_minor),
+            "service_id": txn.service_id,
+            "created_at": txn.created_at,
+            "my_commission": my_commission,
+            "commission_distribution": distribution
+        })
+
+    return response
+
+
+async def store_totals(db: AsyncSession, user_id: int, start: datetime = None,
+                       end: datetime = None, service_id: int = None) -> dict:
+    """
+    Exact totals of one store - integer SUMs over paise. Both filter on
+    the transaction's time, so earnings cover the same transactions as
+    the volume.
+    """
+    volume_minor = await db.scalar(
+        select(func.coalesce(func.sum(Transaction.amount_minor), 0))
+        .where(*_transaction_filters(user_id, start, end, service_id))
+    )
+
+    earned = [CommissionLedger.user_id == user_id, *_in_range(Transaction.created_at, start, end)]
+    if service_id is not None:
+        earned.append(CommissionLedger.service_id == service_id)
+
+    earned_minor = await db.scalar(
+        select(func.coalesce(func.sum(CommissionLedger.commission_amount_minor), 0))
+        .join(Transaction, Transaction.id == CommissionLedger.transaction_id)
+        .where(*earned)
+    )
+
+    return {"volume_minor": volume_minor, "earned_minor": earned_minor}
+
+
+async def summarize_page(db: AsyncSession, user_id: int, limit: int, cursor: str = None,
+                         start: datetime = None, end: datetime = None,
+                         service_id: int = None, with_totals: bool = False) -> dict:
+    """
+    One page across archive partitions (oldest first) then the hot tables.
+    Only partitions overlapping [max(start, cursor), end) are opened, and
+    none once the page is full - a range or cursor inside the hot window
+    never touches an archive file.
+
+    Totals cover the whole filtered range: they scan it and open every
+    archive it reaches, so they are only computed when asked for.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    lower = start
+    if after is not None and (lower is None or after[0] > lower):
+        lower = after[0]
+
+    # One extra row tells us whether another page exists
+    wanted = limit + 1
+    rows = []
+    totals = {"volume_minor": 0, "earned_minor": 0}
+
+    partitions = await partitions_for_range(db, start if with_totals else lower, end)
+
+    for partition in partitions:
+        if len(rows) >= wanted and not with_totals:
+            break
+        async with archive_session(partition) as archive_db:
+            if len(rows) < wanted:
+                rows += await fetch_page(archive_db, user_id, wanted - len(rows), after, start, end, service_id)
+            if with_totals:
+                for key, value in (await store_totals(archive_db, user_id, start, end, service_id)).items():
+                    totals[key] += value
+
+    if len(rows) < wanted:
+        rows += await fetch_page(db, user_id, wanted - len(rows), after, start, end, service_id)
+    if with_totals:
+        for key, value in (await store_totals(db, user_id, start, end, service_id)).items():
+            totals[key] += value
+
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor(last["created_at"], last["transaction_id"])
+
+    return {
+        "transactions": page,
+        "next_cursor": next_cursor,
+        "totals": totals if with_totals else None
+    }
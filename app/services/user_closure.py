@@ -0,0 +1,186 @@
+# app/services/user_closure.py
+"""
+User hierarchy closure table (user_closure) + downline reporting.
+
+onboard_user and delete_user keep it in step with User.parent_id in the
+same DB transaction; migration 0005 builds it for existing users. A
+downline is then `user_closure WHERE ancestor_id = ?` - a PK range - and
+the aggregates join it to transactions / commission_ledger on their
+user_id indexes, with no recursion at query time.
+"""
+from datetime import datetime
+from sqlalchemy import select, insert, delete, func, literal
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import User, UserClosure, Role, Transaction, CommissionLedger
+from app.services.commission_engine import MAX_USER_DEPTH
+
+CLOSURE_COLUMNS = ["ancestor_id", "descendant_id", "depth"]
+
+
+def add_user(db, user_id: int, parent_id: int = None):
+    """Self row + one row per ancestor of the parent. Caller commits."""
+    db.execute(insert(UserClosure).values(ancestor_id=user_id, descendant_id=user_id, depth=0))
+
+    if parent_id is not None:
+        db.execute(insert(UserClosure).from_select(
+            CLOSURE_COLUMNS,
+            select(UserClosure.ancestor_id, literal(user_id), UserClosure.depth + 1)
+            .where(UserClosure.descendant_id == parent_id)
+        ))
+
+
+def remove_user(db, user_id: int):
+    """
+    Drop the user and cut its subtree off from everything above it -
+    what parent_id walks see once the row is gone. The orphaned members
+    keep their links to each other. Caller commits.
+    """
+    uplines = aliased(UserClosure)
+    subtree = aliased(UserClosure)
+
+    db.execute(
+        delete(UserClosure).where(
+            UserClosure.ancestor_id.in_(
+                select(uplines.ancestor_id).where(uplines.descendant_id == user_id)
+            ),
+            UserClosure.descendant_id.in_(
+                select(subtree.descendant_id).where(subtree.ancestor_id == user_id)
+            )
+        )
+    )
+
+
+def rebuild_closure(db) -> int:
+    """Recompute the whole table from User.parent_id (one recursive CTE)."""
+    db.execute(delete(UserClosure))
+
+    tree = (
+        select(
+            User.id.label("ancestor_id"),
+            User.id.label("descendant_id"),
+            literal(0).label("depth")
+        )
+        .cte("user_tree", recursive=True)
+    )
+
+    child = aliased(User)
+    tree = tree.union_all(
+        select(tree.c.ancestor_id, child.id, tree.c.depth + 1)
+        .where(
+            child.parent_id == tree.c.descendant_id,
+            tree.c.depth < MAX_USER_DEPTH
+        )
+    )
+
+    db.execute(insert(UserClosure).from_select(
+        CLOSURE_COLUMNS,
+        select(tree.c.ancestor_id, tree.c.descendant_id, tree.c.depth)
+    ))
+
+    return db.scalar(select(func.count()).select_from(UserClosure))
+
+
+# -----------------------------
+# Read side
+# -----------------------------
+def _downline(ancestor_id: int, max_depth: int = None, include_self: bool = False) -> list:
+    conditions = [
+        UserClosure.ancestor_id == ancestor_id,
+        UserClosure.depth >= (0 if include_self else 1)
+    ]
+    if max_depth is not None:
+        conditions.append(UserClosure.depth <= max_depth)
+    return conditions
+
+
+def _in_range(column, start, end) -> list:
+    conditions = []
+    if start is not None:
+        conditions.append(column >= start)
+    if end is not None:
+        conditions.append(column < end)
+    return conditions
+
+
+async def is_in_downline(db: AsyncSession, ancestor_id: int, user_id: int) -> bool:
+    """user_id is ancestor_id or somewhere below it - one PK lookup."""
+    return await db.get(UserClosure, (ancestor_id, user_id)) is not None
+
+
+async def downline_summary(db: AsyncSession, ancestor_id: int,
+                           start: datetime = None, end: datetime = None,
+                           max_depth: int = None, include_self: bool = False) -> dict:
+    """
+    Members by role, plus transaction volume and commission earned by
+    the downline per service over [start, end). Hot tables only.
+    """
+    downline = _downline(ancestor_id, max_depth, include_self)
+
+    members = (await db.execute(
+        select(Role.name.label("role"), func.count(UserClosure.descendant_id).label("members"))
+        .select_from(UserClosure)
+        .join(User, User.id == UserClosure.descendant_id)
+        .outerjoin(Role, Role.id == User.role_id)
+        .where(*downline)
+        .group_by(Role.name)
+    )).all()
+
+    volume = (await db.execute(
+        select(
+            Transaction.service_id,
+            func.count(Transaction.id).label("transactions"),
+            func.sum(Transaction.amount_minor).label("volume_minor")
+        )
+        .select_from(UserClosure)
+        .join(Transaction, Transaction.user_id == UserClosure.descendant_id)
+        .where(*downline, *_in_range(Transaction.created_at, start, end))
+        .group_by(Transaction.service_id)
+        .order_by(Transaction.service_id)
+    )).all()
+
+    earned = (await db.execute(
+        select(
+            CommissionLedger.service_id,
+            func.sum(CommissionLedger.commission_amount_minor).label("earned_minor")
+        )
+        .select_from(UserClosure)
+        .join(CommissionLedger, CommissionLedger.user_id == UserClosure.descendant_id)
+        .where(*downline, *_in_range(CommissionLedger.created_at, start, end))
+        .group_by(CommissionLedger.service_id)
+        .order_by(CommissionLedger.service_id)
+    )).all()
+
+    return {
+        "members": {(row.role.name if row.role else None): row.members for row in members},
+        "volume": [row._asdict() for row in volume],
+        "earned": [row._asdict() for row in earned]
+    }
+
+
+async def downline_members(db: AsyncSession, ancestor_id: int, limit: int,
+                           after_id: int = None, max_depth: int = None) -> list:
+    """One page of the downline, keyset on user id (the PK order)."""
+    conditions = _downline(ancestor_id, max_depth)
+    if after_id is not None:
+        conditions.append(UserClosure.descendant_id > after_id)
+
+    rows = (await db.execute(
+        select(
+            User.id,
+            User.name,
+            Role.name.label("role"),
+            User.parent_id,
+            User.scheme_id,
+            User.is_active,
+            UserClosure.depth
+        )
+        .select_from(UserClosure)
+        .join(User, User.id == UserClosure.descendant_id)
+        .outerjoin(Role, Role.id == User.role_id)
+        .where(*conditions)
+        .order_by(UserClosure.descendant_id)
+        .limit(limit)
+    )).all()
+
+    return [row._asdict() for row in rows]
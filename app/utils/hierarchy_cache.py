@@ -0,0 +1,70 @@
+# app/utils/hierarchy_cache.py
+import threading
+
+
+class HierarchyCache:
+    """
+    Process-local cache for values built by walking a hierarchy
+    (scheme tree, user tree).
+
+    Every entry remembers the node ids it was built from, so
+    invalidating one node drops every entry that depends on it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._members = {}
+        self._dependents = {}
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, value, members, generation: int | None = None) -> bool:
+        """
+        Store `value` under `key`.
+        If `generation` is given and an invalidation happened since it was
+        read, the value may be stale and is not stored.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+
+            self._drop(key)
+            members = frozenset(members)
+            self._entries[key] = value
+            self._members[key] = members
+            for node_id in members:
+                self._dependents.setdefault(node_id, set()).add(key)
+            return True
+
+    def invalidate(self, node_id):
+        with self._lock:
+            self._generation += 1
+            for key in self._dependents.pop(node_id, set()):
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._members.clear()
+            self._dependents.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        for node_id in self._members.pop(key, ()):
+            keys = self._dependents.get(node_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._dependents[node_id]
@@ -0,0 +1,58 @@
+# app/utils/money.py
+from decimal import Decimal, ROUND_HALF_UP
+from app.models.models import CommissionTypeEnum
+
+# Amounts are stored in paise, percentages in basis points
+MINOR_UNITS = 100
+BPS_PER_PERCENT = 100
+BPS_SCALE = 100 * BPS_PER_PERCENT      # amount * bps / BPS_SCALE = commission
+
+
+def to_minor(amount) -> int:
+    """Rupees (float / str / Decimal) -> integer paise."""
+    if amount is None:
+        return None
+    return int((Decimal(str(amount)) * MINOR_UNITS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(amount_minor) -> float:
+    if amount_minor is None:
+        return None
+    return amount_minor / MINOR_UNITS
+
+
+def to_bps(percent) -> int:
+    """Percent -> integer basis points (2.5 -> 250)."""
+    if percent is None:
+        return None
+    return int((Decimal(str(percent)) * BPS_PER_PERCENT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def exact_in_hundredths(value) -> bool:
+    """True when `value` has at most 2 decimals - paise for amounts, whole bps for percents."""
+    return -Decimal(str(value)).normalize().as_tuple().exponent <= 2
+
+
+def from_bps(bps) -> float:
+    if bps is None:
+        return None
+    return bps / BPS_PER_PERCENT
+
+
+def divide_round(numerator: int, denominator: int) -> int:
+    """Integer division rounded half to even - same tie rule as round()."""
+    quotient, remainder = divmod(numerator, denominator)
+    if 2 * remainder > denominator or (2 * remainder == denominator and quotient % 2):
+        quotient += 1
+    return quotient
+
+
+def commission_minor(amount_minor: int, rate_bps: int, commission_type) -> int:
+    """
+    Commission in paise.
+    PERCENTAGE: rate is basis points of the amount.
+    FLAT: rate is a rupee value scaled by 100, which is already paise.
+    """
+    if commission_type == CommissionTypeEnum.PERCENTAGE:
+        return divide_round(amount_minor * rate_bps, BPS_SCALE)
+    return rate_bps
@@ -1,15 +1,34 @@
-from fastapi import FastAPI, Depends
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from sqlalchemy.orm import Session
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.database import SessionLocal, engine,Base
+from app.core.config import SETTLEMENT_INPROCESS_WORKERS
 from app.models import *
+from app.services.settlement_outbox import start_workers
+from app.services import password_pool
+from app import migrations
 import uvicorn
 
 # -------------------------------------------------
-# Create DB Tables
+# Create DB Tables + apply pending migrations
 # -------------------------------------------------
 Base.metadata.create_all(bind=engine)
+migrations.upgrade(engine)
+
+# -------------------------------------------------
+# Background settlement workers (outbox mode)
+# -------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    threads, stop_event = start_workers(SETTLEMENT_INPROCESS_WORKERS)
+    yield
+    stop_event.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    password_pool.shutdown()
 
 # -------------------------------------------------
 # FastAPI App
@@ -17,7 +36,8 @@ Base.metadata.create_all(bind=engine)
 app = FastAPI(
     title="FinTech Scheme & Commission Engine",
     description="BRD-aligned Scheme and Commission Management System",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -59,6 +79,13 @@ def health_check():
 def ping():
     return {"message": "pong"}
 
+# -------------------------------------------------
+# Prometheus metrics (settlement stage timings)
+# -------------------------------------------------
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 
 from app.routers import auth_routes, scheme_routes, member_routes, commission_routes, transactions_routers
 
@@ -0,0 +1,58 @@
+# tests/conftest.py
+import os
+import shutil
+import tempfile
+from pathlib import Path
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# app.core.database builds its engines on import - point them away from
+# the tracked fintech.db before any test module imports the app
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
+
+from app.core.database import Base  # noqa: E402
+from app.models import *  # noqa: E402,F401,F403
+from app import migrations  # noqa: E402
+from app.services import commission_engine  # noqa: E402
+
+# Seeded, pre-migration database tracked with the repo - only ever copied
+SEED_DB = Path(__file__).resolve().parents[1] / "fintech.db"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine, autoflush=False)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def seeded_db(tmp_path):
+    """
+    Session on a migrated copy of the seed data: users 1 (SA) ... 7 (D,
+    scheme 5, under MD 6 under WL 3), commissions for scheme 5 / service 2.
+    """
+    path = tmp_path / "seeded.db"
+    shutil.copy(SEED_DB, path)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    migrations.upgrade(engine)
+
+    # Process-wide settlement caches must not leak between databases
+    commission_engine._compiled_commissions.clear()
+    commission_engine._payee_chains.clear()
+    commission_engine._hierarchy_version = None
+
+    session = sessionmaker(bind=engine, autoflush=False)()
+    yield session
+    session.close()
+    engine.dispose()
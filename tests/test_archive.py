@@ -0,0 +1,68 @@
+# tests/test_archive.py
+from datetime import datetime
+import pytest
+from sqlalchemy import func, select
+from app.models import Transaction, CommissionLedger, ArchivePartition
+from app.services import archive
+from app.services.archive import archive_month
+from app.services.commission_engine import settle_commission
+
+# The seed data has two settled transactions (ids 1, 2) in December 2025
+PERIOD = "2025-12"
+NOW = datetime(2026, 3, 1)
+
+
+@pytest.fixture
+def archiving(seeded_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    return seeded_db.get_bind(), seeded_db
+
+
+def _count(db, model):
+    return db.scalar(select(func.count(model.id)))
+
+
+def _add_transaction(db, created_at=None):
+    txn = Transaction(user_id=7, scheme_id=5, service_id=2, amount=10, amount_minor=1000,
+                      created_at=created_at)
+    db.add(txn)
+    db.flush()
+    settle_commission(db, txn)
+    db.commit()
+    return txn
+
+
+def test_open_month_is_rejected(archiving):
+    engine, db = archiving
+    with pytest.raises(ValueError, match="not closed"):
+        archive_month(engine, db, "2026-03", now=NOW)
+
+
+def test_archived_ids_are_not_reused(archiving):
+    engine, db = archiving
+    result = archive_month(engine, db, PERIOD, now=NOW)
+
+    assert result["transactions"] == 2
+    assert _count(db, Transaction) == 0 and _count(db, CommissionLedger) == 0
+    assert _add_transaction(db).id == 3
+
+
+def test_rows_written_during_the_copy_are_kept(archiving, monkeypatch):
+    engine, db = archiving
+    copy_month = archive._copy_month
+
+    def copy_then_write(*args):
+        copied = copy_month(*args)
+        _add_transaction(db, created_at=datetime(2025, 12, 31))
+        return copied
+
+    monkeypatch.setattr(archive, "_copy_month", copy_then_write)
+    with pytest.raises(ValueError, match="re-run"):
+        archive_month(engine, db, PERIOD, now=NOW)
+
+    db.expire_all()
+    assert _count(db, Transaction) == 3 and _count(db, ArchivePartition) == 0
+
+    monkeypatch.setattr(archive, "_copy_month", copy_month)
+    assert archive_month(engine, db, PERIOD, now=NOW)["transactions"] == 3
+    assert _count(db, Transaction) == 0
@@ -0,0 +1,30 @@
+# tests/test_auth_cache.py
+from app.services import auth_cache
+from app.services.auth_cache import (
+    Principal,
+    cached_principal,
+    remember_principal,
+    principal_generation,
+    bump_principals_version,
+    sync_principal_cache
+)
+
+
+def test_bumped_version_drops_principals_cached_elsewhere(db):
+    auth_cache._principals.clear()
+    auth_cache._principals_version = None
+
+    sync_principal_cache(db)
+    principal = Principal(id=7, role=None, scheme_id=5, parent_id=6, is_active=True)
+    remember_principal(principal, principal_generation())
+
+    # No change committed: the cached principal is served
+    sync_principal_cache(db)
+    assert cached_principal(7) == principal
+
+    # Another process deletes or deactivates a user
+    bump_principals_version(db)
+    db.commit()
+
+    sync_principal_cache(db)
+    assert cached_principal(7) is None
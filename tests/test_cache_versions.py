@@ -0,0 +1,16 @@
+# tests/test_cache_versions.py
+from app.services.cache_versions import bump_version, current_version
+
+
+def test_bump_creates_then_increments(db):
+    assert current_version(db, "scheme_tree") == 0
+
+    bump_version(db, "scheme_tree")
+    db.commit()
+    assert current_version(db, "scheme_tree") == 1
+
+    bump_version(db, "scheme_tree")
+    bump_version(db, "scheme_tree")
+    db.commit()
+    assert current_version(db, "scheme_tree") == 3
+    assert current_version(db, "other") == 0
@@ -0,0 +1,34 @@
+# tests/test_commission_engine.py
+import pytest
+from app.models import Scheme, User
+from app.services.commission_engine import (
+    HierarchyDepthExceeded,
+    fetch_commission_chain,
+    fetch_commission_matrix,
+    fetch_payee_chain
+)
+
+
+def test_commission_chain_walks_to_the_root(seeded_db):
+    chain = fetch_commission_chain(seeded_db, 5, 2)
+    assert [level["scheme_id"] for level in chain] == [5, 3, 1]
+
+
+def test_cyclic_scheme_tree_raises_instead_of_truncating(seeded_db):
+    seeded_db.query(Scheme).filter(Scheme.id == 1).update({Scheme.parent_scheme_id: 5})
+    seeded_db.commit()
+
+    with pytest.raises(HierarchyDepthExceeded):
+        fetch_commission_chain(seeded_db, 5, 2)
+    with pytest.raises(HierarchyDepthExceeded):
+        fetch_commission_matrix(seeded_db, 5)
+
+
+def test_cyclic_user_tree_raises_instead_of_truncating(seeded_db):
+    assert [payee.user_id for payee in fetch_payee_chain(seeded_db, 7)] == [7, 6, 3, 2, 1]
+
+    seeded_db.query(User).filter(User.id == 1).update({User.parent_id: 7})
+    seeded_db.commit()
+
+    with pytest.raises(HierarchyDepthExceeded):
+        fetch_payee_chain(seeded_db, 7)
@@ -0,0 +1,56 @@
+# tests/test_commission_simulator.py
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete
+from app.models import Transaction, User, CommissionTypeEnum
+from app.routers.commission_routes import simulate_commission
+from app.schema.commission import CommissionSetup
+from app.services.commission_engine import bump_hierarchy_version
+from app.services.commission_simulator import simulate_commission_change
+
+ADMIN = 2
+DISTRIBUTOR = 7
+MASTER_DISTRIBUTOR = 6
+
+
+def _proposal(**rates):
+    return CommissionSetup(scheme_id=5, service_id=2, commission_type=CommissionTypeEnum.PERCENTAGE, **rates)
+
+
+def _add_transactions(db, user_id, count=2):
+    for _ in range(count):
+        db.add(Transaction(user_id=user_id, scheme_id=5, service_id=2, amount=1000, amount_minor=100000))
+    db.commit()
+
+
+@pytest.mark.parametrize("rates", [
+    {"distributor": 95},
+    {"master_distributor": -3},
+])
+def test_route_rejects_proposals_set_commission_would_reject(seeded_db, rates):
+    admin = seeded_db.get(User, ADMIN)
+    with pytest.raises(HTTPException) as exc:
+        simulate_commission(payload=_proposal(**rates), db=seeded_db, current_user=admin)
+    assert exc.value.status_code == 400
+
+
+def test_only_percentage_setups_are_simulated(seeded_db):
+    proposal = _proposal(distributor=3)
+    proposal.commission_type = CommissionTypeEnum.FLAT
+    with pytest.raises(ValueError):
+        simulate_commission_change(seeded_db, proposal)
+
+
+def test_orphaned_transactions_are_left_out(seeded_db):
+    _add_transactions(seeded_db, DISTRIBUTOR)
+    proposal = _proposal(master_distributor=5, distributor=3.5, retailer=1, customer=0)
+    baseline = simulate_commission_change(seeded_db, proposal)
+    assert baseline["orphaned"] == 0
+
+    seeded_db.execute(delete(User).where(User.id == MASTER_DISTRIBUTOR))
+    bump_hierarchy_version(seeded_db)
+    seeded_db.commit()
+
+    result = simulate_commission_change(seeded_db, proposal)
+    assert result["orphaned"] >= 2
+    assert result["transactions"] == baseline["transactions"] - result["orphaned"]
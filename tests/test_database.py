@@ -0,0 +1,25 @@
+# tests/test_database.py
+import os
+import subprocess
+import sys
+import pytest
+from app.core.database import create_db_engine
+
+
+@pytest.mark.parametrize("profile", ["development", "production"])
+def test_known_profiles_build_an_engine(tmp_path, profile):
+    create_db_engine(f"sqlite:///{tmp_path / 'app.db'}", profile=profile).dispose()
+
+
+def test_unknown_profile_is_refused(tmp_path):
+    with pytest.raises(ValueError):
+        create_db_engine(f"sqlite:///{tmp_path / 'app.db'}", profile="prod")
+
+
+def test_unknown_db_profile_env_fails_at_startup():
+    result = subprocess.run(
+        [sys.executable, "-c", "import app.core.config"],
+        env={**os.environ, "DB_PROFILE": "prodution"},
+        capture_output=True, text=True
+    )
+    assert result.returncode != 0 and "DB_PROFILE must be one of" in result.stderr
@@ -0,0 +1,44 @@
+# tests/test_earnings_rollup.py
+from datetime import datetime
+from sqlalchemy import delete, select, update
+from app.models import Transaction, CommissionLedger, EarningsRollup
+from app.services.commission_engine import settle_commission
+from app.services.earnings_rollup import subtract_transactions
+
+LONG_AGO = datetime(2020, 1, 1)
+
+
+def _settle(db):
+    txn = Transaction(user_id=7, scheme_id=5, service_id=2, amount=1000, amount_minor=100000)
+    db.add(txn)
+    db.flush()
+    settle_commission(db, txn)
+    return txn
+
+
+def _rollups(db):
+    return db.scalars(select(EarningsRollup).where(EarningsRollup.day == datetime.utcnow().date())).all()
+
+
+def test_upsert_touches_updated_at(seeded_db):
+    db = seeded_db
+    _settle(db)
+    db.execute(update(EarningsRollup).values(updated_at=LONG_AGO))
+    db.commit()
+
+    _settle(db)
+    db.expire_all()
+    rollups = _rollups(db)
+    assert rollups and all(row.updated_at > LONG_AGO and row.ledger_count == 2 for row in rollups)
+
+
+def test_subtracting_every_ledger_of_a_day_removes_its_rows(seeded_db):
+    db = seeded_db
+    txn = _settle(db)
+    assert _rollups(db)
+
+    subtract_transactions(db, [txn.id])
+    db.execute(delete(CommissionLedger).where(CommissionLedger.transaction_id == txn.id))
+    db.commit()
+
+    assert _rollups(db) == []
@@ -0,0 +1,48 @@
+# tests/test_ledger_reconcile.py
+import json
+from sqlalchemy import delete
+from app.models import Transaction, User
+from app.services.commission_engine import settle_commission, bump_hierarchy_version
+from app.services.ledger_reconcile import reconcile_range, FINDINGS, ORPHANED
+
+
+def _settle(db, user_id, count=2):
+    ids = []
+    for _ in range(count):
+        txn = Transaction(user_id=user_id, scheme_id=5, service_id=2, amount=1000, amount_minor=100000)
+        db.add(txn)
+        db.flush()
+        settle_commission(db, txn)
+        ids.append(txn.id)
+    return ids
+
+
+def _reconcile(db, tmp_path, monkeypatch):
+    # reconcile_range opens its own session - give it the test database
+    monkeypatch.setattr("app.services.ledger_reconcile.SessionLocal", lambda: db)
+    monkeypatch.setattr("app.services.ledger_reconcile.ReadSessionLocal", None)
+    monkeypatch.setattr(db, "close", lambda: None)
+    part = tmp_path / "part.ndjson"
+    stats = reconcile_range(0, 10 ** 9, str(part))
+    return stats, [json.loads(line) for line in part.read_text().splitlines()]
+
+
+def test_settled_ledgers_reconcile(seeded_db, tmp_path, monkeypatch):
+    _settle(seeded_db, 7)
+    stats, findings = _reconcile(seeded_db, tmp_path, monkeypatch)
+    assert findings == []
+    assert stats[ORPHANED] == 0 and not any(stats[kind] for kind in FINDINGS)
+
+
+def test_deleted_initiator_is_orphaned_not_a_finding(seeded_db, tmp_path, monkeypatch):
+    ids = _settle(seeded_db, 7)
+    seeded_db.execute(delete(User).where(User.id == 7))
+    bump_hierarchy_version(seeded_db)
+    seeded_db.commit()
+
+    stats, findings = _reconcile(seeded_db, tmp_path, monkeypatch)
+
+    assert not any(stats[kind] for kind in FINDINGS)
+    assert {finding["transaction_id"] for finding in findings if finding["kind"] == ORPHANED} >= set(ids)
+    assert all(finding["kind"] == ORPHANED for finding in findings)
+    assert all(finding["ledgers"] > 0 for finding in findings if finding["transaction_id"] in ids)
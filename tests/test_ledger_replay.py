@@ -0,0 +1,130 @@
+# tests/test_ledger_replay.py
+import pytest
+from sqlalchemy import delete, func, select
+from app.models import Transaction, CommissionLedger, User, SchemeCommission
+from app.services.commission_engine import settle_commission, bump_hierarchy_version
+from app.services.ledger_replay import replay_ledgers, ReplayFiltersMismatch
+
+DISTRIBUTOR = 7
+MASTER_DISTRIBUTOR = 6
+
+
+@pytest.fixture
+def settled(seeded_db):
+    """Three settled transactions by the distributor (scheme 5, service 2)."""
+    db = seeded_db
+    ids = []
+    for amount_minor in (100000, 2550, 99):
+        txn = Transaction(user_id=DISTRIBUTOR, scheme_id=5, service_id=2,
+                          amount=amount_minor / 100, amount_minor=amount_minor)
+        db.add(txn)
+        db.flush()
+        settle_commission(db, txn)
+        ids.append(txn.id)
+    return db, ids
+
+
+def _ledgers(db, transaction_ids):
+    return sorted(db.execute(
+        select(CommissionLedger.transaction_id, CommissionLedger.user_id,
+               CommissionLedger.role, CommissionLedger.commission_amount_minor)
+        .where(CommissionLedger.transaction_id.in_(transaction_ids))
+    ).all())
+
+
+def _delete_user(db, user_id):
+    db.execute(delete(User).where(User.id == user_id))
+    bump_hierarchy_version(db)
+    db.commit()
+
+
+def test_replay_is_a_noop_on_settled_ledgers(settled):
+    db, ids = settled
+    stats = replay_ledgers(db, "noop")
+    assert stats["inserted"] == stats["updated"] == stats["deleted"] == 0
+    assert stats["orphaned"] == 0
+
+
+def test_replay_fixes_a_changed_rate(settled):
+    db, ids = settled
+    db.query(SchemeCommission).filter(SchemeCommission.id == 4).update(
+        {SchemeCommission.master_distributor: 7.5}
+    )
+    bump_hierarchy_version(db)
+    db.commit()
+
+    stats = replay_ledgers(db, "rate")
+    assert stats["updated"] > 0 and stats["deleted"] == 0
+
+
+def test_scheme_filter_covers_child_schemes(settled):
+    db, ids = settled
+    # Scheme 5 inherits its white label rate from its parent, scheme 3
+    db.query(SchemeCommission).filter(SchemeCommission.id == 3).update(
+        {SchemeCommission.white_label: 8.5}
+    )
+    bump_hierarchy_version(db)
+    db.commit()
+
+    stats = replay_ledgers(db, "parent-rate", scheme_id=3, service_id=2)
+    assert stats["transactions"] >= len(ids) and stats["updated"] > 0
+
+
+@pytest.mark.parametrize("deleted_user", [DISTRIBUTOR, MASTER_DISTRIBUTOR])
+def test_replay_never_touches_ledgers_of_orphaned_transactions(settled, deleted_user):
+    db, ids = settled
+    before = _ledgers(db, ids)
+    assert before
+
+    _delete_user(db, deleted_user)
+    stats = replay_ledgers(db, f"orphaned-{deleted_user}")
+
+    assert stats["orphaned"] >= len(ids)
+    assert stats["inserted"] == stats["updated"] == stats["deleted"] == 0
+    assert _ledgers(db, ids) == before
+
+
+def test_dry_run_reports_orphaned_transactions(settled):
+    db, ids = settled
+    _delete_user(db, DISTRIBUTOR)
+
+    stats = replay_ledgers(db, "dry", dry_run=True)
+    assert stats["orphaned"] >= len(ids)
+    assert db.scalar(select(func.count()).select_from(CommissionLedger)
+                     .where(CommissionLedger.transaction_id.in_(ids))) > 0
+
+
+class _Crash(Exception):
+    pass
+
+
+def _crash_after_first_chunk(last_id, stats):
+    raise _Crash()
+
+
+def test_resume_continues_after_the_last_committed_chunk(settled):
+    db, ids = settled
+    total = db.scalar(select(func.count(Transaction.id)))
+
+    with pytest.raises(_Crash):
+        replay_ledgers(db, "resume", chunk_size=1, on_chunk=_crash_after_first_chunk)
+
+    stats = replay_ledgers(db, "resume", chunk_size=1)
+    assert stats["transactions"] == total - 1
+
+    # Finished: running it again has nothing left to do
+    assert replay_ledgers(db, "resume", chunk_size=1)["transactions"] == 0
+
+
+def test_resume_with_other_filters_is_refused(settled):
+    db, ids = settled
+    with pytest.raises(_Crash):
+        replay_ledgers(db, "filtered", scheme_id=5, chunk_size=1, on_chunk=_crash_after_first_chunk)
+
+    with pytest.raises(ReplayFiltersMismatch, match="different filters"):
+        replay_ledgers(db, "filtered", scheme_id=4)
+
+    # Restarting applies the new filters from the first transaction on
+    stats = replay_ledgers(db, "filtered", service_id=2, restart=True)
+    assert stats["transactions"] == db.scalar(select(func.count(Transaction.id)).where(Transaction.service_id == 2))
+    assert replay_ledgers(db, "filtered", service_id=2)["transactions"] == 0
@@ -0,0 +1,39 @@
+# tests/test_ledger_snapshot.py
+import os
+import pytest
+from app.services import ledger_snapshot
+from app.services.ledger_snapshot import write_snapshot, group_sum, read_manifest, TABLES, REBUILD_DIR
+
+TABLE = "transactions"
+
+
+def _volume(directory):
+    return group_sum(TABLE, "service", directory=str(directory))
+
+
+def test_failed_rebuild_leaves_the_live_snapshot_readable(seeded_db, tmp_path, monkeypatch):
+    write_snapshot(seeded_db, TABLE, str(tmp_path))
+    before = _volume(tmp_path)
+    assert before
+
+    def crash(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(ledger_snapshot, "_write_segment", crash)
+    with pytest.raises(OSError):
+        write_snapshot(seeded_db, TABLE, str(tmp_path), rebuild=True)
+
+    assert _volume(tmp_path) == before
+
+
+def test_rebuild_swaps_in_a_fresh_snapshot(seeded_db, tmp_path):
+    write_snapshot(seeded_db, TABLE, str(tmp_path), chunk_size=1)
+    assert len(read_manifest(TABLES[TABLE], str(tmp_path))["segments"]) > 1
+
+    result = write_snapshot(seeded_db, TABLE, str(tmp_path), rebuild=True)
+
+    manifest = read_manifest(TABLES[TABLE], str(tmp_path))
+    assert len(manifest["segments"]) == 1 and manifest["rows"] == result["appended"]
+    assert sorted(os.listdir(tmp_path / TABLE)) == [ledger_snapshot.MANIFEST, "seg_000001"]
+    assert not os.path.exists(tmp_path / REBUILD_DIR / TABLE)
+    assert not os.path.exists(tmp_path / f"{TABLE}.old")
@@ -0,0 +1,107 @@
+# tests/test_migrations.py
+import shutil
+import sqlite3
+from pathlib import Path
+import pytest
+from types import SimpleNamespace
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+from app.core.database import Base
+from app import migrations
+from app.migrations import MIGRATIONS
+from app.migrations.m0002_hot_path_indexes import INDEXES
+from app.utils.money import to_minor, to_bps
+
+# The tracked database predates every migration
+BASELINE_DB = Path(__file__).resolve().parents[1] / "fintech.db"
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    path = tmp_path / "baseline.db"
+    shutil.copy(BASELINE_DB, path)
+
+    # Values SQL ROUND() of a float gets wrong
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "INSERT INTO transactions (user_id, scheme_id, service_id, amount, created_at) "
+            "SELECT user_id, scheme_id, service_id, 1.005, created_at FROM transactions LIMIT 1"
+        )
+
+    engine = create_engine(f"sqlite:///{path}")
+    yield engine, path
+    engine.dispose()
+
+
+def _upgrade(engine):
+    # Same order as main.py / python -m app.migrations
+    Base.metadata.create_all(bind=engine)
+    return migrations.upgrade(engine)
+
+
+def test_upgrade_from_baseline_applies_every_migration(baseline):
+    engine, _ = baseline
+    assert migrations.current_version(engine) == 0
+
+    assert _upgrade(engine) == [version for version, _, _ in MIGRATIONS]
+    assert migrations.current_version(engine) == MIGRATIONS[-1][0]
+
+    inspector = inspect(engine)
+    assert {"amount_minor"} <= {c["name"] for c in inspector.get_columns("transactions")}
+    assert {"commission_bps", "commission_amount_minor"} <= {
+        c["name"] for c in inspector.get_columns("commission_ledger")
+    }
+    for name, (table, _) in INDEXES.items():
+        assert name in {index["name"] for index in inspector.get_indexes(table)}
+
+
+def test_upgrade_is_idempotent(baseline):
+    engine, _ = baseline
+    _upgrade(engine)
+    assert _upgrade(engine) == []
+
+
+def test_minor_units_backfill_uses_money_helpers(baseline):
+    engine, path = baseline
+    _upgrade(engine)
+
+    with sqlite3.connect(path) as conn:
+        transactions = conn.execute("SELECT amount, amount_minor FROM transactions").fetchall()
+        ledgers = conn.execute(
+            "SELECT commission_percent, commission_bps, commission_amount, commission_amount_minor "
+            "FROM commission_ledger"
+        ).fetchall()
+
+    assert (1.005, 101) in transactions
+    assert all(minor == to_minor(amount) for amount, minor in transactions)
+    assert ledgers and all(
+        bps == to_bps(percent) and minor == to_minor(amount)
+        for percent, bps, amount, minor in ledgers
+    )
+
+
+def test_user_closure_backfilled(baseline):
+    engine, path = baseline
+    _upgrade(engine)
+
+    with sqlite3.connect(path) as conn:
+        users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        self_rows = conn.execute("SELECT COUNT(*) FROM user_closure WHERE depth = 0").fetchone()[0]
+
+    assert self_rows == users
+
+
+def test_failing_migration_body_is_not_mistaken_for_a_concurrent_apply(baseline, monkeypatch):
+    engine, _ = baseline
+    _upgrade(engine)
+
+    def duplicate_key(conn):
+        conn.execute(text("INSERT INTO schema_migrations (version, name, applied_at) "
+                          "SELECT version, name, applied_at FROM schema_migrations LIMIT 1"))
+
+    broken = (MIGRATIONS[-1][0] + 1, "broken", SimpleNamespace(upgrade=duplicate_key))
+    monkeypatch.setattr(migrations, "MIGRATIONS", MIGRATIONS + [broken])
+
+    with pytest.raises(IntegrityError):
+        migrations.upgrade(engine)
+    assert migrations.current_version(engine) == MIGRATIONS[-1][0]
@@ -0,0 +1,146 @@
+# tests/test_money.py
+import random
+import numpy as np
+import pytest
+from pydantic import ValidationError
+from app.models.models import CommissionTypeEnum
+from app.schema.transactions import TransactionCreate
+from app.services.commission_engine import Payee, build_ledger_rows, calculate_commission
+from app.services import settlement_kernel
+from app.services.settlement_kernel import (
+    KERNEL_ROLES,
+    build_earnings_matrix,
+    build_payee_matrix,
+    compute_ledger_amounts,
+    SettlementPlan
+)
+from app.utils.money import (
+    divide_round,
+    commission_minor,
+    exact_in_hundredths,
+    to_minor,
+    to_bps,
+    from_minor
+)
+
+PERCENTAGE = CommissionTypeEnum.PERCENTAGE
+
+
+@pytest.mark.parametrize("numerator, denominator, expected", [
+    (0, 10000, 0),
+    (14999, 10000, 1),
+    (15000, 10000, 2),      # tie, rounds to even
+    (25000, 10000, 2),      # tie, rounds to even
+    (25001, 10000, 3),
+    (35000, 10000, 4),
+    (9999, 10000, 1),
+    (4999, 10000, 0),
+])
+def test_divide_round_ties_to_even(numerator, denominator, expected):
+    assert divide_round(numerator, denominator) == expected
+
+
+def test_vectorized_divide_round_matches_scalar():
+    rng = np.random.default_rng(7)
+    numerators = np.concatenate([
+        rng.integers(0, 10 ** 12, 10000),
+        np.arange(0, 200000, 5000)          # every tie up to 20
+    ])
+    vectorized = settlement_kernel.divide_round(numerators, 10000)
+    assert vectorized.tolist() == [divide_round(int(n), 10000) for n in numerators]
+
+
+def test_to_minor_and_to_bps_round_half_up_from_decimal():
+    assert to_minor(1.005) == 101           # float 1.005 is 1.00499..., str() is not
+    assert to_minor("12.34") == 1234
+    assert to_bps(2.5) == 250
+    assert to_bps(0.01) == 1
+    assert to_minor(None) is None and to_bps(None) is None
+
+
+def test_commission_minor():
+    assert commission_minor(100000, 250, PERCENTAGE) == 2500
+    assert commission_minor(333, 150, PERCENTAGE) == 5           # 4.995 paise
+    assert commission_minor(100000, 1500, CommissionTypeEnum.FLAT) == 1500
+
+
+@pytest.mark.parametrize("value, exact", [
+    (2.5, True), (0.12, True), (10, True), (100.0, True),
+    (0.125, False), (1e-05, False), (33.333, False),
+])
+def test_exact_in_hundredths(value, exact):
+    assert exact_in_hundredths(value) is exact
+
+
+def _random_chain(rng, user_offset):
+    roles = rng.sample(KERNEL_ROLES, rng.randint(1, len(KERNEL_ROLES)))
+    chain = [Payee(user_id=user_offset + depth, role=role, scheme_id=rng.choice([None, 1, 2]))
+             for depth, role in enumerate(roles)]
+    # A payee without a role never earns
+    if rng.random() < 0.2:
+        chain.append(Payee(user_id=user_offset + 99, role=None, scheme_id=None))
+    return chain
+
+
+def test_kernel_matches_scalar_settlement():
+    rng = random.Random(11)
+    earnings = [{role: rng.choice([0, 0, 1, 25, 150, 333, 1000]) for role in KERNEL_ROLES}
+                for _ in range(5)]
+    chains = [_random_chain(rng, 1000 * p) for p in range(8)]
+
+    amounts = [rng.choice([1, 99, 333, 100000, rng.randrange(1, 10 ** 9)]) for _ in range(500)]
+    earnings_index = [rng.randrange(len(earnings)) for _ in amounts]
+    payee_index = [rng.randrange(len(chains)) for _ in amounts]
+
+    batch = compute_ledger_amounts(
+        np.array(amounts), np.array(earnings_index), np.array(payee_index),
+        build_earnings_matrix(earnings), build_payee_matrix(chains)
+    )
+
+    vectorized = [
+        (int(row), int(user_id), KERNEL_ROLES[role], int(bps), int(amount))
+        for row, user_id, role, bps, amount in zip(
+            batch.row, batch.user_id, batch.role_index, batch.bps, batch.amount_minor
+        )
+    ]
+
+    scalar = []
+    for row, amount in enumerate(amounts):
+        for ledger in build_ledger_rows(row, amount, 1, earnings[earnings_index[row]],
+                                        chains[payee_index[row]]):
+            scalar.append((row, ledger["user_id"], ledger["role"], ledger["commission_bps"],
+                           ledger["commission_amount_minor"]))
+
+    assert vectorized == scalar
+
+
+def test_plan_payee_matrix_covers_one_chunk(seeded_db):
+    plan = SettlementPlan(seeded_db, chain_cache_size=2)
+
+    payee_index, payees = plan.chunk_payees([7, 6, 7])
+    assert payee_index.tolist() == [1, 0, 1]
+    assert payees.user_ids[:, 0].tolist() == [6, 7]
+
+    payee_index, payees = plan.chunk_payees([3])
+    assert payee_index.tolist() == [0] and payees.user_ids.shape[0] == 1
+    assert len(plan._chains) == 2
+
+
+@pytest.mark.parametrize("amount", [10.005, 0, -5, float("inf"), float("nan")])
+def test_transaction_amount_must_be_positive_whole_paise(amount):
+    with pytest.raises(ValidationError):
+        TransactionCreate(service_id=1, amount=amount)
+
+
+def test_transaction_amount_keeps_paise():
+    assert TransactionCreate(service_id=1, amount=10.05).amount == 10.05
+
+
+def test_float_facade_matches_integer_path():
+    rng = random.Random(3)
+    for _ in range(2000):
+        amount_minor = rng.randrange(1, 10 ** 9)
+        bps = rng.randrange(1, 2000)
+        expected = from_minor(commission_minor(amount_minor, bps, PERCENTAGE))
+        assert calculate_commission(from_minor(amount_minor), bps / 100, PERCENTAGE) == expected
+
@@ -0,0 +1,137 @@
+# tests/test_settlement_outbox.py
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from app.core.config import SETTLEMENT_LEASE_SECONDS
+from app.models import SettlementOutbox, SettlementStatusEnum, Transaction, CommissionLedger
+from app.services.settlement_outbox import claim_entries, enqueue_settlement, process_entry
+
+
+def _entries(db, count, **values):
+    entries = [SettlementOutbox(transaction_id=transaction_id, **values)
+               for transaction_id in range(1, count + 1)]
+    db.add_all(entries)
+    db.commit()
+    return [entry.id for entry in entries]
+
+
+def test_claims_due_entries_in_id_order_up_to_limit(db):
+    ids = _entries(db, 5)
+
+    assert claim_entries(db, 3) == ids[:3]
+    assert claim_entries(db, 3) == ids[3:]
+
+    for entry in db.query(SettlementOutbox):
+        assert entry.status == SettlementStatusEnum.PROCESSING
+        assert entry.attempts == 1
+        assert entry.locked_at is not None
+
+
+def test_skips_entries_not_yet_due(db):
+    _entries(db, 2, next_attempt_at=datetime.utcnow() + timedelta(minutes=5))
+    assert claim_entries(db, 10) == []
+
+
+def test_live_lease_is_not_claimed_again(db):
+    _entries(db, 1)
+    assert len(claim_entries(db, 10)) == 1
+    assert claim_entries(db, 10) == []
+
+
+def test_expired_lease_is_claimed_again(db):
+    [entry_id] = _entries(db, 1)
+    claim_entries(db, 10)
+
+    # The worker that held it crashed
+    expired = datetime.utcnow() - timedelta(seconds=SETTLEMENT_LEASE_SECONDS + 1)
+    db.query(SettlementOutbox).update({SettlementOutbox.locked_at: expired})
+    db.commit()
+
+    assert claim_entries(db, 10) == [entry_id]
+    entry = db.get(SettlementOutbox, entry_id)
+    db.refresh(entry)
+    assert entry.attempts == 2
+    assert entry.locked_at > expired
+
+
+def test_finished_entries_are_never_claimed(db):
+    _entries(db, 1, status=SettlementStatusEnum.SETTLED)
+    db.add(SettlementOutbox(transaction_id=99, status=SettlementStatusEnum.FAILED))
+    db.commit()
+    assert claim_entries(db, 10) == []
+
+
+def test_only_one_worker_wins_a_row(engine, db):
+    [entry_id] = _entries(db, 1)
+    other = sessionmaker(bind=engine)()
+    raced = []
+
+    # Another worker claims the row between our candidate read and our UPDATE
+    def claim_first(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE settlement_outbox") and not raced:
+            raced.append(None)
+            raced[0] = claim_entries(other, 10)
+
+    event.listen(engine, "before_cursor_execute", claim_first)
+    try:
+        assert claim_entries(db, 10) == []
+    finally:
+        event.remove(engine, "before_cursor_execute", claim_first)
+        other.close()
+
+    assert raced == [[entry_id]]
+    entry = db.get(SettlementOutbox, entry_id)
+    db.refresh(entry)
+    assert entry.attempts == 1
+
+
+def _expire_leases(db):
+    expired = datetime.utcnow() - timedelta(seconds=SETTLEMENT_LEASE_SECONDS + 1)
+    db.query(SettlementOutbox).update({SettlementOutbox.locked_at: expired})
+    db.commit()
+
+
+def _ledger_count(db, transaction_id):
+    return db.scalar(select(func.count(CommissionLedger.id)).where(CommissionLedger.transaction_id == transaction_id))
+
+
+def test_worker_that_lost_its_lease_settles_nothing(seeded_db):
+    db = seeded_db
+    txn = Transaction(user_id=7, scheme_id=5, service_id=2, amount=1000, amount_minor=100000)
+    db.add(txn)
+    db.flush()
+    enqueue_settlement(db, txn)
+    db.commit()
+
+    _expire_leases(db)
+    [entry_id] = claim_entries(db, 10)
+
+    # The slow worker still sees its own claim when it gets to the entry
+    slow = sessionmaker(bind=db.get_bind(), autoflush=False)()
+    slow_entry = slow.get(SettlementOutbox, entry_id)
+
+    _expire_leases(db)
+    assert claim_entries(db, 10) == [entry_id]
+
+    try:
+        assert process_entry(slow, entry_id) is False
+        assert slow_entry.status == SettlementStatusEnum.PROCESSING
+    finally:
+        slow.close()
+    assert _ledger_count(db, txn.id) == 0
+
+    assert process_entry(db, entry_id) is True
+    assert db.get(SettlementOutbox, entry_id).status == SettlementStatusEnum.SETTLED
+    settled = _ledger_count(db, txn.id)
+    assert settled > 0
+
+    # Nothing can add a second row for the same payee
+    ledger = db.scalars(select(CommissionLedger).where(CommissionLedger.transaction_id == txn.id)).first()
+    db.add(CommissionLedger(**{
+        column.name: getattr(ledger, column.name)
+        for column in CommissionLedger.__table__.columns if column.name != "id"
+    }))
+    with pytest.raises(IntegrityError):
+        db.commit()
@@ -0,0 +1,68 @@
+# tests/test_transaction_batch.py
+from sqlalchemy import func, select
+from app.models import Transaction, CommissionLedger, SettlementOutbox
+from app.schema.transactions import TransactionCreate
+from app.services import transaction_batch
+from app.services.transaction_batch import process_transaction_batch
+
+DISTRIBUTOR = 7
+
+
+def _items(*service_ids):
+    return [TransactionCreate(service_id=service_id, amount=100 + index)
+            for index, service_id in enumerate(service_ids)]
+
+
+def _process(db, items, **kwargs):
+    return process_transaction_batch(db, DISTRIBUTOR, 5, items, **kwargs)
+
+
+def _count(db, model, *where):
+    return db.scalar(select(func.count()).select_from(model).where(*where))
+
+
+def test_results_follow_input_order_and_flag_unknown_services(seeded_db):
+    results = _process(seeded_db, _items(2, 999, 2, 999, 2), chunk_size=2)
+
+    assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+    assert [result["status"] for result in results] == ["SETTLED", "FAILED", "SETTLED", "FAILED", "SETTLED"]
+    assert results[1]["error"] == "Service 999 not found"
+
+    amounts = {txn_id: amount for txn_id, amount in seeded_db.execute(
+        select(Transaction.id, Transaction.amount_minor)
+        .where(Transaction.id.in_([results[i]["transaction_id"] for i in (0, 2, 4)]))
+    )}
+    assert [amounts[results[i]["transaction_id"]] for i in (0, 2, 4)] == [10000, 10200, 10400]
+
+
+def test_failing_chunk_rolls_back_alone(seeded_db, monkeypatch):
+    build_ledger_rows = transaction_batch.build_ledger_rows
+    calls = []
+
+    def fail_in_second_chunk(**kwargs):
+        calls.append(kwargs["transaction_id"])
+        if len(calls) == 3:
+            raise RuntimeError("boom")
+        return build_ledger_rows(**kwargs)
+
+    monkeypatch.setattr(transaction_batch, "build_ledger_rows", fail_in_second_chunk)
+    before = _count(seeded_db, Transaction)
+    results = _process(seeded_db, _items(2, 2, 2, 2, 2), chunk_size=2)
+
+    assert [result["status"] for result in results] == ["SETTLED", "SETTLED", "FAILED", "FAILED", "SETTLED"]
+    assert results[2]["error"] == "Chunk rolled back: RuntimeError"
+    assert _count(seeded_db, Transaction) == before + 3
+
+    settled = [result["transaction_id"] for result in results if result["status"] == "SETTLED"]
+    assert _count(seeded_db, CommissionLedger, CommissionLedger.transaction_id.in_(settled)) > 0
+    assert _count(seeded_db, CommissionLedger, CommissionLedger.transaction_id.notin_(
+        select(Transaction.id))) == 0
+
+
+def test_outbox_mode_enqueues_instead_of_settling(seeded_db):
+    results = _process(seeded_db, _items(2, 999, 2), outbox=True)
+
+    assert [result["status"] for result in results] == ["PENDING", "FAILED", "PENDING"]
+    ids = [results[0]["transaction_id"], results[2]["transaction_id"]]
+    assert _count(seeded_db, SettlementOutbox, SettlementOutbox.transaction_id.in_(ids)) == 2
+    assert _count(seeded_db, CommissionLedger, CommissionLedger.transaction_id.in_(ids)) == 0
@@ -0,0 +1,53 @@
+# tests/test_transaction_summary.py
+import asyncio
+from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from app.models import Transaction, CommissionLedger
+from app.services.commission_engine import settle_commission
+from app.services.transaction_summary import summarize_page
+
+DISTRIBUTOR = 7
+
+
+def _summarize(db, **kwargs):
+    async def run():
+        engine = create_async_engine(db.get_bind().url.set(drivername="sqlite+aiosqlite"))
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as async_db:
+                return await summarize_page(async_db, DISTRIBUTOR, limit=10, **kwargs)
+        finally:
+            await engine.dispose()
+    return asyncio.run(run())
+
+
+def _settle(db, created_at=None):
+    txn = Transaction(user_id=DISTRIBUTOR, scheme_id=5, service_id=2, amount=1000, amount_minor=100000,
+                      created_at=created_at)
+    db.add(txn)
+    db.flush()
+    settle_commission(db, txn)
+    return txn
+
+
+def test_totals_only_on_request(seeded_db):
+    _settle(seeded_db)
+    seeded_db.commit()
+
+    summary = _summarize(seeded_db)
+    assert summary["transactions"] and summary["totals"] is None
+    assert _summarize(seeded_db, with_totals=True)["totals"]["volume_minor"] > 0
+
+
+def test_earnings_follow_the_transaction_time(seeded_db):
+    db = seeded_db
+    txn = _settle(db, created_at=datetime(2026, 1, 15))
+
+    # Settled (ledger stamped) well after the transaction itself
+    db.execute(update(CommissionLedger).where(CommissionLedger.transaction_id == txn.id)
+               .values(created_at=datetime(2026, 3, 1)))
+    db.commit()
+
+    january = _summarize(db, start=datetime(2026, 1, 1), end=datetime(2026, 2, 1), with_totals=True)
+    assert january["totals"]["volume_minor"] == 100000
+    assert january["totals"]["earned_minor"] > 0